@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Single-instance Gtk.Application shell for the token tools
+
+The first launch registers the application id on the session bus and
+creates the window. Later launches hand their command line to that
+instance over D-Bus and exit, so only one process ever scans dpkg or runs
+package operations.
+"""
+import os
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gio, GLib, Gtk
+
+class TokenApplication(Gtk.Application):
+    """Gtk.Application that hosts the launcher window"""
+
+    def __init__(self, application_id, app_factory):
+        super().__init__(application_id=application_id,
+                         flags=Gio.ApplicationFlags.HANDLES_COMMAND_LINE)
+        self.app_factory = app_factory
+        self.app = None
+        self.add_main_option('page', 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING,
+                             "Catalog page to show (office, web or games)", "PAGE")
+        self.add_main_option('install', 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING_ARRAY,
+                             "Install a package from the catalog", "PACKAGE")
+        self.add_main_option('remove', 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING_ARRAY,
+                             "Remove a package from the catalog", "PACKAGE")
+        self.add_main_option('profile', 0, GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+                             "Profile startup and each operation with cProfile", None)
+        self.add_main_option('trace-malloc', 0, GLib.OptionFlags.NONE, GLib.OptionArg.NONE,
+                             "Record allocation growth of startup and each operation", None)
+        self.add_main_option('root', 0, GLib.OptionFlags.NONE, GLib.OptionArg.STRING_ARRAY,
+                             "Install or remove in this image root instead of the running system", "DIR")
+
+    def do_activate(self):
+        if self.app is None:
+            self.app = self.app_factory(self)
+            self.app.show()
+        else:
+            self.app.window.present()
+
+    def do_command_line(self, command_line):
+        # Runs in the primary instance, also for launches forwarded over D-Bus
+        options = command_line.get_options_dict().end().unpack()
+        self.activate()
+        if 'page' in options:
+            self.app.show_page(options['page'])
+        # Relative roots are relative to the directory of the launch that sent them
+        cwd = command_line.get_cwd() or os.getcwd()
+        roots = [os.path.join(cwd, root) for root in options.get('root', [])]
+        for package in options.get('install', []):
+            self.app.request_operation(package, True, roots)
+        for package in options.get('remove', []):
+            self.app.request_operation(package, False, roots)
+        return 0
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""AppStream icons, summaries and screenshots for catalog cards
+
+Metadata comes from the AppStream collections on disk: the DEP-11 YAML
+and collection XML apt keeps under /usr/share/swcatalog,
+/var/lib/swcatalog and /var/lib/app-info, and flatpak's appstream.xml.
+One pass over them picks out the components of the catalog entries, and
+the result is cached until a collection changes. Icons and screenshot
+thumbnails are scaled on worker threads and kept in a thumbnail cache
+keyed by source and pixel size, least recently used evicted first, so
+later starts only load small PNGs. Cards show their emoji and
+hand-written text until the metadata for them arrives.
+"""
+import collections
+import concurrent.futures
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import urllib.request
+import xml.etree.ElementTree as ET
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf, GLib
+
+COLLECTION_ROOTS = ("/usr/share/swcatalog", "/var/lib/swcatalog", "/var/cache/swcatalog",
+                    "/usr/share/app-info", "/var/lib/app-info", "/var/cache/app-info")
+FLATPAK_APPSTREAM = ("/var/lib/flatpak/appstream/*/*/active", "~/.local/share/flatpak/appstream/*/*/active")
+ICON_THEME_DIRS = ("/usr/share/icons/hicolor", "/var/lib/flatpak/exports/share/icons/hicolor",
+                   "~/.local/share/flatpak/exports/share/icons/hicolor")
+PIXMAPS = "/usr/share/pixmaps"
+ICON_SIZE = 32
+SCREENSHOT_WIDTH = 320
+THUMBNAIL_CACHE_BYTES = 64 * 1024 * 1024
+DECODE_WORKERS = 4
+FETCH_TIMEOUT = 10
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# summaries: language -> text; icons: [(width, local path)]; screenshots: [(width, url)] of the default screenshot
+Component = collections.namedtuple('Component', 'id package summaries icons stock screenshots')
+
+def collection_files():
+    """(path, base directory of its icons) of every AppStream collection on disk"""
+    found = []
+    for root in COLLECTION_ROOTS:
+        for pattern in ("yaml/*.yml.gz", "yaml/*.yml", "xml/*.xml.gz", "xml/*.xml", "xmls/*.xml.gz", "xmls/*.xml"):
+            found += [(path, root) for path in sorted(glob.glob(os.path.join(root, pattern)))]
+    for pattern in FLATPAK_APPSTREAM:
+        for active in sorted(glob.glob(os.path.expanduser(pattern))):
+            found += [(path, active) for path in glob.glob(os.path.join(active, "appstream.xml*"))]
+    return [(path, base) for path, base in found if os.path.exists(path)]
+
+def open_collection(path):
+    return gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')
+
+def localized(summaries, language):
+    """Best text for a language code such as pt_BR, falling back to the untranslated one"""
+    if not summaries:
+        return None
+    language = (language or '').split('.')[0]
+    for code in (language, language.split('_')[0], 'C', 'en'):
+        if code in summaries:
+            return summaries[code]
+    return None
+
+def cached_icons(base, origin, icons):
+    """Local files of cached icons, as (width, path), looked up the way AppStream lays them out"""
+    found = []
+    for name, width, height in icons:
+        if not str(width).isdigit():
+            continue
+        for directory in (os.path.join(base, "icons", origin or ''), os.path.join(base, "icons")):
+            path = os.path.join(directory, f"{width}x{height}", name)
+            if os.path.isfile(path):
+                found.append((int(width), path))
+                break
+    return found
+
+def stock_icon(name, size=ICON_SIZE):
+    """File of a stock icon in the hicolor theme or pixmaps, closest to size"""
+    if not name:
+        return None
+    candidates = []
+    for theme in ICON_THEME_DIRS:
+        theme = os.path.expanduser(theme)
+        for path in glob.glob(os.path.join(theme, "*", "apps", f"{name}.png")) + \
+                glob.glob(os.path.join(theme, "scalable", "apps", f"{name}.svg")):
+            size_dir = os.path.basename(os.path.dirname(os.path.dirname(path)))
+            width = int(size_dir.split('x')[0]) if size_dir[:1].isdigit() else None
+            # Scalable icons fit any size; otherwise prefer the smallest one not below size
+            candidates.append((0, 0, path) if width is None else (int(width < size), abs(width - size), path))
+    for ext in ('png', 'svg', 'xpm'):
+        path = os.path.join(PIXMAPS, f"{name}.{ext}")
+        if os.path.isfile(path):
+            candidates.append((2, 0, path))
+    return min(candidates)[2] if candidates else None
+
+def unquote(text):
+    if len(text) >= 2 and text[0] == text[-1] == "'":
+        return text[1:-1].replace("''", "'")
+    if len(text) >= 2 and text[0] == text[-1] == '"':
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text[1:-1]
+    return text
+
+def parse_yaml(lines):
+    """Block mappings, sequences and scalars of one DEP-11 document, the YAML subset it uses"""
+    items = [(len(line) - len(line.lstrip(' ')), line.strip()) for line in lines
+             if line.strip() and not line.lstrip().startswith('#')]
+    value, _ = yaml_node(items, 0)
+    return value
+
+def yaml_node(items, pos):
+    """Node starting at items[pos]; returns (value, next position)"""
+    if pos >= len(items):
+        return None, pos
+    indent, text = items[pos]
+    if text == '-' or text.startswith('- '):
+        sequence = []
+        while pos < len(items) and items[pos][0] == indent and (items[pos][1] == '-' or items[pos][1].startswith('- ')):
+            content = items[pos][1][2:].strip()
+            if not content:
+                value, pos = yaml_node(items, pos + 1)
+            elif (': ' in content or content.endswith(':')) and not content.startswith(("'", '"')):
+                # "- key: value" opens a mapping indented past the dash
+                items[pos] = (indent + 2, content)
+                value, pos = yaml_node(items, pos)
+            else:
+                value, pos = yaml_scalar(items, pos, indent, content)
+            sequence.append(value)
+        return sequence, pos
+    mapping = {}
+    while pos < len(items) and items[pos][0] == indent and not items[pos][1].startswith('- '):
+        key, _, rest = items[pos][1].partition(':')
+        rest = rest.strip()
+        pos += 1
+        if rest[:1] in ('>', '|'):
+            block = []
+            while pos < len(items) and items[pos][0] > indent:
+                block.append(items[pos][1])
+                pos += 1
+            mapping[key] = ('\n' if rest[0] == '|' else ' ').join(block)
+        elif rest:
+            mapping[key], pos = yaml_scalar(items, pos - 1, indent, rest)
+        elif pos < len(items) and (items[pos][0] > indent or items[pos][1].startswith('- ')):
+            mapping[key], pos = yaml_node(items, pos)
+        else:
+            mapping[key] = None
+    return mapping, pos
+
+def yaml_scalar(items, pos, indent, text):
+    """Scalar at items[pos] with any folded continuation lines"""
+    pos += 1
+    while pos < len(items) and items[pos][0] > indent:
+        text += ' ' + items[pos][1]
+        pos += 1
+    return unquote(text), pos
+
+def dep11_component(document, base, origin, media):
+    icon = document.get('Icon') or {}
+    cached = [(entry.get('name'), entry.get('width'), entry.get('height'))
+              for entry in icon.get('cached') or () if isinstance(entry, dict) and entry.get('name')]
+    screenshots = []
+    for shot in document.get('Screenshots') or ():
+        if isinstance(shot, dict) and (shot.get('default') == 'true' or not screenshots):
+            screenshots = [(int(thumb.get('width') or 0), media.rstrip('/') + '/' + thumb['url'] if media else thumb['url'])
+                           for thumb in shot.get('thumbnails') or () if isinstance(thumb, dict) and thumb.get('url')]
+            if shot.get('default') == 'true':
+                break
+    summary = document.get('Summary')
+    return Component(document.get('ID'), document.get('Package'), summary if isinstance(summary, dict) else {},
+                     cached_icons(base, origin, cached), icon.get('stock'), screenshots)
+
+def read_dep11(path, base, wanted):
+    """Components of a DEP-11 YAML collection whose package or id is wanted"""
+    header = None
+    document = []
+
+    def finish():
+        # Only wanted documents are parsed; the top-level lines tell which they are
+        nonlocal header
+        if not document:
+            return None
+        if header is None:
+            header = parse_yaml(document)
+            return None
+        keys = {line.split(':', 1)[1].strip() for line in document if line.startswith(('Package:', 'ID:'))}
+        if not keys & wanted:
+            return None
+        return dep11_component(parse_yaml(document), base, header.get('Origin'), header.get('MediaBaseUrl'))
+
+    with open_collection(path) as f:
+        for line in f:
+            if line.startswith('---'):
+                component = finish()
+                if component:
+                    yield component
+                document = []
+            else:
+                document.append(line.rstrip('\n'))
+    component = finish()
+    if component:
+        yield component
+
+def read_xml(path, base, wanted):
+    """Components of a collection XML file whose package or id is wanted"""
+    origin = None
+    with open_collection(path) as f:
+        for event, element in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if element.tag == 'components':
+                    origin = element.get('origin')
+                continue
+            if element.tag != 'component':
+                continue
+            app_id = element.findtext('id')
+            bundle = element.findtext("bundle[@type='flatpak']") or ''
+            flatpak_id = bundle.split('/')[1] if bundle.count('/') >= 2 else None
+            package = element.findtext('pkgname')
+            keys = {app_id, package, flatpak_id, app_id[:-len('.desktop')] if app_id and app_id.endswith('.desktop') else None}
+            if keys & wanted:
+                summaries = {summary.get(XML_LANG, 'C'): (summary.text or '').strip() for summary in element.findall('summary')}
+                cached = [(icon.text, icon.get('width'), icon.get('height')) for icon in element.findall("icon[@type='cached']")
+                          if icon.text]
+                shots = element.findall('screenshots/screenshot')
+                shot = next((s for s in shots if s.get('type') == 'default'), shots[0] if shots else None)
+                screenshots = [(int(image.get('width') or 0), image.text.strip())
+                               for image in (shot.findall("image[@type='thumbnail']") if shot is not None else ())
+                               if image.text]
+                yield Component(flatpak_id or app_id, package, summaries, cached_icons(base, origin, cached),
+                                element.findtext("icon[@type='stock']"), screenshots)
+            element.clear()
+
+def find_components(wanted, files=None):
+    """Wanted package names and app ids -> Component; earlier collections win"""
+    wanted = set(wanted)
+    found = {}
+    for path, base in files if files is not None else collection_files():
+        reader = read_xml if '.xml' in os.path.basename(path) else read_dep11
+        try:
+            for component in reader(path, base, wanted):
+                for key in (component.package, component.id):
+                    if key in wanted:
+                        found.setdefault(key, component)
+        except (OSError, EOFError, ET.ParseError, UnicodeDecodeError):
+            continue
+    return found
+
+
+class ThumbnailCache:
+    """Scaled images on disk keyed by source and pixel size; least recently used go first"""
+
+    def __init__(self, directory, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total = None
+
+    def path(self, source, size):
+        return os.path.join(self.directory, f"{hashlib.sha1(source.encode()).hexdigest()}-{size}.png")
+
+    def get(self, source, size):
+        """Path of the cached image, marked as just used, or None"""
+        path = self.path(source, size)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, source, size, pixbuf):
+        """Store a scaled pixbuf; returns its path or None"""
+        path = self.path(source, size)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            pixbuf.savev(tmp, 'png', [], [])
+            os.replace(tmp, path)
+            stored = os.path.getsize(path)
+        except (OSError, GLib.Error):
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return None
+        with self.lock:
+            if self.total is not None:
+                self.total += stored
+            if self.total is None or self.total > self.max_bytes:
+                self.evict()
+        return path
+
+    def evict(self):
+        """Drop the least recently used images until the cache fits; call with the lock held"""
+        files = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith('.png'):
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+        files.sort()
+        self.total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if self.total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                self.total -= size
+            except OSError:
+                pass
+
+
+class MetadataLoader:
+    """Finds AppStream metadata for catalog entries and decodes their images on worker threads
+
+    load() is meant for a background thread; it calls callback(entry,
+    kind, value) with kind 'summary' (language -> text), 'icon' and
+    'screenshot' (GdkPixbuf), summaries first, icons from worker threads.
+    Screenshots are downloaded only while remote_allowed() is True.
+    """
+
+    def __init__(self, cache_dir, remote_allowed=lambda: True, icon_size=ICON_SIZE, screenshot_width=SCREENSHOT_WIDTH):
+        self.index_path = os.path.join(cache_dir, "appstream.json")
+        self.thumbnails = ThumbnailCache(os.path.join(cache_dir, "thumbnails"))
+        self.remote_allowed = remote_allowed
+        self.icon_size = icon_size
+        self.screenshot_width = screenshot_width
+
+    @staticmethod
+    def keys(entry):
+        """AppStream names an entry may be listed under: its first package, then its Flatpak id"""
+        return [key for key in (entry.packages[0] if entry.packages else None, entry.backends.get('flatpak')) if key]
+
+    def index(self, wanted):
+        """find_components() for wanted, reused while no collection has changed"""
+        files = collection_files()
+        stamp = [[path, os.path.getmtime(path)] for path, _ in files] + [sorted(wanted)]
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached['stamp'] == stamp:
+                return {key: Component(*value) for key, value in cached['components'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        components = find_components(wanted, files)
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            with open(self.index_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump({'stamp': stamp, 'components': components}, f)
+            os.replace(self.index_path + ".tmp", self.index_path)
+        except OSError:
+            pass
+        return components
+
+    def image(self, source, width, height):
+        """Pixbuf of a local file or URL scaled to fit width x height, through the thumbnail cache"""
+        remote = source.startswith(('http://', 'https://'))
+        try:
+            key = source if remote else f"{source}:{os.stat(source).st_mtime_ns}"
+        except OSError:
+            return None
+        size = f"{width}x{height}"
+        cached = self.thumbnails.get(key, size)
+        try:
+            if cached:
+                return GdkPixbuf.Pixbuf.new_from_file(cached)
+            path = source
+            if remote:
+                os.makedirs(self.thumbnails.directory, exist_ok=True)
+                path = os.path.join(self.thumbnails.directory, f"download.{threading.get_ident()}.tmp")
+                with urllib.request.urlopen(source, timeout=FETCH_TIMEOUT) as response, open(path, 'wb') as out:
+                    out.write(response.read())
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, width, height, True)
+            finally:
+                if remote:
+                    os.unlink(path)
+        except (OSError, ValueError, GLib.Error):
+            return None
+        self.thumbnails.put(key, size, pixbuf)
+        return pixbuf
+
+    def icon(self, component):
+        icons = sorted(component.icons)
+        # Smallest cached icon not below the card size, else the largest there is
+        path = next((path for width, path in icons if width >= self.icon_size), icons[-1][1] if icons else None)
+        path = path or stock_icon(component.stock, self.icon_size)
+        return self.image(path, self.icon_size, self.icon_size) if path else None
+
+    def screenshot(self, component):
+        shots = sorted(component.screenshots)
+        url = next((url for width, url in shots if width >= self.screenshot_width), shots[-1][1] if shots else None)
+        return self.image(url, self.screenshot_width, -1) if url else None
+
+    def load(self, work):
+        """Deliver metadata for [(entry, callback)], in that order"""
+        components = self.index({key for entry, _ in work for key in self.keys(entry)})
+        found = []
+        for entry, callback in work:
+            component = next((components[key] for key in self.keys(entry) if key in components), None)
+            if component is not None:
+                found.append((entry, callback, component))
+                if component.summaries:
+                    callback(entry, 'summary', component.summaries)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DECODE_WORKERS) as pool:
+            for (entry, callback, _), pixbuf in zip(found, pool.map(lambda item: self.icon(item[2]), found)):
+                if pixbuf is not None:
+                    callback(entry, 'icon', pixbuf)
+            if not self.remote_allowed():
+                return
+            for (entry, callback, _), pixbuf in zip(found, pool.map(lambda item: self.screenshot(item[2]), found)):
+                if pixbuf is not None:
+                    callback(entry, 'screenshot', pixbuf)
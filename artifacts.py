@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Shared cache of downloaded .deb archives for provisioning many machines
+
+The cache is a directory (a local disk or a network share) or an http(s)
+URL serving such a directory, for example `artifacts.py serve DIR` on one
+machine of the lab. Before a transaction the archives it needs are copied
+from the cache into its staging directory and checked against the hashes
+apt expects; apt then fetches only the misses from the mirrors. After a
+successful transaction the archives it used are exported back to a
+directory cache.
+"""
+import collections
+import functools
+import hashlib
+import http.server
+import os
+import re
+import shutil
+import subprocess
+import sys
+import urllib.parse
+import urllib.request
+
+ARCHIVE_LINE = re.compile(r"^'(?P<uri>[^']+)' (?P<file>\S+) (?P<size>\d+) (?P<type>[\w-]+):(?P<digest>[0-9a-f]+)")
+# apt hash names to hashlib names, strongest first
+HASH_TYPES = {'SHA512': 'sha512', 'SHA256': 'sha256', 'SHA1': 'sha1', 'MD5Sum': 'md5'}
+FETCH_TIMEOUT = 10
+DEFAULT_PORT = 8765
+
+Archive = collections.namedtuple('Archive', 'uri file size algorithm digest')
+
+def required_archives(packages, archive_dir=None, runner=subprocess.run, options=()):
+    """Archives apt has to fetch to install packages, with their expected hashes"""
+    cmd = ['apt-get', '--print-uris', '-qq', 'install', '-y'] + list(options)
+    if archive_dir:
+        cmd += ['-o', f"Dir::Cache::Archives={archive_dir}/"]
+    try:
+        result = runner(cmd + list(packages), capture_output=True, text=True, check=False)
+    except Exception:
+        return []
+    if result.returncode != 0:
+        return []
+    archives = []
+    for m in map(ARCHIVE_LINE.match, result.stdout.splitlines()):
+        if m and m.group('type') in HASH_TYPES:
+            archives.append(Archive(m.group('uri'), m.group('file'), int(m.group('size')),
+                                    HASH_TYPES[m.group('type')], m.group('digest')))
+    return archives
+
+def file_digest(path, algorithm):
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def verified(path, archive):
+    """True if the file at path is exactly the archive apt expects"""
+    try:
+        return os.path.getsize(path) == archive.size and file_digest(path, archive.algorithm) == archive.digest
+    except OSError:
+        return False
+
+def discard(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+def download(url, dest, archive, timeout=FETCH_TIMEOUT, should_stop=None):
+    """Fetch one archive over http(s) to dest; True if it arrived intact
+
+    timeout applies to connecting and to every read; should_stop() is
+    checked between chunks and abandons the download when it returns True.
+    """
+    partial = dest + ".part"
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response, open(partial, 'wb') as out:
+            for chunk in iter(lambda: response.read(64 * 1024), b''):
+                if should_stop and should_stop():
+                    raise OSError("download stopped")
+                out.write(chunk)
+    except (OSError, ValueError):
+        discard(partial)
+        return False
+    if not verified(partial, archive):
+        discard(partial)
+        return False
+    os.replace(partial, dest)
+    return True
+
+
+class ArtifactCache:
+    """Read-through archive cache at a directory or an http(s) URL"""
+
+    def __init__(self, location):
+        self.location = location
+        self.remote = location.startswith(('http://', 'https://'))
+
+    def fetch(self, archive, dest):
+        """Copy one archive from the cache to dest; True if it arrived intact"""
+        if self.remote:
+            return download(self.location.rstrip('/') + '/' + urllib.parse.quote(archive.file), dest, archive)
+        partial = dest + ".part"
+        try:
+            shutil.copyfile(os.path.join(self.location, archive.file), partial)
+        except OSError:
+            discard(partial)
+            return False
+        if not verified(partial, archive):
+            discard(partial)
+            return False
+        os.replace(partial, dest)
+        return True
+
+    def populate(self, archives, archive_dir):
+        """Fetch the archives the cache has into archive_dir; returns the misses"""
+        return [archive for archive in archives
+                if not self.fetch(archive, os.path.join(archive_dir, archive.file))]
+
+    def export(self, archives, archive_dir):
+        """Add the verified archives a transaction used to a directory cache; returns how many"""
+        if self.remote:
+            return 0
+        try:
+            os.makedirs(self.location, exist_ok=True)
+        except OSError:
+            return 0
+        exported = 0
+        for archive in archives:
+            target = os.path.join(self.location, archive.file)
+            source = os.path.join(archive_dir, archive.file)
+            if os.path.exists(target) or not verified(source, archive):
+                continue
+            # Other machines may be reading the cache; only complete files get the real name
+            partial = f"{target}.{os.getpid()}.part"
+            try:
+                shutil.copyfile(source, partial)
+                os.chmod(partial, 0o644)
+                os.replace(partial, target)
+                exported += 1
+            except OSError:
+                discard(partial)
+        return exported
+
+
+def serve(directory, port=DEFAULT_PORT):
+    """Serve a cache directory read-only over HTTP"""
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    with http.server.ThreadingHTTPServer(('', port), handler) as server:
+        print(f"Serving {directory} on port {port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+def main(argv):
+    """artifacts.py serve DIRECTORY [PORT]"""
+    if argv[:1] == ['serve'] and len(argv) in (2, 3) and (len(argv) == 2 or argv[2].isdigit()):
+        return serve(argv[1], int(argv[2]) if len(argv) == 3 else DEFAULT_PORT)
+    print(main.__doc__)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
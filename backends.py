@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Status queries and commands for the non-apt package backends
+
+A catalog entry may list builds from other backends next to its apt
+package, e.g. {'flatpak': 'net.kuribo64.melonDS', 'snap': 'melonds'}.
+Each backend answers for all its ids with one batched query, returning
+rows in the query_installed() format: id -> (installed, version, size
+in KiB).
+"""
+import glob
+import os
+import re
+
+FLATPAK_REMOTE = "flathub"
+APPIMAGE_DIRS = ("~/Applications", "~/AppImages", "~/.local/bin")
+SIZE = re.compile(r"^([\d.,]+)\s*([kKMGT]?)B?")
+APPIMAGE_VERSION = re.compile(r"[-_ ]v?(\d[\w.+~-]*?)(?:[-_](?:x86_64|amd64|aarch64|arm64|i386|i686))?\.appimage$", re.IGNORECASE)
+UNITS = {'': 1 / 1024, 'k': 1, 'K': 1, 'M': 1024, 'G': 1024 ** 2, 'T': 1024 ** 3}
+NOT_INSTALLED = (False, None, None)
+
+def parse_size(text):
+    """'1.2 GB' as printed by flatpak -> KiB"""
+    m = SIZE.match(text.strip().replace('\xa0', ' '))
+    if not m:
+        return None
+    try:
+        return int(float(m.group(1).replace(',', '.')) * UNITS[m.group(2)])
+    except ValueError:
+        return None
+
+def flatpak_status(ids, runner):
+    """Installed Flatpak apps, user and system installations, from one flatpak list call"""
+    info = dict.fromkeys(ids, NOT_INSTALLED)
+    try:
+        result = runner(['flatpak', 'list', '--app', '--columns=application,version,size'],
+                        capture_output=True, text=True, check=False)
+    except OSError:
+        return info
+    for line in result.stdout.splitlines():
+        fields = line.split('\t')
+        if len(fields) == 3 and fields[0] in info:
+            info[fields[0]] = (True, fields[1] or None, parse_size(fields[2]))
+    return info
+
+def snap_status(ids, runner):
+    """Installed snaps from one snap list call"""
+    info = dict.fromkeys(ids, NOT_INSTALLED)
+    try:
+        result = runner(['snap', 'list'], capture_output=True, text=True, check=False)
+    except OSError:
+        return info
+    for line in result.stdout.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] in info:
+            info[fields[0]] = (True, fields[1], None)
+    return info
+
+def appimage_path(app_id):
+    """Path of the AppImage for app_id in the usual directories, or None"""
+    prefix = app_id.lower()
+    for directory in APPIMAGE_DIRS:
+        for path in sorted(glob.glob(os.path.join(os.path.expanduser(directory), "*"))):
+            name = os.path.basename(path).lower()
+            if name.startswith(prefix) and name.endswith('.appimage') and os.path.isfile(path):
+                return path
+    return None
+
+def appimage_status(ids, runner):
+    """AppImages found in the usual directories; no command is run"""
+    #pylint: disable=unused-argument
+    info = {}
+    for app_id in ids:
+        path = appimage_path(app_id)
+        if path is None:
+            info[app_id] = NOT_INSTALLED
+            continue
+        m = APPIMAGE_VERSION.search(os.path.basename(path))
+        info[app_id] = (True, m.group(1) if m else None, os.path.getsize(path) // 1024)
+    return info
+
+# Backend name -> batched status query, in the order cards prefer them
+QUERIES = {
+    'flatpak': flatpak_status,
+    'snap': snap_status,
+    'appimage': appimage_status,
+}
+
+LABELS = {
+    'apt': "apt",
+    'flatpak': "Flatpak",
+    'snap': "Snap",
+    'appimage': "AppImage",
+}
+
+def command(backend, kind, app_id):
+    """Command installing or removing app_id; ['pkexec', ...] runs in the privileged session
+
+    AppImages are downloaded by hand, so they can only be removed.
+    """
+    if backend == 'flatpak':
+        if kind == 'install':
+            return ['flatpak', 'install', '-y', '--noninteractive', '--user', FLATPAK_REMOTE, app_id]
+        return ['flatpak', 'uninstall', '-y', '--noninteractive', app_id]
+    if backend == 'snap':
+        return ['pkexec', 'snap', 'install' if kind == 'install' else 'remove', app_id]
+    if backend == 'appimage' and kind == 'remove':
+        path = appimage_path(app_id)
+        return ['rm', '-f', path] if path else None
+    return None
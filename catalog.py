@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Toolkit-independent package catalog model"""
+import array
+import concurrent.futures
+import enum
+import threading
+
+# Default for set_state fields that should be left as they are
+KEEP = object()
+
+class PackageState(enum.IntEnum):
+    """Install state of a catalog entry"""
+    UNKNOWN = 0
+    NOT_INSTALLED = 1
+    INSTALLED = 2
+    INSTALLING = 3
+    REMOVING = 4
+    QUEUED = 5
+
+
+class CatalogModel:
+    """Package catalog stored column-wise so large catalogs stay small
+
+    Static fields live in plain lists, state and installed size in typed
+    arrays, and rarely used fields (repo, alt_package, backends, ...) in a
+    sparse dict. Views subscribe to changes instead of being stored in
+    entries.
+    """
+
+    def __init__(self, entries=()):
+        self.names = []
+        self.package_ids = []
+        self.descs = []
+        self.icons = []
+        self.versions = []
+        # Backend of the installed build: 'apt', 'flatpak', ... or None
+        self.origins = []
+        self.states = array.array('B')
+        self.sizes = array.array('q')
+        self.extras = {}
+        self.positions = {}
+        self.observers = []
+        self.lock = threading.Lock()
+        for entry in entries:
+            self.append(**entry)
+
+    def append(self, name, package, desc='', icon='', **extra):
+        """Add an entry and return it"""
+        index = len(self.names)
+        self.names.append(name)
+        self.package_ids.append(package)
+        self.descs.append(desc)
+        self.icons.append(icon)
+        self.versions.append(None)
+        self.origins.append(None)
+        self.states.append(PackageState.UNKNOWN)
+        self.sizes.append(-1)
+        if extra:
+            self.extras[index] = extra
+        self.positions[package] = index
+        return PackageEntry(self, index)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return (PackageEntry(self, i) for i in range(len(self.names)))
+
+    def __getitem__(self, index):
+        return PackageEntry(self, index)
+
+    def find(self, package):
+        """Entry for a catalog package id, or None"""
+        index = self.positions.get(package)
+        return None if index is None else PackageEntry(self, index)
+
+    def subscribe(self, callback):
+        """Call callback(entry) whenever an entry's state or info changes"""
+        self.observers.append(callback)
+
+    def notify(self, index):
+        entry = PackageEntry(self, index)
+        for callback in self.observers:
+            callback(entry)
+
+    def set_state(self, index, state, version=KEEP, size=KEEP, origin=KEEP):
+        """Update an entry; observers only hear about real changes"""
+        with self.lock:
+            changed = self.states[index] != state
+            self.states[index] = state
+            if version is not KEEP and version != self.versions[index]:
+                self.versions[index] = version
+                changed = True
+            if origin is not KEEP and origin != self.origins[index]:
+                self.origins[index] = origin
+                changed = True
+            if size is not KEEP:
+                size = -1 if size is None else size
+                if size != self.sizes[index]:
+                    self.sizes[index] = size
+                    changed = True
+        if changed:
+            self.notify(index)
+        return changed
+
+
+class PackageEntry:
+    """Lightweight view of one row of a CatalogModel"""
+    __slots__ = ('model', 'index')
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, PackageEntry) and other.model is self.model and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.model), self.index))
+
+    @property
+    def name(self):
+        return self.model.names[self.index]
+
+    @property
+    def package(self):
+        """Catalog id, which may name several space separated packages"""
+        return self.model.package_ids[self.index]
+
+    @property
+    def packages(self):
+        return self.package.split()
+
+    @property
+    def desc(self):
+        return self.model.descs[self.index]
+
+    @property
+    def icon(self):
+        return self.model.icons[self.index]
+
+    @property
+    def state(self):
+        return PackageState(self.model.states[self.index])
+
+    @property
+    def version(self):
+        return self.model.versions[self.index]
+
+    @property
+    def size(self):
+        """Installed size in KiB, or None when unknown"""
+        size = self.model.sizes[self.index]
+        return None if size < 0 else size
+
+    @property
+    def origin(self):
+        """Backend the installed build came from, or None"""
+        return self.model.origins[self.index]
+
+    @property
+    def backends(self):
+        """Alternative builds: backend name -> id in that backend"""
+        return self.extra('backends', {})
+
+    def extra(self, key, default=None):
+        return self.model.extras.get(self.index, {}).get(key, default)
+
+    def set_state(self, state, version=KEEP, size=KEEP, origin=KEEP):
+        return self.model.set_state(self.index, state, version, size, origin)
+
+
+def query_installed(packages, runner):
+    """Map each package to (installed, version, installed size in KiB) with one dpkg-query call"""
+    result = runner(['dpkg-query', '-W', '-f=${Package}\\t${Status}\\t${Version}\\t${Installed-Size}\\n'] + list(packages),
+                    capture_output=True, text=True, check=False)
+    info = {pkg: (False, None, None) for pkg in packages}
+    for line in result.stdout.splitlines():
+        fields = line.split('\t')
+        if len(fields) != 4:
+            continue
+        name, status, version, size = fields
+        # Multi-arch packages are reported as name:arch
+        name = name.split(':')[0]
+        installed = status.endswith(' installed')
+        info[name] = (installed, version if installed else None, int(size) if installed and size.isdigit() else None)
+    return info
+
+def apply_query(entry, info, alternatives=None):
+    """Update an entry from query_installed() results
+
+    alternatives maps (backend, id) to rows of the same format; the apt
+    packages win, then the entry's other backends in the order listed.
+    """
+    rows = [info.get(pkg, (False, None, None)) for pkg in entry.packages]
+    if all(row[0] for row in rows):
+        sizes = [row[2] for row in rows if row[2] is not None]
+        return entry.set_state(PackageState.INSTALLED, version=rows[0][1],
+                               size=sum(sizes) if sizes else None, origin='apt')
+    for backend, app_id in entry.backends.items():
+        installed, version, size = (alternatives or {}).get((backend, app_id), (False, None, None))
+        if installed:
+            return entry.set_state(PackageState.INSTALLED, version=version, size=size, origin=backend)
+    return entry.set_state(PackageState.NOT_INSTALLED, version=None, size=None, origin=None)
+
+
+class StatusIndex:
+    """Installed state shared by several catalogs, refreshed with one query
+
+    A package listed in more than one catalog is looked up once and every
+    entry that contains it is updated. query(packages) returns rows in the
+    query_installed() format, e.g. from the status daemon. backends maps
+    each other backend to a batched query(ids) of the same format; all of
+    them run in parallel with the apt query.
+    """
+
+    def __init__(self, query, backends=None):
+        self.query = query
+        self.backends = backends or {}
+        self.models = []
+        # Last known row per package, so pushed changes can be applied alone
+        self.known = {}
+        self.alternatives = {}
+        self.watchers = []
+
+    def watch(self, callback):
+        """Call callback() after every refresh or pushed update, e.g. to drop derived caches"""
+        self.watchers.append(callback)
+
+    def changed(self):
+        for callback in self.watchers:
+            callback()
+
+    def add(self, model):
+        self.models.append(model)
+
+    def entries(self):
+        for model in self.models:
+            yield from model
+
+    def find(self, name):
+        """Entry whose package id or display name matches name, or None"""
+        name = name.lower()
+        for entry in self.entries():
+            if name in (entry.package.lower(), entry.name.lower()):
+                return entry
+        return None
+
+    def affected(self, packages):
+        """Entries that include any of packages"""
+        packages = set(packages)
+        return [entry for entry in self.entries() if packages.intersection(entry.packages)]
+
+    def refresh(self, entries=None):
+        """Re-query entries (all of them by default) with one query per backend"""
+        entries = list(self.entries()) if entries is None else list(entries)
+        if not entries:
+            return
+        ids = {}
+        for entry in entries:
+            for backend, app_id in entry.backends.items():
+                if backend in self.backends:
+                    ids.setdefault(backend, set()).add(app_id)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(ids) + 1) as pool:
+            apt = pool.submit(self.query, sorted({pkg for entry in entries for pkg in entry.packages}))
+            others = {backend: pool.submit(self.backends[backend], sorted(app_ids)) for backend, app_ids in ids.items()}
+            try:
+                self.known.update(apt.result())
+            except Exception:
+                pass
+            for backend, future in others.items():
+                try:
+                    self.alternatives.update({(backend, app_id): row for app_id, row in future.result().items()})
+                except Exception:
+                    pass
+        for entry in entries:
+            apply_query(entry, self.known, self.alternatives)
+        self.changed()
+
+    def update(self, info):
+        """Apply changed rows pushed for some packages"""
+        self.known.update(info)
+        for entry in self.affected(info):
+            apply_query(entry, self.known, self.alternatives)
+        self.changed()
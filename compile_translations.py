@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Compile the translations module into gettext .mo catalogs
+
+Message ids are collected from the token tools' sources (self._(...),
+N_(...) and self._.bind(..., "...")) and looked up in every available
+language. One locale/<code>/LC_MESSAGES/tokentools.mo file is written per
+language, plus a languages.json index so the apps can build the language
+menu without importing the translations module.
+"""
+import ast
+import json
+import os
+import re
+import struct
+import sys
+
+from i18n import DOMAIN, LANGUAGES_INDEX, LOCALE_DIR
+
+SOURCES = ['launcher.py', 'pages.py', 'diagnostics.py']
+MESSAGE = re.compile(r'''(?:self\._|N_|\b_)\(\s*((?:"(?:\\.|[^"\\])*")|(?:'(?:\\.|[^'\\])*'))\s*\)'''
+                     r'''|self\._\.bind\([^,]+,\s*((?:"(?:\\.|[^"\\])*")|(?:'(?:\\.|[^'\\])*'))''')
+
+def collect_messages(base_dir):
+    """Message ids used in the sources"""
+    messages = set()
+    for name in SOURCES:
+        try:
+            with open(os.path.join(base_dir, name), 'r', encoding='utf-8') as f:
+                source = f.read()
+        except OSError:
+            continue
+        for match in MESSAGE.finditer(source):
+            messages.add(ast.literal_eval(match.group(1) or match.group(2)))
+    return messages
+
+def write_mo(path, catalog):
+    """Write a GNU gettext .mo file for a msgid -> msgstr mapping"""
+    catalog = dict(catalog)
+    catalog[''] = "Content-Type: text/plain; charset=UTF-8\n"
+    keys = sorted(catalog)
+    ids = b''
+    strs = b''
+    offsets = []
+    for key in keys:
+        msgid = key.encode('utf-8')
+        msgstr = catalog[key].encode('utf-8')
+        offsets.append((len(ids), len(msgid), len(strs), len(msgstr)))
+        ids += msgid + b'\0'
+        strs += msgstr + b'\0'
+    count = len(keys)
+    ids_start = 7 * 4 + count * 16
+    strs_start = ids_start + len(ids)
+    table = []
+    for id_offset, id_length, str_offset, str_length in offsets:
+        table.append((id_length, ids_start + id_offset, str_length, strs_start + str_offset))
+    header = struct.pack('Iiiiiii', 0x950412de, 0, count, 7 * 4, 7 * 4 + count * 8, 0, 0)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(header)
+        for id_length, id_offset, _, _ in table:
+            f.write(struct.pack('ii', id_length, id_offset))
+        for _, _, str_length, str_offset in table:
+            f.write(struct.pack('ii', str_length, str_offset))
+        f.write(ids)
+        f.write(strs)
+
+def main():
+    """Compile every available language"""
+    from translations import get_available_translations, get_translation
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    messages = collect_messages(base_dir)
+    languages = get_available_translations()
+    for code in languages:
+        translate = get_translation(code)
+        catalog = {}
+        for message in messages:
+            translated = translate(message)
+            if translated and translated != message:
+                catalog[message] = translated
+        write_mo(os.path.join(LOCALE_DIR, code, 'LC_MESSAGES', f"{DOMAIN}.mo"), catalog)
+        print(f"{code}: {len(catalog)}/{len(messages)} messages")
+    with open(LANGUAGES_INDEX, 'w', encoding='utf-8') as f:
+        json.dump({code: {'native': info['native']} for code, info in languages.items()}, f,
+                  indent=2, ensure_ascii=False)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""In-memory dependency graph of the installed packages
+
+Built straight from the dpkg status file and apt's auto-installed marks,
+so questions like "what would autoremove take after this removal" or
+"what else does removing this take with it" are answered without
+running apt.
+"""
+import os
+import re
+import subprocess
+
+from statusd import DPKG_STATUS, read_stanzas
+
+EXTENDED_STATES = "/var/lib/apt/extended_states"
+ARCHIVE_CACHE = "/var/cache/apt/archives"
+DEPENDENCY_FIELDS = ('Pre-Depends', 'Depends', 'Recommends', 'Suggests')
+# Dependencies whose loss makes apt remove the depending package
+HARD_FIELDS = ('Pre-Depends', 'Depends')
+STATUS_FIELDS = ('Package', 'Status', 'Installed-Size', 'Provides', 'Essential', 'Important', 'Protected') + DEPENDENCY_FIELDS
+# apt's default APT::NeverAutoRemove, with every kernel kept rather than guessing which ones apt would
+NEVER_AUTOREMOVE = re.compile(r"^(firmware-linux.*|linux-firmware|linux-(image|headers|modules)-.*)$")
+VERSION = re.compile(r"\s*\(.*?\)|\s*\[.*?\]|\s*<.*?>")
+
+def parse_relations(value):
+    """'a (>= 1) | b:any, c' -> [['a', 'b'], ['c']] (versions and qualifiers dropped)"""
+    groups = []
+    for group in VERSION.sub('', value).split(','):
+        names = [alt.strip().split(':')[0] for alt in group.split('|')]
+        names = [name for name in names if name]
+        if names:
+            groups.append(names)
+    return groups
+
+def important_fields(runner=subprocess.run):
+    """Dependency fields autoremove follows, per APT::AutoRemove::RecommendsImportant/SuggestsImportant"""
+    fields = list(DEPENDENCY_FIELDS)
+    try:
+        result = runner(['apt-config', 'shell', 'Recommends', 'APT::AutoRemove::RecommendsImportant',
+                         'Suggests', 'APT::AutoRemove::SuggestsImportant'], capture_output=True, text=True, check=False)
+        output = result.stdout
+    except Exception:
+        output = ''
+    for line in output.splitlines():
+        field, _, value = line.partition('=')
+        if field in fields and value.strip("'").lower() in ('false', 'no', '0', 'off'):
+            fields.remove(field)
+    return tuple(fields)
+
+def auto_installed(path=EXTENDED_STATES):
+    """Packages apt marked as automatically installed"""
+    auto = set()
+    try:
+        for fields in read_stanzas(path, ('Package', 'Auto-Installed')):
+            if fields.get('Auto-Installed') == '1' and fields.get('Package'):
+                auto.add(fields['Package'])
+    except OSError:
+        pass
+    return auto
+
+def archive_cache_size(path=ARCHIVE_CACHE):
+    """Bytes of downloaded archives apt-get clean would delete"""
+    total = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.endswith('.deb') and entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+
+class DependencyGraph:
+    """Installed packages, their dependencies and which ones apt installed automatically"""
+
+    def __init__(self, sizes, depends, provides, auto, essential, hard=None):
+        self.sizes = sizes
+        self.depends = depends
+        self.provides = provides
+        self.auto = auto & set(sizes)
+        self.essential = essential
+        self.hard = hard if hard is not None else depends
+        self._reverse = None
+
+    @classmethod
+    def load(cls, status=DPKG_STATUS, extended_states=EXTENDED_STATES, followed=DEPENDENCY_FIELDS):
+        """Read the graph; followed are the dependency fields that keep a package installed"""
+        sizes, depends, hard, provides, essential = {}, {}, {}, {}, set()
+        for fields in read_stanzas(status, STATUS_FIELDS):
+            name = fields.get('Package')
+            if not name or not fields.get('Status', '').endswith(' installed'):
+                continue
+            size = fields.get('Installed-Size', '')
+            sizes[name] = sizes.get(name, 0) + (int(size) * 1024 if size.isdigit() else 0)
+            groups = depends.setdefault(name, [])
+            for field in followed:
+                groups.extend(parse_relations(fields.get(field, '')))
+            required = hard.setdefault(name, [])
+            for field in HARD_FIELDS:
+                required.extend(parse_relations(fields.get(field, '')))
+            for group in parse_relations(fields.get('Provides', '')):
+                provides.setdefault(group[0], set()).add(name)
+            if (any(fields.get(field) == 'yes' for field in ('Essential', 'Important', 'Protected'))
+                    or NEVER_AUTOREMOVE.match(name)):
+                essential.add(name)
+        return cls(sizes, depends, provides, auto_installed(extended_states), essential, hard)
+
+    def satisfiers(self, name):
+        """Installed packages that satisfy a dependency on name"""
+        found = set(self.provides.get(name, ()))
+        if name in self.sizes:
+            found.add(name)
+        return found
+
+    def orphans(self, removing=()):
+        """Automatically installed packages nothing would need once removing is gone
+
+        Every installed alternative of an or-group is kept, so the set can
+        only be smaller than what apt autoremove takes, never larger.
+        """
+        removing = set(removing)
+        keep = set()
+        stack = [name for name in self.sizes
+                 if name not in removing and (name not in self.auto or name in self.essential)]
+        while stack:
+            name = stack.pop()
+            if name in keep:
+                continue
+            keep.add(name)
+            for group in self.depends.get(name, ()):
+                for alternative in group:
+                    stack.extend(self.satisfiers(alternative) - removing - keep)
+        return {name for name in self.sizes if name not in keep and name not in removing}
+
+    def released(self, packages):
+        """Orphans that removing packages creates, leaving the ones that were already orphaned
+
+        Packages the removal takes along (removal_closure) count as removed
+        too; the result never includes them or packages themselves.
+        """
+        removing = set(packages) | self.removal_closure(packages)
+        return self.orphans(removing) - self.orphans()
+
+    @property
+    def reverse(self):
+        """Package -> installed packages that hard-depend on it, built on first use"""
+        if self._reverse is None:
+            reverse = {}
+            for name, groups in self.hard.items():
+                for group in groups:
+                    for alternative in group:
+                        for provider in self.satisfiers(alternative):
+                            reverse.setdefault(provider, set()).add(name)
+            self._reverse = reverse
+        return self._reverse
+
+    def removal_closure(self, packages):
+        """Installed packages apt removes along with packages, packages themselves excluded
+
+        A package goes when one of its Depends/Pre-Depends groups has no
+        installed alternative left. Versions are not compared.
+        """
+        removed = {name for name in packages if name in self.sizes}
+        stack = list(removed)
+        while stack:
+            for dependent in self.reverse.get(stack.pop(), ()):
+                if dependent in removed:
+                    continue
+                if any(not any(self.satisfiers(alternative) - removed for alternative in group)
+                       for group in self.hard.get(dependent, ())):
+                    removed.add(dependent)
+                    stack.append(dependent)
+        return removed - set(packages)
+
+    def size(self, packages):
+        """Installed bytes of packages"""
+        return sum(self.sizes.get(name, 0) for name in packages)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Help -> Diagnostics panel shared by the token tools"""
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+def format_seconds(value):
+    """Human readable duration"""
+    if value is None:
+        return "-"
+    if value < 1:
+        return f"{value * 1000:.0f} ms"
+    return f"{value:.1f} s"
+
+def show_diagnostics(parent, tracer, _):
+    """Show recorded command spans and per-phase timings"""
+    dialog = Gtk.Dialog(title=_("Diagnostics"), transient_for=parent, flags=0)
+    dialog.add_button(_("Close"), Gtk.ResponseType.CLOSE)
+    dialog.set_default_size(700, 450)
+
+    notebook = Gtk.Notebook()
+
+    # Per-phase breakdown
+    phase_store = Gtk.ListStore(str, str, str, int)
+    for name, total, mean, count in tracer.phase_summary():
+        phase_store.append([name, format_seconds(total), format_seconds(mean), count])
+
+    phase_view = Gtk.TreeView(model=phase_store)
+    for i, title in enumerate([_("Phase"), _("Total"), _("Average"), _("Count")]):
+        phase_view.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i))
+
+    # Recent commands
+    span_store = Gtk.ListStore(str, str, str, str, str, str)
+    for span in tracer.recent():
+        phases = ", ".join(f"{p['phase']} {format_seconds(p['duration'])}" for p in span.get('phases', []))
+        span_store.append([
+            " ".join(span.get('argv', [])),
+            format_seconds(span.get('spawn_latency')),
+            format_seconds(span.get('wall_time')),
+            str(span.get('returncode')),
+            str(span.get('output_bytes', 0)),
+            phases,
+        ])
+
+    span_view = Gtk.TreeView(model=span_store)
+    for i, title in enumerate([_("Command"), _("Spawn"), _("Wall time"), _("Exit"), _("Bytes"), _("Phases")]):
+        span_view.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i))
+
+    # Download/install pipeline stages
+    pipeline_store = Gtk.ListStore(str, str, str, str)
+    for packages, download, overlapped, install in tracer.pipeline_summary():
+        pipeline_store.append([packages, format_seconds(download), format_seconds(overlapped), format_seconds(install)])
+
+    pipeline_view = Gtk.TreeView(model=pipeline_store)
+    for i, title in enumerate([_("Packages"), _("Download"), _("Overlapped"), _("Install")]):
+        pipeline_view.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i))
+
+    for view, label in [(phase_view, _("Phases")), (span_view, _("Commands")), (pipeline_view, _("Pipeline"))]:
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.add(view)
+        notebook.append_page(scrolled, Gtk.Label(label=label))
+
+    path_label = Gtk.Label()
+    path_label.set_text(tracer.path)
+    path_label.set_selectable(True)
+
+    content = dialog.get_content_area()
+    content.pack_start(notebook, True, True, 0)
+    content.pack_start(path_label, False, False, 5)
+    dialog.show_all()
+    dialog.run()
+    dialog.destroy()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Frame-coalesced UI updates posted from worker threads"""
+import collections
+import threading
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import GLib
+
+class UpdateDispatcher:
+    """Collects UI updates and applies them once per frame clock tick
+
+    Updates are keyed (e.g. one key per card or label); posting again for
+    the same key replaces the pending update, so only the latest state is
+    applied no matter how fast workers post.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.pending = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.scheduled = False
+
+    def post(self, key, func, *args):
+        """Queue func(*args) to run on the main thread, replacing any pending update for key"""
+        with self.lock:
+            self.pending.pop(key, None)
+            self.pending[key] = (func, args)
+            if self.scheduled:
+                return
+            self.scheduled = True
+        GLib.idle_add(self.arm)
+
+    def arm(self):
+        """Wait for the next frame, or flush now if nothing is being drawn"""
+        if self.widget.get_mapped():
+            self.widget.add_tick_callback(self.on_tick)
+        else:
+            self.flush()
+        return False
+
+    def on_tick(self, widget, frame_clock):
+        """Frame clock callback"""
+        #pylint: disable=unused-argument
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def flush(self):
+        """Apply all pending updates in posting order"""
+        with self.lock:
+            pending = self.pending
+            self.pending = collections.OrderedDict()
+            self.scheduled = False
+        for func, args in pending.values():
+            try:
+                func(*args)
+            except Exception:
+                continue
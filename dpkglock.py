@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""Detect and wait on the dpkg/apt locks held by other package managers"""
+import ctypes
+import fcntl
+import os
+import select
+import struct
+import threading
+import time
+
+FRONTEND_LOCK = "/var/lib/dpkg/lock-frontend"
+LISTS_LOCK = "/var/lib/apt/lists/lock"
+
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_CLOEXEC = 0o2000000
+
+# struct flock: l_type, l_whence, l_start, l_len, l_pid
+FLOCK_FORMAT = 'hhqqi4x'
+
+def process_name(pid):
+    """Command name of a running process"""
+    try:
+        with open(f"/proc/{pid}/comm", 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return "?"
+
+def fcntl_holder(path):
+    """Pid holding a write lock on path via F_GETLK, 0 if free, None if unknown"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        query = struct.pack(FLOCK_FORMAT, fcntl.F_WRLCK, os.SEEK_SET, 0, 0, 0)
+        l_type, _, _, _, l_pid = struct.unpack(FLOCK_FORMAT, fcntl.fcntl(fd, fcntl.F_GETLK, query))
+        return 0 if l_type == fcntl.F_UNLCK else l_pid
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
+def proc_locks_holder(path):
+    """Pid holding a lock on path according to /proc/locks, 0 if free
+
+    Used when the lock file is not readable by the current user.
+    """
+    try:
+        st = os.stat(path)
+        with open("/proc/locks", 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+    except OSError:
+        return 0
+    for line in lines:
+        fields = line.split()
+        if len(fields) < 6 or fields[1] == '->':
+            continue
+        try:
+            major, minor, inode = fields[5].split(':')
+            if (int(inode) == st.st_ino and int(major, 16) == os.major(st.st_dev)
+                    and int(minor, 16) == os.minor(st.st_dev)):
+                return int(fields[4])
+        except ValueError:
+            continue
+    return 0
+
+def lock_holder(path=FRONTEND_LOCK):
+    """Return (pid, name) of the process holding path, or None when it is free"""
+    pid = fcntl_holder(path)
+    if pid is None:
+        pid = proc_locks_holder(path)
+    if not pid:
+        return None
+    return pid, process_name(pid)
+
+
+class InotifyWatch:
+    """Minimal inotify watch on a directory through libc"""
+
+    def __init__(self, directory, mask):
+        self.fd = -1
+        try:
+            libc = ctypes.CDLL(None, use_errno=True)
+            self.fd = libc.inotify_init1(IN_CLOEXEC)
+            if self.fd >= 0 and libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+                os.close(self.fd)
+                self.fd = -1
+        except (OSError, AttributeError):
+            self.fd = -1
+
+    def wait(self, timeout, cancel=None):
+        """Block until an event arrives, cancel is set or timeout seconds pass"""
+        fds = [fd for fd in (self.fd, cancel.fileno() if cancel else -1) if fd >= 0]
+        if not fds:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self.fd in ready:
+            # Drain the queue; names are not needed, the lock is re-probed
+            os.read(self.fd, 65536)
+
+    def fileno(self):
+        return self.fd
+
+    def drain(self):
+        """Discard queued events after the fd polled readable"""
+        try:
+            os.read(self.fd, 65536)
+        except OSError:
+            pass
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class CancelEvent:
+    """threading.Event that a select() can wait on next to other file descriptors"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+        os.set_blocking(self.write_fd, False)
+
+    def set(self):
+        if not self.event.is_set():
+            self.event.set()
+            try:
+                os.write(self.write_fd, b"x")
+            except BlockingIOError:
+                pass
+
+    def clear(self):
+        self.event.clear()
+        try:
+            while os.read(self.read_fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def is_set(self):
+        return self.event.is_set()
+
+    def fileno(self):
+        """Readable while the event is set"""
+        return self.read_fd
+
+
+def wait_for_locks(paths, on_wait=None, cancel=None, recheck=5.0):
+    """Block until none of the lock files are held and return the seconds waited
+
+    Lock files are watched through inotify on their directories (the files
+    themselves are root-only), so the wait ends as soon as the holder closes
+    the lock. The lock is also re-probed every `recheck` seconds in case an
+    event was missed. on_wait(pid, name) is called whenever the holder
+    changes; setting cancel (a CancelEvent) aborts the wait at once.
+    """
+    start = time.monotonic()
+    watches = {}
+    last_holder = None
+    try:
+        while True:
+            holder = None
+            for path in paths:
+                holder = lock_holder(path)
+                if holder:
+                    break
+            if not holder or (cancel and cancel.is_set()):
+                break
+            if holder != last_holder:
+                last_holder = holder
+                if on_wait:
+                    on_wait(*holder)
+            directory = os.path.dirname(path)
+            if directory not in watches:
+                watches[directory] = InotifyWatch(directory, IN_CLOSE_WRITE | IN_CLOSE_NOWRITE | IN_DELETE)
+            watches[directory].wait(recheck, cancel)
+    finally:
+        for watch in watches.values():
+            watch.close()
+    return time.monotonic() - start
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""Historical phase durations and ETA estimates for package operations"""
+import contextlib
+import re
+import sqlite3
+import statistics
+import subprocess
+import threading
+import time
+
+ESTIMATED_PHASES = ('resolve', 'download', 'unpack', 'configure', 'triggers', 'remove')
+# Phases of the install stage when the download stage ran separately
+INSTALL_STAGE_PHASES = ('unpack', 'configure', 'triggers')
+# Used for planning until a download speed has been measured
+ASSUMED_THROUGHPUT = 1024 * 1024
+URI_LINE = re.compile(r"^'(?P<uri>[^']+)' (?P<file>\S+) (?P<size>\d+) ")
+
+def download_size(packages, runner=subprocess.run):
+    """Bytes apt still has to fetch to install packages (cached archives excluded)"""
+    try:
+        result = runner(['apt-get', '--print-uris', '-qq', 'install', '-y'] + list(packages),
+                        capture_output=True, text=True, check=False)
+    except Exception:
+        return None
+    if result.returncode != 0:
+        return None
+    return sum(int(m.group('size')) for m in map(URI_LINE.match, result.stdout.splitlines()) if m)
+
+def format_size(size):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+def format_duration(seconds):
+    """Rough human readable duration"""
+    if seconds < 60:
+        return f"{max(int(seconds), 1)} s"
+    if seconds < 3600:
+        return f"{int(round(seconds / 60))} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+class Estimate:
+    """Expected seconds per phase for one operation"""
+
+    def __init__(self, phases, download_bytes=None):
+        self.phases = phases
+        self.download_bytes = download_bytes
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def worked(self, span):
+        """Seconds of the span spent on real work, excluding the polkit prompt"""
+        auth = sum((p['duration'] or span.elapsed() - p['offset']) for p in span.phases if p['phase'] == 'auth')
+        return max(span.elapsed() - auth, 0.0)
+
+    def remaining(self, span):
+        """Seconds left given the phases the span has been through so far"""
+        current = span.current_phase()
+        done = {p['phase'] for p in span.phases[:-1]}
+        in_current = span.elapsed() - span.phases[-1]['offset'] if span.phases else 0.0
+        left = 0.0
+        for phase, seconds in self.phases.items():
+            if phase == current:
+                left += max(seconds - in_current, 0.0)
+            elif phase not in done:
+                left += seconds
+        return left
+
+    def fraction(self, span):
+        """Completed fraction of the operation, never quite reaching 1"""
+        worked = self.worked(span)
+        left = self.remaining(span)
+        if worked + left <= 0:
+            return 0.0
+        return min(worked / (worked + left), 0.99)
+
+
+class DurationModel:
+    """Per-package phase durations and download throughput kept in SQLite"""
+
+    def __init__(self, path, history=10):
+        self.path = path
+        self.history = history
+        self.lock = threading.Lock()
+        with self.connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS phases ("
+                       "package TEXT, kind TEXT, phase TEXT, seconds REAL, time REAL)")
+            db.execute("CREATE TABLE IF NOT EXISTS throughput (bytes_per_second REAL, time REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS phases_key ON phases (package, kind, phase)")
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Connection that commits and closes when the block ends"""
+        db = sqlite3.connect(self.path, timeout=5)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def merge(self, path):
+        """Add the history of another duration database, such as one from before a migration"""
+        with self.lock, self.connect() as db:
+            db.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                db.execute("INSERT INTO phases SELECT package, kind, phase, seconds, time FROM other.phases")
+                db.execute("INSERT INTO throughput SELECT bytes_per_second, time FROM other.throughput")
+            except sqlite3.Error:
+                pass
+
+    def record(self, package, kind, span, download_bytes=None):
+        """Store the phase durations of a finished span"""
+        now = time.time()
+        totals = {}
+        for phase in span.phases:
+            if phase['phase'] in ESTIMATED_PHASES and phase['duration'] is not None:
+                totals[phase['phase']] = totals.get(phase['phase'], 0.0) + phase['duration']
+        with self.lock, self.connect() as db:
+            db.executemany("INSERT INTO phases VALUES (?, ?, ?, ?, ?)",
+                           [(package, kind, phase, seconds, now) for phase, seconds in totals.items()])
+            if download_bytes and totals.get('download', 0) > 0.5:
+                db.execute("INSERT INTO throughput VALUES (?, ?)", (download_bytes / totals['download'], now))
+
+    def phase_history(self, db, package, kind, phase):
+        rows = db.execute("SELECT seconds FROM phases WHERE package = ? AND kind = ? AND phase = ? "
+                          "ORDER BY time DESC LIMIT ?", (package, kind, phase, self.history)).fetchall()
+        if not rows:
+            # Fall back to what this phase takes for any package
+            rows = db.execute("SELECT seconds FROM phases WHERE kind = ? AND phase = ? "
+                              "ORDER BY time DESC LIMIT ?", (kind, phase, self.history * 5)).fetchall()
+        return [r[0] for r in rows]
+
+    def throughput(self, db):
+        """Median measured download speed in bytes per second"""
+        rows = db.execute("SELECT bytes_per_second FROM throughput ORDER BY time DESC LIMIT ?",
+                          (self.history,)).fetchall()
+        return statistics.median(r[0] for r in rows) if rows else None
+
+    def estimate(self, package, kind, download_bytes=None):
+        """Estimate for an operation, or None without any history to go on"""
+        phases = {}
+        with self.lock, self.connect() as db:
+            for phase in ESTIMATED_PHASES:
+                history = self.phase_history(db, package, kind, phase)
+                if history:
+                    phases[phase] = statistics.median(history)
+            speed = self.throughput(db)
+        if download_bytes is not None and kind == 'install':
+            # A known size and link speed beat per-package history for downloads
+            if download_bytes == 0:
+                phases.pop('download', None)
+            elif speed:
+                phases['download'] = download_bytes / speed
+        if not phases:
+            return None
+        return Estimate(phases, download_bytes)
+
+    def stage_times(self, package, download_bytes=None):
+        """Expected (download, install) seconds of an install, for pipeline planning"""
+        estimate = self.estimate(package, 'install', download_bytes)
+        phases = estimate.phases if estimate else {}
+        download = phases.get('download')
+        if download is None:
+            download = (download_bytes or 0) / ASSUMED_THROUGHPUT
+        return download, sum(phases.get(phase, 0.0) for phase in INSTALL_STAGE_PHASES)
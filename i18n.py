@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Switchable translations with widgets that follow the active language
+
+Catalogs are read from compiled gettext files in locale/ (see
+compile_translations.py), and only the active language is loaded. Without
+compiled catalogs the translations module is used instead.
+"""
+import gettext
+import json
+import os
+import threading
+
+DOMAIN = "tokentools"
+LOCALE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locale")
+LANGUAGES_INDEX = os.path.join(LOCALE_DIR, "languages.json")
+
+_translations = {}
+_translations_lock = threading.Lock()
+
+def N_(message):
+    """Mark a message id for extraction without translating it yet"""
+    return message
+
+def load_translation(language):
+    """Lookup function for language from its .mo file, or from the translations module"""
+    candidates = [language] if language else []
+    if language and '_' in language:
+        candidates.append(language.split('_')[0])
+    try:
+        return gettext.translation(DOMAIN, LOCALE_DIR, languages=candidates).gettext
+    except OSError:
+        from translations import get_translation
+        return get_translation(language)
+
+def cached_translation(language):
+    """Translation for language, loaded once per language"""
+    with _translations_lock:
+        if language not in _translations:
+            _translations[language] = load_translation(language)
+        return _translations[language]
+
+def available_languages():
+    """Language codes mapped to their info ({'native': ...})"""
+    try:
+        with open(LANGUAGES_INDEX, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        from translations import get_available_translations
+        return get_available_translations()
+
+
+class Translator:
+    """Callable used as self._ that can retranslate bound widgets in place
+
+    bind() records a setter together with the message id it displays, so a
+    language change only re-runs those setters instead of rebuilding the UI.
+    """
+
+    def __init__(self, language):
+        self.language = language
+        self.gettext = cached_translation(language)
+        self.bindings = []
+
+    def __call__(self, message):
+        return self.gettext(message)
+
+    def bind(self, setter, message, template="{}"):
+        """Call setter with the translated message now and after every language change"""
+        self.bindings.append((setter, message, template))
+        setter(template.format(self.gettext(message)))
+
+    def set_language(self, language):
+        """Switch language and refresh every bound widget"""
+        if language == self.language:
+            return
+        self.language = language
+        self.gettext = cached_translation(language)
+        for setter, message, template in self.bindings:
+            setter(template.format(self.gettext(message)))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Queue of package operations shared by every catalog page"""
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+
+# Job priorities, most urgent first
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+READ_CONCURRENCY = 4
+
+class Job:
+    """One queued package operation
+
+    kind is 'install', 'remove', 'update' or 'resume'. entry is the catalog
+    entry the job was started from, if any; key names it in the duration
+    history. prerequisites are packages that must be installed first (such
+    as a repository's keyring); journal_entries are the interrupted
+    operations a 'resume' job replays. roots are alternate root
+    directories (chroots, image trees) targeted instead of the running
+    system. backend is 'apt' or the backend of an alternative build, whose
+    id is then the only package. Waiting jobs run in priority order, first
+    come first served within a priority. op_id is the job's journal entry,
+    for the operations that are journaled from the moment they are queued.
+    """
+
+    def __init__(self, kind, packages=(), entry=None, key=None, label=None, prerequisites=(), journal_entries=(),
+                 roots=(), backend='apt', priority=NORMAL):
+        self.kind = kind
+        self.packages = list(packages)
+        self.entry = entry
+        self.key = key if key is not None else ' '.join(self.packages)
+        self.label = label if label is not None else (entry.name if entry is not None else self.key)
+        self.prerequisites = list(prerequisites)
+        self.journal_entries = list(journal_entries)
+        self.roots = list(roots)
+        self.backend = backend
+        self.priority = priority
+        self.op_id = None
+        # Download stage state for pipelined installs
+        self.download_bytes = None
+        self.archive_dir = None
+        self.archives = []
+        self.prefetch_done = None
+        self.stage_times = {}
+        # What staging the archives found, logged when the job itself runs
+        self.stage_notes = []
+
+    def same_as(self, other):
+        return (self.kind == other.kind and self.packages == other.packages and self.roots == other.roots
+                and self.backend == other.backend)
+
+
+def pipeline_order(jobs, stage_times):
+    """Order install jobs for the download/install pipeline (Johnson's rule)
+
+    stage_times(job) gives expected (download, install) seconds. Jobs that
+    download faster than they install go first, shortest download first;
+    the rest follow, longest install first. When downloads dominate, or no
+    install history exists yet, this is simply largest download first.
+    """
+    times = {id(job): stage_times(job) for job in jobs}
+    first = sorted((job for job in jobs if times[id(job)][0] < times[id(job)][1]),
+                   key=lambda job: times[id(job)][0])
+    last = sorted((job for job in jobs if times[id(job)][0] >= times[id(job)][1]),
+                  key=lambda job: (times[id(job)][1], times[id(job)][0]), reverse=True)
+    return first + last
+
+
+class JobQueue:
+    """Runs package operations one after another and read-only work beside them
+
+    Only one job touches dpkg at a time; later submissions wait in
+    priority order and a job already waiting is not queued twice. With a
+    prefetcher, install jobs are split into a download stage and an install
+    stage: once the running job reaches dpkg, start_prefetch() orders the
+    waiting installs with the planner and downloads the next one in the
+    background. Read-only work (status scans, simulations, metadata) goes
+    through read() and runs on up to read_limit threads of its own, most
+    urgent first, whatever the package operations are doing.
+    """
+
+    def __init__(self, runner, on_change=None, prefetcher=None, planner=None, read_limit=READ_CONCURRENCY):
+        self.runner = runner
+        self.on_change = on_change
+        self.prefetcher = prefetcher
+        self.planner = planner
+        self.waiting = collections.deque()
+        self.current = None
+        self.prefetching = False
+        self.prefetched_for = None
+        self.lock = threading.Lock()
+        self.read_limit = read_limit
+        self.reads = []
+        self.read_keys = {}
+        self.readers = 0
+        self.sequence = itertools.count()
+
+    def submit(self, job):
+        """Queue a job; returns False if an identical job is already waiting or running"""
+        with self.lock:
+            if any(job.same_as(other) for other in self.pending()):
+                return False
+            # Behind every waiting job of the same or a more urgent priority
+            index = next((i for i, other in enumerate(self.waiting) if other.priority > job.priority),
+                         len(self.waiting))
+            self.waiting.insert(index, job)
+            start = self.current is None
+            if start:
+                self.current = self.waiting.popleft()
+        self.changed()
+        if start:
+            threading.Thread(target=self.work, daemon=True).start()
+        return True
+
+    def pending(self):
+        """Running job followed by the waiting ones"""
+        return ([self.current] if self.current else []) + list(self.waiting)
+
+    def busy(self):
+        return self.current is not None
+
+    def position(self, entry):
+        """1-based place in the queue of the first waiting job for entry, None if it has none"""
+        with self.lock:
+            return next((i for i, job in enumerate(self.waiting, 1) if job.entry == entry), None)
+
+    def queued_entries(self):
+        """Catalog entries of the waiting jobs"""
+        with self.lock:
+            return [job.entry for job in self.waiting if job.entry is not None]
+
+    def leading_installs(self):
+        """Waiting install jobs on the running system of one priority, up to the first other job"""
+        run = []
+        for job in self.waiting:
+            if job.kind != 'install' or job.roots or job.backend != 'apt' or (run and job.priority != run[0].priority):
+                break
+            run.append(job)
+        return run
+
+    def start_prefetch(self):
+        """Begin the download stage of the next install; at most once per running job"""
+        with self.lock:
+            if not self.prefetcher or self.prefetching or self.prefetched_for is self.current:
+                return
+            run = self.leading_installs()
+            if not run:
+                return
+            self.prefetching = True
+            self.prefetched_for = self.current
+        threading.Thread(target=self.prefetch, args=(run,), daemon=True).start()
+
+    def prefetch(self, run):
+        """Plan the waiting installs, then download the first of them"""
+        try:
+            # Planning may size downloads, so it runs without the lock
+            ordered = self.planner(run) if self.planner else run
+            with self.lock:
+                current_run = self.leading_installs()
+                # Installs submitted meanwhile keep their place after the planned ones
+                planned = [job for job in ordered if job in current_run]
+                planned += [job for job in current_run if job not in planned]
+                for _ in current_run:
+                    self.waiting.popleft()
+                self.waiting.extendleft(reversed(planned))
+                job = planned[0] if planned and planned[0].prefetch_done is None else None
+                if job:
+                    job.prefetch_done = threading.Event()
+            self.changed()
+            if job:
+                try:
+                    self.prefetcher(job)
+                finally:
+                    job.prefetch_done.set()
+        finally:
+            with self.lock:
+                self.prefetching = False
+
+    def work(self):
+        """Worker loop: run jobs until the queue is empty"""
+        while True:
+            job = self.current
+            if job.prefetch_done is not None:
+                # The install stage needs its download stage finished
+                start = time.monotonic()
+                job.prefetch_done.wait()
+                job.stage_times['waited'] = time.monotonic() - start
+            try:
+                self.runner(job)
+            except Exception:
+                pass
+            with self.lock:
+                self.current = self.waiting.popleft() if self.waiting else None
+                job = self.current
+            self.changed()
+            if job is None:
+                return
+
+    def read(self, func, *args, priority=INTERACTIVE, key=None):
+        """Run read-only func(*args) beside the package operations; returns a Future
+
+        A read with the same key that has not started yet, at the same or a
+        more urgent priority, is shared instead of queued again.
+        """
+        with self.lock:
+            pending = self.read_keys.get(key) if key is not None else None
+            if pending is not None and pending[0] <= priority:
+                return pending[1]
+            future = concurrent.futures.Future()
+            item = (priority, next(self.sequence), future, func, args, key)
+            heapq.heappush(self.reads, item)
+            if key is not None:
+                self.read_keys[key] = (priority, future)
+            start = self.readers < self.read_limit
+            if start:
+                self.readers += 1
+        if start:
+            threading.Thread(target=self.read_worker, daemon=True).start()
+        return future
+
+    def read_worker(self):
+        """Reader loop: run queued reads until there are none"""
+        while True:
+            with self.lock:
+                if not self.reads:
+                    self.readers -= 1
+                    return
+                _, _, future, func, args, key = heapq.heappop(self.reads)
+                if key is not None and self.read_keys.get(key, (None, None))[1] is future:
+                    del self.read_keys[key]
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+    def changed(self):
+        if self.on_change:
+            self.on_change()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Write-ahead journal of package operations"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+
+from tokenhelper import sequence_command
+
+APT_ARCHIVES = "/var/cache/apt/archives"
+
+class OperationJournal:
+    """Records queued and running operations so interrupted ones can be resumed
+
+    Every change is written to a temporary file, fsynced and renamed over
+    the journal, so a crash leaves either the old or the new journal.
+    Entries carry the id of the run that added them: operations still
+    waiting in this run's queue are not interrupted, those of earlier runs
+    are.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = self.load()
+        self.run = uuid.uuid4().hex
+
+    def load(self):
+        """Read journal entries from disk"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, list) else []
+        except (OSError, ValueError):
+            return []
+
+    def write(self):
+        """Atomically replace the journal on disk"""
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+    def add(self, kind, packages, interrupted=False):
+        """Record a queued operation and return its id; interrupted ones are offered for resuming at once"""
+        entry = {
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'packages': list(packages),
+            'state': 'queued',
+            'time': time.time(),
+            'run': None if interrupted else self.run,
+        }
+        with self.lock:
+            self.entries.append(entry)
+            self.write()
+        return entry['id']
+
+    def start(self, op_id, packages=None):
+        """Mark an operation as running before its command is spawned, with its final package list"""
+        with self.lock:
+            for entry in self.entries:
+                if entry['id'] == op_id:
+                    entry['state'] = 'running'
+                    if packages is not None:
+                        entry['packages'] = list(packages)
+            self.write()
+
+    def finish(self, op_id):
+        """Drop an operation once it has completed, failed cleanly or been cancelled"""
+        with self.lock:
+            self.entries = [e for e in self.entries if e['id'] != op_id]
+            self.write()
+
+    def drop(self, op_id):
+        """Forget an operation that left the queue without being started"""
+        with self.lock:
+            self.entries = [e for e in self.entries if e['id'] != op_id or e['state'] != 'queued']
+            self.write()
+
+    def is_interrupted(self, entry):
+        return entry.get('run') != self.run or entry['state'] == 'running'
+
+    def interrupted(self):
+        """Operations left over from a previous run, or stopped mid-way in this one"""
+        with self.lock:
+            return [entry for entry in self.entries if self.is_interrupted(entry)]
+
+    def merge(self, entries):
+        """Add entries from another journal, skipping ids already recorded, in time order"""
+        with self.lock:
+            known = {entry['id'] for entry in self.entries}
+            self.entries += [entry for entry in entries if entry.get('id') not in known]
+            self.entries.sort(key=lambda entry: entry.get('time', 0))
+            self.write()
+
+    def clear(self):
+        """Forget the interrupted operations; this run's queue stays journaled"""
+        with self.lock:
+            self.entries = [entry for entry in self.entries if not self.is_interrupted(entry)]
+            self.write()
+
+
+def cached_archives(packages):
+    """Packages whose .deb is already in the apt archive cache"""
+    return [pkg for pkg in packages if glob.glob(os.path.join(APT_ARCHIVES, f"{glob.escape(pkg)}_*.deb"))]
+
+def resume_command(entries, apt_cmd='apt'):
+    """Single privileged command that repairs dpkg and replays the remaining queue
+
+    apt reuses archives left in /var/cache/apt/archives, so packages that
+    finished downloading before the interruption are not fetched again.
+    """
+    steps = [['dpkg', '--configure', '-a']]
+    for entry in entries:
+        if entry['kind'] in ('install', 'remove'):
+            steps.append([apt_cmd, entry['kind'], '-y'] + list(entry['packages']))
+        elif entry['kind'] == 'update':
+            steps.append([apt_cmd, 'update'])
+        # 'configure' entries only need the dpkg --configure -a step
+    return sequence_command(steps)
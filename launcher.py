@@ -0,0 +1,1217 @@
+#!/usr/bin/env python3
+"""Token tools launcher: the Office, Web and Game catalogs in one process
+
+Every page shares one configuration, one status index (a single dpkg
+query for all catalogs), one job queue that keeps dpkg operations
+serialized, and one privileged session so polkit asks only once.
+OfficeToken, WebToken and GameToken are thin launchers that open their
+page here.
+"""
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GLib
+import functools
+import subprocess
+import os
+import shutil
+import sys
+import json
+import locale
+import time
+import uuid
+from i18n import Translator, available_languages
+from tracing import Tracer
+from depgraph import DependencyGraph, archive_cache_size, important_fields
+from dispatcher import UpdateDispatcher
+from journal import OperationJournal, cached_archives, resume_command
+from dpkglock import FRONTEND_LOCK, LISTS_LOCK, CancelEvent, wait_for_locks
+from tokenhelper import CANCELLABLE_PHASES, PrivilegedSession, killed, parallel_command, request_cancel
+from oplog import RingLog
+from catalog import PackageState, StatusIndex, query_installed
+from backends import QUERIES as BACKEND_QUERIES, command as backend_command
+from appstream import MetadataLoader
+from artifacts import FETCH_TIMEOUT, ArtifactCache, download, required_archives
+from eta import DurationModel, download_size, format_duration, format_size
+from diagnostics import show_diagnostics
+from jobs import BACKGROUND, INTERACTIVE, Job, JobQueue, pipeline_order
+from maintenance import MaintenanceScheduler, Task, has_archives, low_priority, network_unmetered, trim
+from metrics import Metrics
+from mirrors import MirrorSelector
+from profiling import Profiler, requested
+from roots import ROOT_PARALLELISM, plan_downloads, root_commands, scan_roots, share_archives, stage_root
+from statusd import StatusClient
+from pages import PAGES
+from application import TokenApplication
+
+APPLICATION_ID = "org.cuerdos.TokenTools"
+# Once the running job reaches these phases the network is free for the next download
+DPKG_PHASES = ('unpack', 'configure', 'remove', 'triggers')
+# Upgrades prefetched while idle are kept this long, within this much disk
+WARM_ARCHIVE_AGE = 14 * 86400
+WARM_ARCHIVE_BYTES = 2 * 1024 ** 3
+# Failure logs and profiles are kept this long
+KEEP_REPORTS = 30 * 86400
+# Where each catalog kept its settings and history before they shared one launcher
+LEGACY_CONFIG_DIRS = ("~/.config/officetoken", "~/.config/webtoken", "~/.config/gametoken")
+
+def copy_missing(source, target):
+    """Copy the files of directory source into target, keeping any target already has"""
+    try:
+        names = os.listdir(source)
+    except OSError:
+        return
+    os.makedirs(target, exist_ok=True)
+    for name in names:
+        path = os.path.join(source, name)
+        if os.path.isfile(path) and not os.path.exists(os.path.join(target, name)):
+            try:
+                shutil.copy2(path, os.path.join(target, name))
+            except OSError:
+                pass
+
+def migrate_config(config_dir, legacy_dirs=LEGACY_CONFIG_DIRS):
+    """Merge the per-catalog configuration directories into config_dir
+
+    Settings such as the language and window size come from the first
+    directory that has them; journals, duration history, traces, logs and
+    profiles of all of them are combined. The old directories are left as
+    they are.
+    """
+    sources = [path for path in map(os.path.expanduser, legacy_dirs) if os.path.isdir(path)]
+    if not sources:
+        return
+    os.makedirs(config_dir, exist_ok=True)
+    config = {}
+    journal = OperationJournal(os.path.join(config_dir, "journal.json"))
+    for source in sources:
+        try:
+            with open(os.path.join(source, "config.json"), 'r', encoding='utf-8') as f:
+                for key, value in json.load(f).items():
+                    config.setdefault(key, value)
+        except (OSError, ValueError, AttributeError):
+            pass
+        journal.merge(OperationJournal(os.path.join(source, "journal.json")).interrupted())
+        durations = os.path.join(source, "durations.db")
+        if os.path.exists(durations):
+            DurationModel(os.path.join(config_dir, "durations.db")).merge(durations)
+        try:
+            with open(os.path.join(source, "trace.jsonl"), 'rb') as old, \
+                    open(os.path.join(config_dir, "trace.jsonl"), 'ab') as new:
+                shutil.copyfileobj(old, new)
+        except OSError:
+            pass
+        for name in ("logs", "profiles"):
+            copy_missing(os.path.join(source, name), os.path.join(config_dir, name))
+    with open(os.path.join(config_dir, "config.json"), 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+
+class TokenLauncher:
+    def __init__(self, application, profiler=None):
+        self.application = application
+        self.progress_timeout_id = None
+        self.config_dir = os.path.expanduser("~/.config/tokentools")
+        self.profiler = profiler or Profiler(os.path.join(self.config_dir, "profiles"), 'tokentools')
+        self.config_file = os.path.join(self.config_dir, "config.json")
+        if not os.path.exists(self.config_file):
+            try:
+                migrate_config(self.config_dir)
+            except OSError:
+                pass
+        self.load_config()
+        self.tracer = Tracer(os.path.join(self.config_dir, "trace.jsonl"))
+        self.journal = OperationJournal(os.path.join(self.config_dir, "journal.json"))
+        self.session = PrivilegedSession(self.tracer)
+        self.status_client = StatusClient()
+        self.status = StatusIndex(self.query_status, {backend: functools.partial(query, runner=self.tracer.run)
+                                                      for backend, query in BACKEND_QUERIES.items()})
+        # Dependency graph of the installed packages, rebuilt whenever the status index changes
+        self.graph = None
+        self.autoremove_fields = None
+        self.status.watch(self.rebuild_graph)
+        self.jobs = JobQueue(self.run_job, on_change=self.on_queue_changed, prefetcher=self.prefetch_job,
+                             planner=self.plan_installs)
+        self.prefetch_dir = os.path.expanduser("~/.cache/tokentools/prefetch")
+        self.prefetch_process = None
+        self.prefetch_stop = CancelEvent()
+        shutil.rmtree(self.prefetch_dir, ignore_errors=True)
+        location = self.config.get('artifact_cache')
+        self.artifacts = ArtifactCache(location) if location else None
+        mirrors = self.config.get('mirrors')
+        self.mirrors = MirrorSelector(mirrors, os.path.expanduser("~/.cache/tokentools/mirrors.json")) if mirrors else None
+        # Upgrades downloaded by idle-time maintenance, reused by later installs
+        self.warm_dir = os.path.expanduser("~/.cache/tokentools/upgrades")
+        self.warm = ArtifactCache(self.warm_dir)
+        self.maintenance = MaintenanceScheduler(self.maintenance_tasks(),
+                                                os.path.expanduser("~/.cache/tokentools/maintenance.json"),
+                                                self.jobs.busy)
+        self.current_process = None
+        self.current_op_id = None
+        self.cancel_event = CancelEvent()
+        self.op_log = RingLog()
+        self.durations = DurationModel(os.path.join(self.config_dir, "durations.db"))
+        self.metrics = Metrics(self.config.get('metrics_textfile'))
+        self.current_estimate = None
+        # Screenshots are downloaded only on unmetered networks
+        self.metadata = MetadataLoader(os.path.expanduser("~/.cache/tokentools"), remote_allowed=network_unmetered)
+
+        # Configure translation
+        self._ = Translator(self.config.get('language'))
+
+        self.pages = [page_class(self) for page_class in PAGES]
+
+        self.create_ui()
+        self.check_all_packages()
+
+    def load_config(self):
+        """Load configuration from file"""
+        default_config = {
+            'language': locale.getdefaultlocale()[0] or 'en_US',
+            'window_size': [900, 700],
+            'page': PAGES[0].name,
+            # Directory or http(s) URL of a .deb cache shared between machines
+            'artifact_cache': None,
+            # Remove orphaned dependencies and cached archives after a removal
+            'cleanup_after_remove': True,
+            # .prom file for node_exporter's textfile collector
+            'metrics_textfile': None,
+            # Refresh lists, prefetch upgrades and trim caches while the session is idle
+            'background_maintenance': True
+        }
+
+        try:
+            os.makedirs(self.config_dir, exist_ok=True)
+            if os.path.exists(self.config_file):
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    self.config = {**default_config, **json.load(f)}
+            else:
+                self.config = default_config
+                self.save_config()
+        except Exception:
+            self.config = default_config
+
+    def save_config(self):
+        """Save configuration"""
+        try:
+            with open(self.config_file, 'w', encoding='utf-8') as f:
+                json.dump(self.config, f, indent=2)
+        except Exception:
+            pass
+
+    def create_ui(self):
+        """Create user interface"""
+        # Main window
+        self.window = Gtk.ApplicationWindow(application=self.application)
+        self.window.set_default_size(*self.config['window_size'])
+        self.window.set_position(Gtk.WindowPosition.CENTER)
+        self.window.connect("destroy", self.on_destroy)
+        self.window.connect("size-allocate", self.on_window_resize)
+        self.window.connect("key-press-event", self.maintenance.user_active)
+        self.window.connect("button-press-event", self.maintenance.user_active)
+        self.dispatcher = UpdateDispatcher(self.window)
+
+        # Main layout
+        main_vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        self.window.add(main_vbox)
+
+        # Create menu and content
+        self.create_menu(main_vbox)
+        self.create_content(main_vbox)
+
+    def create_menu(self, parent):
+        """Create menu bar"""
+        menubar = Gtk.MenuBar()
+
+        # System menu
+        system_menu = Gtk.Menu()
+        system_item = Gtk.MenuItem()
+        self._.bind(system_item.set_label, "System")
+        system_item.set_submenu(system_menu)
+
+        update_item = Gtk.MenuItem()
+        self._.bind(update_item.set_label, "Update System")
+        update_item.connect("activate", self.update_system)
+        system_menu.append(update_item)
+
+        refresh_item = Gtk.MenuItem()
+        self._.bind(refresh_item.set_label, "Refresh Status")
+        refresh_item.connect("activate", self.refresh_status)
+        system_menu.append(refresh_item)
+
+        # Language submenu
+        lang_item = Gtk.MenuItem()
+        self._.bind(lang_item.set_label, "Language")
+        lang_submenu = Gtk.Menu()
+        lang_item.set_submenu(lang_submenu)
+
+        for code, info in available_languages().items():
+            lang_option = Gtk.MenuItem(label=info['native'])
+            lang_option.connect("activate", self.change_language, code)
+            lang_submenu.append(lang_option)
+
+        system_menu.append(lang_item)
+
+        quit_item = Gtk.MenuItem()
+        self._.bind(quit_item.set_label, "Quit")
+        quit_item.connect("activate", self.on_destroy)
+        system_menu.append(quit_item)
+
+        # Help menu
+        help_menu = Gtk.Menu()
+        help_item = Gtk.MenuItem()
+        self._.bind(help_item.set_label, "Help")
+        help_item.set_submenu(help_menu)
+
+        diagnostics_item = Gtk.MenuItem()
+        self._.bind(diagnostics_item.set_label, "Diagnostics")
+        diagnostics_item.connect("activate", self.show_diagnostics)
+        help_menu.append(diagnostics_item)
+
+        about_item = Gtk.MenuItem()
+        self._.bind(about_item.set_label, "About")
+        about_item.connect("activate", self.show_about)
+        help_menu.append(about_item)
+
+        menubar.append(system_item)
+        menubar.append(help_item)
+        parent.pack_start(menubar, False, False, 0)
+
+    def create_content(self, parent):
+        """Create the page stack and the shared progress area"""
+        self.stack = Gtk.Stack()
+        self.stack.set_transition_type(Gtk.StackTransitionType.CROSSFADE)
+        for page in self.pages:
+            child = page.create_content()
+            self.stack.add_named(child, page.name)
+            self._.bind(lambda title, child=child: self.stack.child_set_property(child, 'title', title), page.title)
+        self.stack.connect("notify::visible-child-name", self.on_page_changed)
+
+        switcher = Gtk.StackSwitcher()
+        switcher.set_stack(self.stack)
+        switcher.set_halign(Gtk.Align.CENTER)
+        switcher.set_margin_top(6)
+
+        self.content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.content_box.set_margin_left(15)
+        self.content_box.set_margin_right(15)
+        self.content_box.set_margin_bottom(10)
+
+        # Progress bar and status
+        self.create_progress_bar()
+        self.status_label = Gtk.Label()
+        self.status_label.set_text(self._("Ready"))
+        self.content_box.pack_start(self.status_label, False, False, 0)
+
+        parent.pack_start(switcher, False, False, 0)
+        parent.pack_start(self.stack, True, True, 0)
+        parent.pack_start(self.content_box, False, False, 0)
+
+    def create_progress_bar(self):
+        """Create progress bar"""
+        self.progress_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+
+        self.progress_label = Gtk.Label()
+        self.progress_bar = Gtk.ProgressBar()
+        self.progress_bar.set_show_text(False)
+
+        # Progress controls
+        progress_controls_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+
+        self.cancel_btn = Gtk.Button()
+        self.cancel_btn.set_size_request(32, 32)
+        self._.bind(self.cancel_btn.set_tooltip_text, "Cancel")
+        self.cancel_btn.connect("clicked", self.cancel_process)
+
+        # Try to set cancel icon
+        for icon_name in ["process-stop", "gtk-stop"]:
+            try:
+                cancel_icon = Gtk.Image.new_from_icon_name(icon_name, Gtk.IconSize.SMALL_TOOLBAR)
+                self.cancel_btn.set_image(cancel_icon)
+                break
+            except Exception:
+                continue
+        else:
+            self.cancel_btn.set_label("✕")
+
+        progress_controls_box.pack_start(self.cancel_btn, False, False, 0)
+        progress_controls_box.pack_start(self.progress_bar, True, True, 0)
+
+        # Label with the estimated time left next to the progress label
+        self.eta_label = Gtk.Label()
+        progress_header_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        progress_header_box.pack_start(self.progress_label, True, True, 0)
+        progress_header_box.pack_start(self.eta_label, False, False, 0)
+
+        self.progress_box.pack_start(progress_header_box, False, False, 0)
+        self.progress_box.pack_start(progress_controls_box, False, False, 0)
+
+        # Live output of the running operation
+        self.log_expander = Gtk.Expander()
+        self._.bind(self.log_expander.set_label, "Details")
+        self.log_expander.connect("notify::expanded", lambda *args: self.refresh_log_view())
+        log_scrolled = Gtk.ScrolledWindow()
+        log_scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        log_scrolled.set_size_request(-1, 150)
+        self.log_view = Gtk.TextView()
+        self.log_view.set_editable(False)
+        self.log_view.set_monospace(True)
+        log_scrolled.add(self.log_view)
+        self.log_expander.add(log_scrolled)
+        self.progress_box.pack_start(self.log_expander, False, False, 0)
+
+        self.content_box.pack_start(self.progress_box, False, False, 0)
+        self.progress_box.hide()
+
+    def current_page(self):
+        """Page currently shown in the stack"""
+        name = self.stack.get_visible_child_name()
+        return next((page for page in self.pages if page.name == name), self.pages[0])
+
+    def show_page(self, name):
+        """Switch to a page by name"""
+        if self.stack.get_child_by_name(name):
+            self.stack.set_visible_child_name(name)
+
+    def on_page_changed(self, stack, param):
+        """Follow the visible page with the window title and icon"""
+        #pylint: disable=unused-argument
+        page = self.current_page()
+        self.window.set_title(self._(page.title))
+        for icon_name in page.window_icons:
+            try:
+                self.window.set_icon_name(icon_name)
+                break
+            except Exception:
+                continue
+        self.config['page'] = page.name
+        self.save_config()
+
+    def start_progress_animation(self):
+        """Start progress bar animation"""
+        def pulse_progress():
+            if self.jobs.busy():
+                self.update_progress_estimate()
+                return True
+            self.progress_timeout_id = None
+            return False
+
+        if not self.progress_timeout_id:
+            self.progress_timeout_id = GLib.timeout_add(100, pulse_progress)
+
+    def show_estimate(self, download_bytes, estimate, reclaimable_bytes=None):
+        """Show download size, space to be freed and expected duration before the operation starts"""
+        parts = []
+        if download_bytes:
+            parts.append(self._("{} to download").format(format_size(download_bytes)))
+        if reclaimable_bytes:
+            parts.append(self._("{} will be freed").format(format_size(reclaimable_bytes)))
+        if estimate:
+            parts.append(self._("about {}").format(format_duration(estimate.total())))
+        self.eta_label.set_text(", ".join(parts))
+
+    def update_progress_estimate(self):
+        """Advance the progress bar from the duration history"""
+        # Without history the bar keeps pulsing
+        process, estimate = self.current_process, self.current_estimate
+        if not process or not estimate:
+            self.progress_bar.pulse()
+            return
+        self.progress_bar.set_fraction(estimate.fraction(process.span))
+        self.eta_label.set_text(self._("about {} left").format(format_duration(estimate.remaining(process.span))))
+
+    def stop_progress_animation(self):
+        """Stop progress bar animation"""
+        if self.progress_timeout_id:
+            GLib.source_remove(self.progress_timeout_id)
+            self.progress_timeout_id = None
+        self.progress_bar.set_fraction(0)
+
+    def check_all_packages(self):
+        """Check status of every catalog with one query, then follow changes"""
+        def check():
+            self.status.refresh()
+            # Also picks up packages changed outside the launcher
+            try:
+                self.status_client.subscribe({pkg for entry in self.status.entries() for pkg in entry.packages},
+                                             self.status.update)
+            except OSError:
+                pass
+
+        self.jobs.read(check, key='status')
+
+    def refresh_status(self, widget=None):
+        """Re-read every card's state, even while an operation runs"""
+        #pylint: disable=unused-argument
+        self.jobs.read(self.status.refresh, key='status')
+
+    def query_status(self, packages):
+        """Installed state from the status daemon, or from dpkg-query if it cannot be reached"""
+        start = time.monotonic()
+        try:
+            info = self.status_client.query(packages)
+            source = 'daemon'
+        except OSError:
+            info = query_installed(packages, runner=self.tracer.run)
+            source = 'dpkg'
+        self.metrics.scan(time.monotonic() - start, source)
+        return info
+
+    def rebuild_graph(self):
+        """Status index observer; runs on the thread that refreshed it"""
+        self.graph = None
+        self.dependency_graph()
+
+    def dependency_graph(self):
+        """In-memory dependency graph of the installed packages"""
+        graph = self.graph
+        if graph is None:
+            if self.autoremove_fields is None:
+                self.autoremove_fields = important_fields(runner=self.tracer.run)
+            try:
+                graph = self.graph = DependencyGraph.load(followed=self.autoremove_fields)
+            except OSError:
+                graph = DependencyGraph({}, {}, {}, set(), set())
+        return graph
+
+    def confirm_removal(self, label, packages):
+        """Warn before a removal that takes other installed packages with it; True to go ahead
+
+        With cleanup_after_remove, the dependencies the removal orphans are listed too.
+        """
+        graph = self.dependency_graph()
+        others = graph.removal_closure(packages)
+        if self.config.get('cleanup_after_remove'):
+            others |= graph.released(packages)
+        others = sorted(others)
+        if not others:
+            return True
+        shown = ", ".join(others[:15]) + (", …" if len(others) > 15 else "")
+        dialog = Gtk.MessageDialog(
+            transient_for=self.window,
+            flags=0,
+            message_type=Gtk.MessageType.WARNING,
+            buttons=Gtk.ButtonsType.OK_CANCEL,
+            text=self._("Removing {} will also remove {} other package(s)").format(label, len(others)),
+        )
+        dialog.format_secondary_text(shown)
+        response = dialog.run()
+        dialog.destroy()
+        return response == Gtk.ResponseType.OK
+
+    def load_metadata(self):
+        """Fill the cards with AppStream summaries, icons and screenshots, visible page first"""
+        pages = sorted(self.pages, key=lambda page: page is not self.current_page())
+        self.jobs.read(self.metadata.load, [(entry, page.on_metadata) for page in pages for entry in page.entries()],
+                       priority=BACKGROUND, key='metadata')
+        return False
+
+    def on_operation_output(self, line, phase):
+        """Capture a line of output from the running operation"""
+        self.op_log.append(line)
+        self.dispatcher.post('log', self.refresh_log_view)
+        if phase in DPKG_PHASES:
+            self.jobs.start_prefetch()
+
+    def refresh_log_view(self):
+        """Show the captured output in the details pane"""
+        # Rendering is skipped while the pane is collapsed
+        if not self.log_expander.get_expanded():
+            return
+        buffer = self.log_view.get_buffer()
+        buffer.set_text(self.op_log.text())
+        self.log_view.scroll_to_iter(buffer.get_end_iter(), 0, False, 0, 0)
+
+    def save_operation_log(self, name):
+        """Spill the output of a failed operation to a compressed log file"""
+        try:
+            path = self.op_log.spill(os.path.join(self.config_dir, "logs"), name)
+            return f" ({self._('log')}: {path})"
+        except OSError:
+            return ""
+
+    def show_progress(self, show=True):
+        """Show/hide progress bar"""
+        if show:
+            self.progress_box.show_all()
+            self.cancel_btn.set_sensitive(True)
+            self.eta_label.set_text("")
+            self.start_progress_animation()
+        else:
+            self.stop_progress_animation()
+            self.progress_box.hide()
+
+    def submit(self, job):
+        """Queue a job behind any running operation"""
+        # Background maintenance starts stopping now; run_job waits for it
+        self.maintenance.preempt(wait=False)
+        if job.entry is not None and job.entry.state in (PackageState.INSTALLED, PackageState.NOT_INSTALLED):
+            if self.jobs.busy():
+                job.entry.set_state(PackageState.QUEUED)
+        # Journaled while it waits, so a crash loses nothing queued behind the running job
+        if job.kind in ('install', 'remove', 'update') and job.backend == 'apt' and not job.roots:
+            job.op_id = self.journal.add(job.kind, job.packages)
+        if not self.jobs.submit(job):
+            if job.op_id:
+                self.journal.drop(job.op_id)
+            # Clicks on an operation already queued or running are answered, not dropped
+            self.status_label.set_text(f"⚠️ {self._('Already queued')}: {job.label}")
+            return False
+        return True
+
+    def on_queue_changed(self):
+        """Job queue observer; re-renders waiting cards so their queue positions stay current"""
+        for entry in self.jobs.queued_entries():
+            entry.model.notify(entry.index)
+
+    def run_job(self, job):
+        """Run one job; called on the job queue's worker thread"""
+        self.maintenance.preempt()
+        self.cancel_event.clear()
+        self.op_log.clear()
+        self.dispatcher.post('progress', self.show_progress, True)
+
+        try:
+            with self.profiler.phase(job.kind):
+                if job.kind == 'update':
+                    self.run_update(job)
+                elif job.kind == 'resume':
+                    self.run_resume(job)
+                elif job.roots:
+                    self.run_roots_operation(job)
+                elif job.backend != 'apt':
+                    self.run_backend_operation(job)
+                else:
+                    self.run_package_operation(job)
+        except Exception as e:
+            self.dispatcher.post('status', self.status_label.set_text, f"❌ {self._('Error')}: {str(e)}")
+        finally:
+            if job.archive_dir:
+                shutil.rmtree(job.archive_dir, ignore_errors=True)
+            if job.op_id:
+                # Left the queue without reaching dpkg, e.g. an error while preparing it
+                self.journal.drop(job.op_id)
+            self.current_process = None
+            self.current_op_id = None
+            self.current_estimate = None
+            if not self.jobs.waiting:
+                self.dispatcher.post('progress', self.show_progress, False)
+            if job.kind == 'resume':
+                self.status.refresh()
+            elif job.backend != 'apt' and job.entry is not None:
+                self.status.refresh([job.entry])
+            elif job.packages and not job.roots:
+                self.status.refresh(self.status.affected(job.packages + job.prerequisites))
+
+    def run_privileged(self, cmd, tag):
+        """Run a ['pkexec', ...] command in the privileged session and wait for it"""
+        process = self.session.popen(cmd, tag=tag, on_line=self.on_operation_output)
+        self.current_process = process
+        process.communicate()
+        return process
+
+    def run_package_operation(self, job):
+        """Install or remove the packages of a job"""
+        install = job.kind == 'install'
+        action = self._("Installing {}...") if install else self._("Removing {}...")
+        self.dispatcher.post('progress_label', self.progress_label.set_text, action.format(job.label))
+
+        if install and self.stages_archives() and not job.archive_dir:
+            job.archive_dir = self.new_archive_dir()
+            if job.archive_dir:
+                self.dispatcher.post('progress_label', self.progress_label.set_text,
+                                     self._("Fetching archives for {}...").format(job.label))
+                job.download_bytes = self.stage_archives(job, job.archive_dir, self.cancel_event.is_set, True)
+        # Also what the download stage found when the job was prefetched
+        for note in job.stage_notes:
+            self.op_log.append(note)
+        self.dispatcher.post('log', self.refresh_log_view)
+        if self.cancel_event.is_set():
+            self.metrics.operation(job.kind, 'cancelled')
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            return
+
+        if install and job.archive_dir:
+            # Download stage already done: install from the prefetched archives
+            cmd = ['pkexec', 'apt', 'install', '-y', '-o', f"Dir::Cache::Archives={job.archive_dir}/"] + job.packages
+        elif install:
+            apt_cmd = 'apt-fast' if self.check_apt_fast() else 'apt'
+            cmd = ['pkexec', apt_cmd, 'install', '-y'] + job.packages
+        else:
+            cmd = ['pkexec', 'apt', 'remove', '-y'] + job.packages
+
+        # Work out what the removal frees, orphaned dependencies included
+        graph = reclaimable_bytes = None
+        packages = list(job.packages)
+        if not install and self.config.get('cleanup_after_remove'):
+            graph = self.dependency_graph()
+            # Only what this removal orphans, as listed by confirm_removal; orphans
+            # left from earlier removals stay installed
+            orphans = graph.released(job.packages)
+            reclaimable_bytes = graph.size(orphans | set(job.packages))
+            if not self.journal.interrupted():
+                reclaimable_bytes += archive_cache_size()
+            packages += sorted(orphans)
+            cmd += sorted(orphans)
+
+        # Size the download and look up how long this took before
+        if not install:
+            download_bytes = None
+        elif job.archive_dir and 'download' in job.stage_times:
+            download_bytes = 0
+        elif job.download_bytes is not None:
+            download_bytes = job.download_bytes
+        else:
+            download_bytes = download_size(job.packages, runner=self.tracer.run)
+        self.current_estimate = self.durations.estimate(job.key, job.kind, download_bytes)
+        self.dispatcher.post('eta', self.show_estimate, download_bytes, self.current_estimate, reclaimable_bytes)
+
+        # Journaled since it was queued; the package list is final once it starts
+        self.current_op_id = job.op_id or self.journal.add(job.kind, packages)
+
+        self.wait_for_package_lock(FRONTEND_LOCK)
+        if self.cancel_event.is_set():
+            self.journal.finish(self.current_op_id)
+            self.metrics.operation(job.kind, 'cancelled')
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            return
+        self.dispatcher.post('progress_label', self.progress_label.set_text, action.format(job.label))
+        self.journal.start(self.current_op_id, packages)
+        if job.entry is not None:
+            job.entry.set_state(PackageState.INSTALLING if install else PackageState.REMOVING)
+
+        # Repository packages go through the same session, so no second prompt
+        if job.prerequisites:
+            info = query_installed(job.prerequisites, runner=self.tracer.run)
+            missing = [pkg for pkg in job.prerequisites if not info[pkg][0]]
+            if missing:
+                self.run_privileged(['pkexec', 'apt', 'install', '-y'] + missing, 'repo')
+
+        process = self.run_privileged(cmd, job.kind)
+
+        if self.cancelled(process):
+            self.journal.finish(self.current_op_id)
+            self.metrics.operation(job.kind, 'cancelled', process.span)
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            self.verify_package_database()
+            return
+
+        # Killed mid-operation (the helper reports signals as 128 + n): keep it journaled
+        if not killed(process.returncode):
+            self.journal.finish(self.current_op_id)
+
+        job.stage_times['install'] = process.span.wall_time
+        if 'download' in job.stage_times:
+            self.op_log.append(self._("Pipeline: download {} (in background), waited {}, install {}").format(
+                format_duration(job.stage_times['download']), format_duration(job.stage_times.get('waited', 0)),
+                format_duration(job.stage_times['install'])))
+            self.dispatcher.post('log', self.refresh_log_view)
+
+        self.metrics.operation(job.kind, 'success' if process.returncode == 0 else 'failure', process.span, download_bytes)
+        if process.returncode == 0:
+            self.durations.record(job.key, job.kind, process.span, download_bytes)
+            if self.artifacts and job.archives:
+                exported = self.artifacts.export(job.archives, job.archive_dir)
+                if exported:
+                    self.op_log.append(self._("Artifact cache: exported {} archives").format(exported))
+            success_msg = self._('installed successfully') if install else self._('removed successfully')
+            if graph is not None:
+                success_msg += ", " + self._("{} freed").format(format_size(self.clean_up(graph)))
+            self.dispatcher.post('status', self.status_label.set_text, f"✅ {job.label} {success_msg}")
+        else:
+            error_msg = self._('Error installing') if install else self._('Error removing')
+            log_note = self.save_operation_log(job.label)
+            self.dispatcher.post('status', self.status_label.set_text, f"❌ {error_msg} {job.label}{log_note}")
+
+    def run_backend_operation(self, job):
+        """Install or remove a build from Flatpak, Snap or an AppImage"""
+        install = job.kind == 'install'
+        action = self._("Installing {}...") if install else self._("Removing {}...")
+        self.dispatcher.post('progress_label', self.progress_label.set_text, action.format(job.label))
+        cmd = backend_command(job.backend, job.kind, job.packages[0])
+        if cmd is None:
+            return
+        if job.entry is not None:
+            job.entry.set_state(PackageState.INSTALLING if install else PackageState.REMOVING)
+
+        self.current_estimate = self.durations.estimate(job.key, job.kind)
+        self.dispatcher.post('eta', self.show_estimate, None, self.current_estimate)
+        if cmd[0] == 'pkexec':
+            process = self.run_privileged(cmd, job.kind)
+        else:
+            # Flatpak asks polkit itself when it needs to
+            process = self.tracer.popen(cmd, tag=job.kind, on_line=self.on_operation_output, stdin=subprocess.DEVNULL)
+            self.current_process = process
+            process.communicate()
+
+        if self.cancelled(process):
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            return
+        self.metrics.operation(job.kind, 'success' if process.returncode == 0 else 'failure', process.span)
+        if process.returncode == 0:
+            self.durations.record(job.key, job.kind, process.span)
+            success_msg = self._('installed successfully') if install else self._('removed successfully')
+            self.dispatcher.post('status', self.status_label.set_text, f"✅ {job.label} {success_msg}")
+        else:
+            error_msg = self._('Error installing') if install else self._('Error removing')
+            log_note = self.save_operation_log(job.label)
+            self.dispatcher.post('status', self.status_label.set_text, f"❌ {error_msg} {job.label}{log_note}")
+
+    def run_roots_operation(self, job):
+        """Install or remove the packages of a job in several image roots at once"""
+        install = job.kind == 'install'
+        limit = self.config.get('root_parallelism', ROOT_PARALLELISM)
+        self.dispatcher.post('progress_label', self.progress_label.set_text,
+                             self._("Scanning {} images...").format(len(job.roots)))
+        before = scan_roots(job.roots, job.packages, limit)
+        targets = [root for root, info in before.items()
+                   if any(installed != install for installed, _, _ in info.values())]
+        if not targets:
+            self.dispatcher.post('status', self.status_label.set_text, f"✅ {self._('Nothing to do in any image')}")
+            return
+
+        # One download of each archive, linked into every root that needs it
+        stage_dirs = dict.fromkeys(targets)
+        shared_dir = self.new_archive_dir() if install else None
+        if shared_dir:
+            plan = plan_downloads(targets, job.packages, shared_dir, self.tracer.run, limit)
+            shared = share_archives(plan, shared_dir, self.fetch_archive, limit)
+            self.op_log.append(self._("{} archives downloaded once for {} images").format(len(shared), len(targets)))
+            for index, root in enumerate(targets):
+                stage_dirs[root] = os.path.join(shared_dir, f"root{index}")
+                failed = stage_root([archive for archive in plan[root] if archive in shared], shared_dir, stage_dirs[root])
+                for name, error in failed:
+                    self.op_log.append(self._("{}: could not stage {} ({}), apt will download it").format(root, name, error))
+
+        action = self._("Installing {}...") if install else self._("Removing {}...")
+        self.dispatcher.post('progress_label', self.progress_label.set_text,
+                             action.format(f"{job.label} ({len(targets)})"))
+        try:
+            process = self.run_privileged(parallel_command(root_commands(job.kind, job.packages, stage_dirs), limit),
+                                          'roots')
+        finally:
+            if shared_dir:
+                shutil.rmtree(shared_dir, ignore_errors=True)
+        if self.cancelled(process):
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            return
+
+        after = scan_roots(targets, job.packages, limit)
+        done = [root for root, info in after.items() if all(installed == install for installed, _, _ in info.values())]
+        for root in targets:
+            self.op_log.append(f"{root}: {self._('done') if root in done else self._('failed')}")
+        self.dispatcher.post('log', self.refresh_log_view)
+        if process.returncode == 0 and len(done) == len(targets):
+            self.dispatcher.post('status', self.status_label.set_text,
+                                 f"✅ {job.label}: {self._('{} images updated').format(len(done))}")
+        else:
+            log_note = self.save_operation_log(job.label)
+            self.dispatcher.post('status', self.status_label.set_text,
+                                 f"❌ {job.label}: {self._('{} of {} images updated').format(len(done), len(targets))}{log_note}")
+
+    def fetch_archive(self, archive, dest):
+        """Fetch one archive from the artifact cache, the fastest mirror or its origin"""
+        if self.artifacts and self.artifacts.fetch(archive, dest):
+            return True
+        uri = self.mirrors.rewrite(archive.uri) if self.mirrors else archive.uri
+        if uri != archive.uri and download(uri, dest, archive, should_stop=self.cancel_event.is_set):
+            return True
+        return (archive.uri.startswith(('http://', 'https://')) and not self.cancel_event.is_set()
+                and download(archive.uri, dest, archive, should_stop=self.cancel_event.is_set))
+
+    def clean_up(self, graph):
+        """Purge cached archives after a removal; returns the bytes freed since graph was read"""
+        # Archives of interrupted operations are kept for resuming them
+        cached = archive_cache_size() if not self.journal.interrupted() else 0
+        if cached:
+            # Same privileged session as the removal, so no further prompt
+            self.run_privileged(['pkexec', 'apt-get', 'clean'], 'cleanup')
+        after = DependencyGraph.load()
+        return max(graph.size(graph.sizes) - after.size(after.sizes), 0) + cached - archive_cache_size()
+
+    def plan_installs(self, jobs):
+        """Size waiting installs and order them for the pipeline"""
+        for job in jobs:
+            if job.download_bytes is None:
+                job.download_bytes = download_size(job.packages, runner=self.tracer.run) or 0
+        return pipeline_order(jobs, lambda job: self.durations.stage_times(job.key, job.download_bytes))
+
+    def new_archive_dir(self):
+        """Empty staging directory for one job's archives, None if it cannot be created"""
+        directory = os.path.join(self.prefetch_dir, uuid.uuid4().hex)
+        try:
+            os.makedirs(os.path.join(directory, "partial"))
+        except OSError:
+            return None
+        return directory
+
+    def stages_archives(self):
+        """True if installs look for their archives before apt downloads them"""
+        return bool(self.artifacts or self.mirrors or has_archives(self.warm_dir))
+
+    def stage_archives(self, job, directory, should_stop, foreground=False):
+        """Fetch the job's archives from prefetched upgrades, the artifact cache and the fastest mirrors
+
+        Returns the bytes apt still has to fetch from sources.list. What was
+        found goes to job.stage_notes, so a prefetch does not write into the
+        running job's log. should_stop() is checked between archives and
+        during mirror downloads; a foreground job also shows its progress.
+        """
+        job.archives = required_archives(job.packages, directory, runner=self.tracer.run)
+        misses = job.archives
+        if misses and has_archives(self.warm_dir) and not should_stop():
+            misses = self.warm.populate(misses, directory)
+            hits = len(job.archives) - len(misses)
+            if hits:
+                job.stage_notes.append(self._("Prefetched upgrades: {} of {} archives reused").format(hits, len(job.archives)))
+        if self.artifacts and misses and not should_stop():
+            misses = self.artifacts.populate(misses, directory)
+            hits = len(job.archives) - len(misses)
+            if hits:
+                job.stage_notes.append(self._("Artifact cache: {} of {} archives found").format(hits, len(job.archives)))
+        if self.mirrors and misses:
+            left = []
+            for index, archive in enumerate(misses):
+                if should_stop():
+                    left += misses[index:]
+                    break
+                if foreground:
+                    self.dispatcher.post('progress_label', self.progress_label.set_text,
+                                         self._("Fetching archives for {} ({} of {})...").format(job.label, index + 1, len(misses)))
+                uri = self.mirrors.rewrite(archive.uri)
+                if uri == archive.uri or not download(uri, os.path.join(directory, archive.file), archive,
+                                                      timeout=FETCH_TIMEOUT, should_stop=should_stop):
+                    left.append(archive)
+            if len(left) < len(misses):
+                job.stage_notes.append(self._("Fastest mirror: {} archives fetched").format(len(misses) - len(left)))
+            misses = left
+        return sum(archive.size for archive in misses)
+
+    def prefetch_job(self, job):
+        """Download stage: fetch a waiting job's archives without root while dpkg is busy"""
+        directory = self.new_archive_dir()
+        if not directory:
+            return
+        if self.stages_archives():
+            job.download_bytes = self.stage_archives(job, directory, self.prefetch_stop.is_set)
+            if self.prefetch_stop.is_set():
+                shutil.rmtree(directory, ignore_errors=True)
+                return
+        # Nothing is installed here, so the dpkg lock held by the running job is not needed;
+        # apt verifies the archives' hashes again when the install stage uses them
+        process = self.tracer.popen(['apt-get', 'install', '-y', '--download-only',
+                                     '-o', f"Dir::Cache::Archives={directory}/", '-o', 'Debug::NoLocking=true'] + job.packages,
+                                    tag='prefetch', stdin=subprocess.DEVNULL)
+        self.prefetch_process = process
+        process.communicate()
+        self.prefetch_process = None
+        if process.returncode == 0:
+            job.archive_dir = directory
+            job.stage_times['download'] = process.span.wall_time
+            self.durations.record(job.key, 'prefetch', process.span, job.download_bytes)
+            self.metrics.downloaded(job.download_bytes)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def maintenance_tasks(self):
+        """Idle-time maintenance, in the order it runs"""
+        return [Task('lists', 6 * 3600, self.refresh_lists),
+                Task('upgrades', 12 * 3600, self.prefetch_upgrades),
+                Task('status', 30 * 60, self.revalidate_status),
+                Task('trim', 24 * 3600, self.trim_caches)]
+
+    def refresh_lists(self, scheduler):
+        """Idle task: update the package lists, only in a session polkit has already authorized"""
+        if not self.session.running:
+            return False
+        process = self.session.popen(['pkexec'] + low_priority(['apt-get', 'update', '-q']), tag='idle-update')
+        return scheduler.run(process) == 0
+
+    def prefetch_upgrades(self, scheduler):
+        """Idle task: download pending upgrades without root, as the pipeline's download stage does"""
+        try:
+            os.makedirs(os.path.join(self.warm_dir, "partial"), exist_ok=True)
+        except OSError:
+            return False
+        before = archive_cache_size(self.warm_dir)
+        process = self.tracer.popen(low_priority(['apt-get', 'upgrade', '-y', '--download-only',
+                                                  '-o', f"Dir::Cache::Archives={self.warm_dir}/",
+                                                  '-o', 'Debug::NoLocking=true']),
+                                    tag='idle-prefetch', stdin=subprocess.DEVNULL)
+        done = scheduler.run(process) == 0
+        self.metrics.downloaded(max(archive_cache_size(self.warm_dir) - before, 0))
+        return done
+
+    def revalidate_status(self, scheduler):
+        """Idle task: re-read every card's state, which also rebuilds the dependency graph"""
+        #pylint: disable=unused-argument
+        self.jobs.read(self.status.refresh, priority=BACKGROUND, key='status').result()
+        return True
+
+    def trim_caches(self, scheduler):
+        """Idle task: drop superseded and stale prefetched upgrades, old failure logs and profiles"""
+        process = self.tracer.popen(low_priority(['apt-get', 'autoclean', '-o', f"Dir::Cache::Archives={self.warm_dir}/",
+                                                  '-o', 'Debug::NoLocking=true']),
+                                    tag='idle-trim', stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        scheduler.run(process)
+        trim(self.warm_dir, WARM_ARCHIVE_BYTES, WARM_ARCHIVE_AGE, '.deb')
+        trim(os.path.join(self.config_dir, "logs"), max_age=KEEP_REPORTS)
+        trim(os.path.join(self.config_dir, "profiles"), max_age=KEEP_REPORTS)
+        return not scheduler.preempted.is_set()
+
+    def update_system(self, widget=None):
+        """Update system"""
+        #pylint: disable=unused-argument
+        self.submit(Job('update', key=''))
+
+    def run_update(self, job):
+        """Refresh the package lists"""
+        self.dispatcher.post('progress_label', self.progress_label.set_text, self._("Updating system..."))
+
+        apt_cmd = 'apt-fast' if self.check_apt_fast() else 'apt'
+        cmd = ['pkexec', apt_cmd, 'update']
+
+        self.current_estimate = self.durations.estimate(job.key, 'update')
+        self.dispatcher.post('eta', self.show_estimate, None, self.current_estimate)
+
+        self.current_op_id = job.op_id or self.journal.add('update', [])
+
+        self.wait_for_package_lock(LISTS_LOCK)
+        if self.cancel_event.is_set():
+            self.journal.finish(self.current_op_id)
+            self.metrics.operation('update', 'cancelled')
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            return
+        self.dispatcher.post('progress_label', self.progress_label.set_text, self._("Updating system..."))
+        self.journal.start(self.current_op_id)
+
+        process = self.run_privileged(cmd, 'update')
+
+        if self.cancelled(process):
+            self.journal.finish(self.current_op_id)
+            self.metrics.operation('update', 'cancelled', process.span)
+            self.dispatcher.post('status', self.status_label.set_text, f"⚠️ {self._('Process cancelled')}")
+            self.verify_package_database()
+            return
+
+        if not killed(process.returncode):
+            self.journal.finish(self.current_op_id)
+
+        self.metrics.operation('update', 'success' if process.returncode == 0 else 'failure', process.span)
+        if process.returncode == 0:
+            self.durations.record(job.key, 'update', process.span)
+            self.dispatcher.post('status', self.status_label.set_text, f"✅ {self._('System updated successfully')}")
+        else:
+            log_note = self.save_operation_log('update')
+            self.dispatcher.post('status', self.status_label.set_text, f"❌ {self._('Error updating system')}{log_note}")
+
+    def check_interrupted_operations(self):
+        """Offer to resume operations interrupted by a crash or forced close"""
+        entries = self.journal.interrupted()
+        if not entries:
+            return False
+
+        packages = [pkg for entry in entries for pkg in entry['packages']]
+        dialog = Gtk.MessageDialog(
+            transient_for=self.window,
+            flags=0,
+            message_type=Gtk.MessageType.QUESTION,
+            buttons=Gtk.ButtonsType.YES_NO,
+            text=self._("An operation was interrupted")
+        )
+        dialog.format_secondary_text(
+            self._("Resume {} pending operation(s)? Package configuration will be repaired first; {} already downloaded package(s) will be reused.").format(len(entries), len(cached_archives(packages)))
+        )
+        response = dialog.run()
+        dialog.destroy()
+
+        if response == Gtk.ResponseType.YES:
+            self.resume_operations(entries)
+        else:
+            self.journal.clear()
+        return False
+
+    def resume_operations(self, entries):
+        """Repair dpkg and replay the interrupted queue"""
+        # dpkg has to be repaired before anything else can run
+        self.submit(Job('resume', [pkg for entry in entries for pkg in entry['packages']], key='resume',
+                        journal_entries=entries, priority=INTERACTIVE))
+
+    def run_resume(self, job):
+        """Run the resume command for journaled operations"""
+        self.dispatcher.post('progress_label', self.progress_label.set_text, self._("Resuming interrupted operations..."))
+
+        self.wait_for_package_lock(FRONTEND_LOCK)
+        if self.cancel_event.is_set():
+            return
+        self.dispatcher.post('progress_label', self.progress_label.set_text, self._("Resuming interrupted operations..."))
+
+        apt_cmd = 'apt-fast' if self.check_apt_fast() else 'apt'
+        process = self.run_privileged(resume_command(job.journal_entries, apt_cmd), 'resume')
+
+        if process.returncode == 0:
+            self.journal.clear()
+            self.dispatcher.post('status', self.status_label.set_text, f"✅ {self._('Interrupted operations completed')}")
+        else:
+            log_note = self.save_operation_log('resume')
+            self.dispatcher.post('status', self.status_label.set_text, f"❌ {self._('Error resuming operations')}{log_note}")
+
+    def wait_for_package_lock(self, lock_path):
+        """Wait until no other package manager holds the lock"""
+        def on_wait(pid, name):
+            message = self._("Waiting for {} (pid {}) to release the package lock...").format(name, pid)
+            self.dispatcher.post('progress_label', self.progress_label.set_text, message)
+
+        start = time.monotonic()
+        result = wait_for_locks([lock_path], on_wait=on_wait, cancel=self.cancel_event)
+        self.metrics.lock_waited(time.monotonic() - start)
+        return result
+
+    def check_apt_fast(self):
+        """Check if apt-fast is available"""
+        try:
+            self.tracer.run(['which', 'apt-fast'], check=True, capture_output=True)
+            return True
+        except Exception:
+            return False
+
+    def cancel_process(self, widget):
+        """Cancel current process"""
+        #pylint: disable=unused-argument
+        if not self.jobs.busy():
+            return
+        process = self.current_process
+        if process and process.span.current_phase() not in CANCELLABLE_PHASES:
+            self.status_label.set_text(f"⚠️ {self._('Cannot cancel while packages are being unpacked or configured')}")
+            return
+
+        # The worker finishes the cancellation once the helper has stopped the
+        # process group; this also stops an operation waiting for the lock
+        self.cancel_event.set()
+        if process and not request_cancel(process):
+            # Unprivileged commands such as flatpak run without the helper
+            process.terminate()
+        self.cancel_btn.set_sensitive(False)
+        self.progress_label.set_text(self._("Cancelling..."))
+
+    def cancelled(self, process):
+        """True if a cancel stopped process
+
+        The helper holds a cancel back while dpkg unpacks or configures, so
+        a command can still finish successfully after Cancel was pressed.
+        """
+        return self.cancel_event.is_set() and process.returncode != 0
+
+    def verify_package_database(self):
+        """Check dpkg consistency after a cancelled operation"""
+        result = self.tracer.run(['dpkg', '--audit'], tag='audit', capture_output=True, text=True, check=False)
+        if result.stdout.strip():
+            self.journal.add('configure', [], interrupted=True)
+            # A modal dialog, so not from the dispatcher's frame-clock tick
+            GLib.idle_add(self.check_interrupted_operations)
+
+    def request_operation(self, name, install=True, roots=()):
+        """Install or remove a package requested on the command line, optionally in image roots"""
+        package = self.status.find(name)
+        if package is None:
+            self.status_label.set_text(f"❌ {self._('Package not found')}: {name}")
+            return
+        if roots:
+            self.submit(Job('install' if install else 'remove', package.packages, key=package.package,
+                            label=package.name, roots=roots))
+            return
+        page = next(page for page in self.pages if package in page.entries())
+        self.show_page(page.name)
+        if install:
+            page.install_package(None, package)
+        else:
+            page.remove_package(None, package)
+
+    def change_language(self, widget, lang_code):
+        """Change language"""
+        #pylint: disable=unused-argument
+        self.config['language'] = lang_code
+        self.save_config()
+        self._.set_language(lang_code)
+        self.window.set_title(self._(self.current_page().title))
+        for page in self.pages:
+            page.retranslate_cards()
+
+    def show_diagnostics(self, widget):
+        """Show command tracing diagnostics"""
+        #pylint: disable=unused-argument
+        show_diagnostics(self.window, self.tracer, self._)
+
+    def show_about(self, widget):
+        """Show about dialog for the current page"""
+        #pylint: disable=unused-argument
+        page = self.current_page()
+        about = Gtk.AboutDialog()
+        about.set_transient_for(self.window)
+        about.set_program_name(page.title)
+        about.set_version("1.0")
+        about.set_comments(self._(page.comments))
+        about.set_copyright("© 2025 CuerdOS")
+        about.set_license_type(Gtk.License.GPL_3_0)
+
+        try:
+            about.set_logo_icon_name(page.logo_icon)
+        except Exception:
+            pass
+
+        about.run()
+        about.destroy()
+
+    def on_window_resize(self, window, allocation):
+        """Handle window resize"""
+        #pylint: disable=unused-argument
+        self.config['window_size'] = [allocation.width, allocation.height]
+        self.save_config()
+
+    def on_destroy(self, widget=None):
+        """Handle application close"""
+        #pylint: disable=unused-argument
+        # Unsafe phases run to completion; the journal offers a resume next start
+        if self.current_process and self.jobs.busy():
+            if self.current_process.span.current_phase() in CANCELLABLE_PHASES:
+                request_cancel(self.current_process)
+        self.prefetch_stop.set()
+        if self.prefetch_process:
+            self.prefetch_process.terminate()
+        self.maintenance.stop()
+        self.session.close()
+        self.profiler.close()
+        if self.progress_timeout_id:
+            GLib.source_remove(self.progress_timeout_id)
+            self.progress_timeout_id = None
+        self.application.quit()
+
+    def show(self):
+        """Show the window"""
+        self.window.show_all()
+        self.progress_box.hide()
+        self.show_page(self.config['page'])
+        self.on_page_changed(self.stack, None)
+        self.profiler.start_probe()
+        # Idle priority: the first frame is drawn before the collections are read
+        GLib.idle_add(self.load_metadata)
+        if self.config.get('background_maintenance'):
+            self.maintenance.start()
+        GLib.idle_add(self.check_interrupted_operations)
+
+def main(argv, page=None):
+    """Run the launcher, opening page (and forwarding to a running instance)"""
+    if page and '--page' not in argv:
+        argv = argv[:1] + ['--page', page] + argv[1:]
+    cpu, memory = requested(argv)
+    profiler = Profiler(os.path.expanduser("~/.config/tokentools/profiles"), page or 'tokentools', cpu, memory)
+    startup = profiler.begin('startup')
+
+    def create(application):
+        launcher = TokenLauncher(application, profiler)
+        # Startup ends at the first idle moment after the window has been drawn
+        GLib.idle_add(profiler.end, startup)
+        return launcher
+
+    return TokenApplication(APPLICATION_ID, create).run(argv)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
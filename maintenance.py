@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Background maintenance run while the session is idle
+
+Slow housekeeping (package list refresh, upgrade prefetch, status
+revalidation, cache trimming) runs once the session has been idle for a
+while, on mains power and an unmetered network, so interactive actions
+find warm caches. Commands run under nice and the idle I/O class. A
+foreground operation preempts the maintenance at once: the running
+command is stopped and the remaining tasks wait for the next idle period.
+"""
+import collections
+import json
+import os
+import shutil
+import threading
+import time
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gio, GLib
+
+from tokenhelper import request_cancel
+
+CHECK_INTERVAL = 60
+# Seconds without user input before the session counts as idle
+IDLE_AFTER = 5 * 60
+PREEMPT_TIMEOUT = 10
+NICENESS = 19
+POWER_SUPPLY = "/sys/class/power_supply"
+
+# run(scheduler) returns True once the task is done, False to retry at the next idle period
+Task = collections.namedtuple('Task', 'name interval run')
+
+def low_priority(argv):
+    """argv run at the lowest CPU priority and in the idle I/O class, where the tools exist"""
+    prefix = []
+    if shutil.which('nice'):
+        prefix += ['nice', '-n', str(NICENESS)]
+    if shutil.which('ionice'):
+        prefix += ['ionice', '-c', '3']
+    return prefix + list(argv)
+
+def on_ac_power(path=POWER_SUPPLY):
+    """False only when a battery is present and no mains supply is online"""
+    mains = battery = False
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return True
+    for name in names:
+        try:
+            with open(os.path.join(path, name, "type"), encoding='utf-8') as f:
+                kind = f.read().strip()
+            if kind == 'Battery':
+                battery = True
+            elif kind in ('Mains', 'USB'):
+                with open(os.path.join(path, name, "online"), encoding='utf-8') as f:
+                    mains = mains or f.read().strip() == '1'
+        except OSError:
+            continue
+    return mains or not battery
+
+def network_unmetered():
+    """True when a network is up and GLib does not consider it metered"""
+    monitor = Gio.NetworkMonitor.get_default()
+    return monitor.get_network_available() and not monitor.get_network_metered()
+
+def session_idle_time():
+    """Seconds since the last input anywhere in the session, None if the desktop does not tell"""
+    queries = (('org.gnome.Mutter.IdleMonitor', '/org/gnome/Mutter/IdleMonitor/Core',
+                'org.gnome.Mutter.IdleMonitor', 'GetIdletime'),
+               ('org.freedesktop.ScreenSaver', '/org/freedesktop/ScreenSaver',
+                'org.freedesktop.ScreenSaver', 'GetSessionIdleTime'))
+    try:
+        bus = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+    except GLib.Error:
+        return None
+    for name, path, interface, method in queries:
+        try:
+            reply = bus.call_sync(name, path, interface, method, None, None,
+                                  Gio.DBusCallFlags.NONE, 1000, None)
+        except GLib.Error:
+            continue
+        # Both return milliseconds
+        return reply.unpack()[0] / 1000
+    return None
+
+def has_archives(directory):
+    """True if directory holds any .deb"""
+    try:
+        with os.scandir(directory) as it:
+            return any(entry.name.endswith('.deb') for entry in it)
+    except OSError:
+        return False
+
+def trim(directory, max_bytes=None, max_age=None, suffix=''):
+    """Delete files ending in suffix older than max_age seconds, then the oldest until under max_bytes
+
+    Returns the bytes freed.
+    """
+    files = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith(suffix) and entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return 0
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    freed = 0
+    now = time.time()
+    for mtime, size, path in files:
+        if not (max_age is not None and now - mtime > max_age) and not (max_bytes is not None and total > max_bytes):
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        freed += size
+    return freed
+
+
+class MaintenanceScheduler:
+    """Runs due tasks on a low-priority thread while the session is idle
+
+    busy() is True while a foreground operation runs or waits. Call
+    preempt() before starting one; user_active() is a window event
+    handler that restarts the idle period.
+    """
+
+    def __init__(self, tasks, state_path, busy, idle_after=IDLE_AFTER):
+        self.tasks = tasks
+        self.state_path = state_path
+        self.busy = busy
+        self.idle_after = idle_after
+        self.last_run = self.load()
+        self.last_input = time.monotonic()
+        self.preempted = threading.Event()
+        self.lock = threading.Lock()
+        self.process = None
+        self.thread = None
+        self.source_id = None
+
+    def load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            with open(self.state_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.last_run, f, indent=2)
+            os.replace(self.state_path + ".tmp", self.state_path)
+        except OSError:
+            pass
+
+    def start(self):
+        if self.source_id is None:
+            self.source_id = GLib.timeout_add_seconds(CHECK_INTERVAL, self.tick)
+
+    def stop(self):
+        if self.source_id is not None:
+            GLib.source_remove(self.source_id)
+            self.source_id = None
+        self.preempt(wait=False)
+
+    def user_active(self, *args):
+        """Window event handler; lets the event propagate"""
+        #pylint: disable=unused-argument
+        self.last_input = time.monotonic()
+        return False
+
+    def idle_time(self):
+        """Seconds the user has been away, from the session if it tells, else from our window"""
+        session = session_idle_time()
+        app = time.monotonic() - self.last_input
+        return app if session is None else min(session, app)
+
+    def due(self):
+        now = time.time()
+        return [task for task in self.tasks if now - self.last_run.get(task.name, 0) >= task.interval]
+
+    def blocked(self):
+        """Why maintenance cannot run now, None if it can"""
+        if self.busy():
+            return "busy"
+        if self.idle_time() < self.idle_after:
+            return "user active"
+        if not on_ac_power():
+            return "on battery"
+        if not network_unmetered():
+            return "metered network"
+        return None
+
+    def tick(self):
+        """Main-loop timeout: start the due tasks when every condition holds"""
+        if self.thread is not None and self.thread.is_alive():
+            return True
+        tasks = self.due()
+        if tasks and self.blocked() is None:
+            # Cleared here, on the main thread, so a submit right after still preempts
+            self.preempted.clear()
+            self.thread = threading.Thread(target=self.work, args=(tasks,), daemon=True)
+            self.thread.start()
+        return True
+
+    def work(self, tasks):
+        try:
+            # Linux applies the nice value to this thread only
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), NICENESS)
+        except (AttributeError, OSError):
+            pass
+        for task in tasks:
+            if self.preempted.is_set():
+                break
+            try:
+                done = task.run(self)
+            except Exception:
+                done = False
+            if done and not self.preempted.is_set():
+                self.last_run[task.name] = time.time()
+                self.save()
+
+    def run(self, process):
+        """Wait for a command a task started, stopping it if preempted; returns its exit status"""
+        with self.lock:
+            self.process = process
+            stopped = self.preempted.is_set()
+        if stopped:
+            self.stop_process(process)
+        try:
+            return process.communicate()
+        finally:
+            with self.lock:
+                self.process = None
+
+    @staticmethod
+    def stop_process(process):
+        if not request_cancel(process):
+            process.terminate()
+
+    def preempt(self, wait=True):
+        """Stop the maintenance for a foreground operation; with wait, until its thread has finished"""
+        self.preempted.set()
+        self.last_input = time.monotonic()
+        with self.lock:
+            process = self.process
+        if process is not None:
+            self.stop_process(process)
+        thread = self.thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join(PREEMPT_TIMEOUT)
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Prometheus textfile metrics for node_exporter's textfile collector
+
+Metrics live in memory and the whole .prom file is rewritten atomically
+(temporary file plus rename) after each update, so the collector never
+reads a partial file. Without a path every method returns at once.
+"""
+import os
+import threading
+
+PHASE_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+SCAN_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+LOCK_BUCKETS = (0.1, 1, 5, 15, 60, 300)
+
+def labels(**values):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(values.items())) + "}" if values else ""
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observations"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, **values):
+        lines = [f"{name}_bucket{labels(le=bound, **values)} {count}" for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f"{name}_bucket{labels(le='+Inf', **values)} {self.count}")
+        lines.append(f"{name}_sum{labels(**values)} {self.sum:.6f}")
+        lines.append(f"{name}_count{labels(**values)} {self.count}")
+        return lines
+
+
+class Metrics:
+    """Operation counters and latency histograms written to a .prom file"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.operations = {}
+        self.phases = {}
+        self.scans = {}
+        self.lock_wait = Histogram(LOCK_BUCKETS)
+        self.download_bytes = 0
+
+    def operation(self, kind, result, span=None, download_bytes=None):
+        """Count a finished operation and its phase durations; result is success, failure or cancelled"""
+        if not self.path:
+            return
+        with self.lock:
+            key = (kind, result)
+            self.operations[key] = self.operations.get(key, 0) + 1
+            if span is not None:
+                for phase in span.phases:
+                    if phase['duration'] is not None:
+                        self.phases.setdefault(phase['phase'], Histogram(PHASE_BUCKETS)).observe(phase['duration'])
+            if download_bytes:
+                self.download_bytes += download_bytes
+        self.write()
+
+    def downloaded(self, nbytes):
+        """Count bytes fetched outside an operation, such as a background download stage"""
+        if not self.path or not nbytes:
+            return
+        with self.lock:
+            self.download_bytes += nbytes
+        self.write()
+
+    def scan(self, seconds, source):
+        """Record the latency of one status scan; source is daemon or dpkg"""
+        if not self.path:
+            return
+        with self.lock:
+            self.scans.setdefault(source, Histogram(SCAN_BUCKETS)).observe(seconds)
+        self.write()
+
+    def lock_waited(self, seconds):
+        """Record time spent waiting for another package manager's lock"""
+        if not self.path:
+            return
+        with self.lock:
+            self.lock_wait.observe(seconds)
+        self.write()
+
+    def render(self):
+        lines = ["# HELP tokentools_operations_total Package operations by kind and result.",
+                 "# TYPE tokentools_operations_total counter"]
+        lines += [f"tokentools_operations_total{labels(kind=kind, result=result)} {count}"
+                  for (kind, result), count in sorted(self.operations.items())]
+        lines += ["# HELP tokentools_phase_duration_seconds Duration of apt/dpkg phases.",
+                  "# TYPE tokentools_phase_duration_seconds histogram"]
+        for phase, histogram in sorted(self.phases.items()):
+            lines += histogram.render("tokentools_phase_duration_seconds", phase=phase)
+        lines += ["# HELP tokentools_status_scan_seconds Latency of package status scans.",
+                  "# TYPE tokentools_status_scan_seconds histogram"]
+        for source, histogram in sorted(self.scans.items()):
+            lines += histogram.render("tokentools_status_scan_seconds", source=source)
+        lines += ["# HELP tokentools_lock_wait_seconds Time spent waiting for the package lock.",
+                  "# TYPE tokentools_lock_wait_seconds histogram"]
+        lines += self.lock_wait.render("tokentools_lock_wait_seconds")
+        lines += ["# HELP tokentools_download_bytes_total Bytes of package archives downloaded.",
+                  "# TYPE tokentools_download_bytes_total counter",
+                  f"tokentools_download_bytes_total {self.download_bytes}"]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Replace the .prom file with the current values
+
+        Rendered, written and renamed under the lock: threads share the
+        temporary name, and an older snapshot must not replace a newer one.
+        """
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with self.lock:
+            text = self.render()
+            try:
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                os.replace(tmp, self.path)
+            except OSError:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Mirror benchmarking and fastest-mirror selection for archive downloads
+
+config.json can list alternative mirrors for each archive of sources.list:
+    "mirrors": {"http://deb.debian.org/debian/": ["http://ftp.de.debian.org/debian/", ...]}
+The origin and its alternatives are probed with a small ranged request for
+a file the transaction needs; latency and throughput are cached for
+MIRROR_TTL. Archives are then fetched from the fastest mirror into the
+job's staging directory and hash-checked, and apt downloads whatever
+failed from sources.list as usual. sources.list itself is never changed,
+so the package lists stay those of the origin.
+"""
+import concurrent.futures
+import json
+import os
+import threading
+import time
+import urllib.request
+
+MIRROR_TTL = 6 * 3600
+PROBE_BYTES = 256 * 1024
+PROBE_TIMEOUT = 5
+# Mirrors are ranked by the time they would take to deliver an archive this large
+REFERENCE_SIZE = 4 * 1024 * 1024
+
+def probe(url, nbytes=PROBE_BYTES, timeout=PROBE_TIMEOUT):
+    """(latency, throughput) of one ranged request, None if the mirror failed"""
+    request = urllib.request.Request(url, headers={'Range': f"bytes=0-{nbytes - 1}"})
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            received = len(response.read(1))
+            latency = time.monotonic() - start
+            # Servers ignoring Range send the whole file; stop after nbytes anyway
+            while received < nbytes:
+                chunk = response.read(min(64 * 1024, nbytes - received))
+                if not chunk:
+                    break
+                received += len(chunk)
+    except (OSError, ValueError):
+        return None
+    if received == 0:
+        # An empty body says nothing about the mirror's speed
+        return None
+    transfer = time.monotonic() - start - latency
+    return latency, received / max(transfer, 1e-6)
+
+def score(result):
+    """Expected seconds to fetch REFERENCE_SIZE bytes, infinite without a measured throughput"""
+    latency, throughput = result
+    if not throughput or throughput <= 0:
+        return float('inf')
+    return latency + REFERENCE_SIZE / throughput
+
+def normalize(uri):
+    return uri if uri.endswith('/') else uri + '/'
+
+
+class MirrorSelector:
+    """Picks the fastest mirror of each origin from cached probe results"""
+
+    def __init__(self, mirrors, cache_path, ttl=MIRROR_TTL, prober=probe):
+        self.mirrors = {normalize(origin): [normalize(uri) for uri in alternatives]
+                        for origin, alternatives in mirrors.items()}
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.prober = prober
+        self.lock = threading.Lock()
+        self.results = self.load()
+
+    def load(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            with open(self.cache_path + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump(self.results, f, indent=2)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+        except OSError:
+            pass
+
+    def origin_of(self, uri):
+        """Configured origin uri belongs to, or None"""
+        return next((origin for origin in self.mirrors if uri.startswith(origin)), None)
+
+    def expired(self, uri):
+        result = self.results.get(uri)
+        return result is None or time.time() - result['time'] > self.ttl
+
+    def benchmark(self, origin, path, force=False):
+        """Probe the origin and its mirrors whose results expired; returns them fastest first
+
+        Each entry is (uri, latency, throughput); mirrors that failed sort last
+        with None for both.
+        """
+        candidates = [origin] + self.mirrors.get(origin, [])
+        with self.lock:
+            stale = [uri for uri in candidates if force or self.expired(uri)]
+            if stale:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=len(stale)) as pool:
+                    probed = list(pool.map(lambda uri: self.prober(uri + path), stale))
+                now = time.time()
+                for uri, result in zip(stale, probed):
+                    latency, throughput = result if result else (None, None)
+                    self.results[uri] = {'latency': latency, 'throughput': throughput, 'time': now}
+                self.save()
+            ranking = [(uri, self.results[uri]['latency'], self.results[uri]['throughput']) for uri in candidates]
+        return sorted(ranking, key=lambda row: score(row[1:]) if row[1] is not None else float('inf'))
+
+    def rewrite(self, uri):
+        """uri served by the fastest mirror of its origin; uri itself if there is nothing faster"""
+        origin = self.origin_of(uri)
+        if origin is None:
+            return uri
+        path = uri[len(origin):]
+        fastest, latency, throughput = self.benchmark(origin, path)[0]
+        if latency is None or score((latency, throughput)) == float('inf'):
+            return uri
+        return fastest + path
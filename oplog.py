@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Bounded capture of package operation output"""
+import collections
+import gzip
+import os
+import re
+import threading
+import time
+
+class RingLog:
+    """Fixed-size buffer holding the most recent output lines of an operation"""
+
+    def __init__(self, max_lines=400, max_line_length=1000):
+        self.lines = collections.deque(maxlen=max_lines)
+        self.max_line_length = max_line_length
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def append(self, line):
+        """Add a line, evicting the oldest one once the buffer is full"""
+        with self.lock:
+            if len(self.lines) == self.lines.maxlen:
+                self.dropped += 1
+            self.lines.append(line[:self.max_line_length])
+
+    def clear(self):
+        """Start capturing a new operation"""
+        with self.lock:
+            self.lines.clear()
+            self.dropped = 0
+
+    def text(self):
+        """Buffered output as a single string"""
+        with self.lock:
+            header = f"[... {self.dropped} earlier lines dropped ...]\n" if self.dropped else ""
+            return header + "\n".join(self.lines)
+
+    def spill(self, directory, name, keep=20):
+        """Write the buffer to a gzip log file and return its path"""
+        os.makedirs(directory, exist_ok=True)
+        safe_name = re.sub(r'[^A-Za-z0-9._-]+', '_', name)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}.log.gz")
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(self.text() + "\n")
+        prune_logs(directory, keep)
+        return path
+
+
+def prune_logs(directory, keep=20):
+    """Delete all but the newest `keep` spilled logs"""
+    try:
+        logs = sorted(f for f in os.listdir(directory) if f.endswith('.log.gz'))
+    except OSError:
+        return
+    for name in logs[:-keep] if keep else logs:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""Catalog pages hosted by the token tools launcher"""
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+from i18n import N_
+from appstream import localized
+from backends import LABELS, command
+from catalog import CatalogModel, PackageState
+from jobs import Job
+
+class CatalogPage:
+    """One catalog shown as a page of the launcher window
+
+    Subclasses describe the catalog (sections of CatalogModels plus the
+    header and about texts); the host owns everything shared between
+    pages: translation, status index, job queue and privileged session.
+    """
+    name = None
+    title = None
+    subtitle = None
+    comments = None
+    header_icon = None
+    logo_icon = None
+    window_icons = []
+
+    def __init__(self, host):
+        self.host = host
+        self._ = host._
+        # Card widgets, keyed by catalog package id
+        self.cards = {}
+        self.sections = self.create_sections()
+        for _, model in self.sections:
+            model.subscribe(self.on_package_changed)
+            host.status.add(model)
+
+    def create_sections(self):
+        """List of (heading or None, CatalogModel)"""
+        raise NotImplementedError
+
+    def entries(self):
+        for _, model in self.sections:
+            yield from model
+
+    def create_content(self):
+        """Build the page widget"""
+        scrolled = Gtk.ScrolledWindow()
+        scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scrolled.set_vexpand(True)
+
+        self.content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.content_box.set_margin_left(15)
+        self.content_box.set_margin_right(15)
+        self.content_box.set_margin_top(10)
+        self.content_box.set_margin_bottom(10)
+
+        self.create_header()
+
+        for i, (heading, model) in enumerate(self.sections):
+            if i:
+                separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
+                self.content_box.pack_start(separator, False, False, 10)
+            if heading:
+                heading_label = Gtk.Label()
+                self._.bind(heading_label.set_markup, heading, "<span size='16000' weight='bold'>{}</span>")
+                heading_label.set_halign(Gtk.Align.START)
+                self.content_box.pack_start(heading_label, False, False, 10)
+
+            grid = Gtk.Grid()
+            grid.set_row_spacing(10)
+            grid.set_column_spacing(10)
+            grid.set_column_homogeneous(True)
+            for j, package in enumerate(model):
+                grid.attach(self.create_package_card(package), j % 3, j // 3, 1, 1)
+            self.content_box.pack_start(grid, False, False, 0)
+
+        scrolled.add(self.content_box)
+        return scrolled
+
+    def create_header(self):
+        """Create header section"""
+        header_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+
+        icon_label = Gtk.Label()
+        icon_label.set_markup(f"<span size='20000'>{self.header_icon}</span>")
+
+        title_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
+        title_label = Gtk.Label()
+        self._.bind(title_label.set_markup, self.title, "<span size='16000' weight='bold'>{}</span>")
+        title_label.set_halign(Gtk.Align.START)
+
+        subtitle_label = Gtk.Label()
+        self._.bind(subtitle_label.set_text, self.subtitle)
+        subtitle_label.set_halign(Gtk.Align.START)
+
+        title_box.pack_start(title_label, False, False, 0)
+        title_box.pack_start(subtitle_label, False, False, 0)
+
+        header_box.pack_start(icon_label, False, False, 0)
+        header_box.pack_start(title_box, True, True, 0)
+
+        separator = Gtk.Separator(orientation=Gtk.Orientation.HORIZONTAL)
+
+        self.content_box.pack_start(header_box, False, False, 0)
+        self.content_box.pack_start(separator, False, False, 0)
+
+    def create_package_card(self, package):
+        """Create individual package card"""
+        frame = Gtk.Frame()
+        frame.set_shadow_type(Gtk.ShadowType.IN)
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        vbox.set_margin_left(10)
+        vbox.set_margin_right(10)
+        vbox.set_margin_top(8)
+        vbox.set_margin_bottom(8)
+
+        # Header with icon and name
+        header_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+
+        # The emoji and hand-written description stand in until AppStream metadata arrives
+        card = self.cards[package.package] = {'frame': frame, 'header_box': header_box}
+        card['icon'] = Gtk.Label()
+        card['icon'].set_markup(f"<span size='14000'>{package.icon}</span>")
+
+        name_label = Gtk.Label()
+        name_label.set_markup(f"<span weight='bold'>{package.name}</span>")
+        name_label.set_ellipsize(3)
+
+        header_box.pack_start(card['icon'], False, False, 0)
+        header_box.pack_start(name_label, True, True, 0)
+
+        # Status and description
+        card['status_label'] = Gtk.Label()
+        card['status_label'].set_text(self._("Checking..."))
+
+        desc_label = card['desc_label'] = Gtk.Label()
+        self._.bind(lambda text, package=package: self.show_description(package, text), package.desc)
+        desc_label.set_line_wrap(True)
+        desc_label.set_max_width_chars(20)
+        frame.connect("query-tooltip", self.show_screenshot, package)
+
+        # Buttons
+        btn_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        btn_box.set_homogeneous(True)
+
+        card['install_btn'] = Gtk.Button()
+        self._.bind(card['install_btn'].set_label, "Install")
+        card['install_btn'].connect("clicked", self.install_package, package)
+        card['install_btn'].get_style_context().add_class("suggested-action")
+
+        card['remove_btn'] = Gtk.Button()
+        self._.bind(card['remove_btn'].set_label, "Remove")
+        card['remove_btn'].connect("clicked", self.remove_package, package)
+        card['remove_btn'].get_style_context().add_class("destructive-action")
+
+        self.add_card_buttons(package, card, btn_box)
+        btn_box.pack_start(card['install_btn'], True, True, 0)
+        # Alternative builds that can be installed from here
+        card['backend_btns'] = {}
+        for backend in package.backends:
+            if command(backend, 'install', package.backends[backend]):
+                button = card['backend_btns'][backend] = Gtk.Button(label=LABELS[backend])
+                button.connect("clicked", self.install_backend_package, package, backend)
+                btn_box.pack_start(button, True, True, 0)
+        btn_box.pack_start(card['remove_btn'], True, True, 0)
+
+        # Pack everything
+        for widget in [header_box, card['status_label'], desc_label, btn_box]:
+            vbox.pack_start(widget, False, False, 0)
+
+        frame.add(vbox)
+        return frame
+
+    def add_card_buttons(self, package, card, btn_box):
+        """Hook for pages with extra per-card buttons"""
+
+    def on_metadata(self, package, kind, value):
+        """MetadataLoader callback; called from worker threads"""
+        self.host.dispatcher.post(('metadata', kind, package.package), self.attach_metadata, package, kind, value)
+
+    def attach_metadata(self, package, kind, value):
+        """Put an AppStream summary, icon or screenshot on a card"""
+        card = self.cards[package.package]
+        if kind == 'summary':
+            card['summaries'] = value
+            self.show_description(package, self._(package.desc))
+        elif kind == 'icon':
+            image = Gtk.Image.new_from_pixbuf(value)
+            card['header_box'].remove(card['icon'])
+            card['header_box'].pack_start(image, False, False, 0)
+            card['header_box'].reorder_child(image, 0)
+            image.show()
+            card['icon'] = image
+        elif kind == 'screenshot':
+            card['screenshot'] = value
+            card['frame'].set_has_tooltip(True)
+
+    def show_description(self, package, text):
+        """AppStream summary in the current language if there is one, else the catalog text"""
+        card = self.cards[package.package]
+        card['desc_label'].set_text(localized(card.get('summaries'), self._.language) or text)
+
+    def show_screenshot(self, widget, x, y, keyboard_mode, tooltip, package):
+        #pylint: disable=unused-argument
+        screenshot = self.cards[package.package].get('screenshot')
+        if screenshot is None:
+            return False
+        tooltip.set_icon(screenshot)
+        return True
+
+    def on_package_changed(self, package):
+        """Model observer; may be called from worker threads"""
+        self.host.dispatcher.post(('card', package.package), self.render_card, package)
+
+    def render_card(self, package):
+        """Update visual package status"""
+        card = self.cards[package.package]
+        state = package.state
+        if state == PackageState.INSTALLED and package.origin not in (None, 'apt'):
+            card['status_label'].set_markup(f"<span color='green'>✅ {self._('Installed')} ({LABELS[package.origin]})</span>")
+        elif state == PackageState.INSTALLED:
+            card['status_label'].set_markup(f"<span color='green'>✅ {self._('Installed')}</span>")
+        elif state == PackageState.NOT_INSTALLED:
+            card['status_label'].set_markup(f"<span color='red'>❌ {self._('Not installed')}</span>")
+        elif state == PackageState.INSTALLING:
+            card['status_label'].set_text(self._("Installing..."))
+        elif state == PackageState.REMOVING:
+            card['status_label'].set_text(self._("Removing..."))
+        elif state == PackageState.QUEUED:
+            position = self.host.jobs.position(package)
+            card['status_label'].set_text(f"{self._('Queued')} (#{position})" if position else self._("Queued"))
+        else:
+            card['status_label'].set_text(self._("Checking..."))
+        card['status_label'].set_tooltip_text(package.version)
+        card['install_btn'].set_sensitive(state == PackageState.NOT_INSTALLED)
+        for button in card['backend_btns'].values():
+            button.set_sensitive(state == PackageState.NOT_INSTALLED)
+        removable = state == PackageState.INSTALLED
+        if removable and package.origin in package.backends:
+            removable = command(package.origin, 'remove', package.backends[package.origin]) is not None
+        card['remove_btn'].set_sensitive(removable)
+        return card
+
+    def retranslate_cards(self):
+        """Re-render card statuses in the current language"""
+        # Statuses come from the model, so nothing is rescanned
+        for package in self.entries():
+            self.render_card(package)
+
+    def make_job(self, package, install=True):
+        """Job installing or removing a catalog entry"""
+        return Job('install' if install else 'remove', package.packages, entry=package, key=package.package)
+
+    def make_backend_job(self, package, backend, install=True):
+        """Job installing or removing the build of a catalog entry from another backend"""
+        app_id = package.backends[backend]
+        return Job('install' if install else 'remove', [app_id], entry=package, key=f"{backend}:{app_id}",
+                   label=f"{package.name} ({LABELS[backend]})", backend=backend)
+
+    def install_package(self, widget, package):
+        """Install package"""
+        #pylint: disable=unused-argument
+        self.host.submit(self.make_job(package, True))
+
+    def install_backend_package(self, widget, package, backend):
+        """Install the build of a package from another backend"""
+        #pylint: disable=unused-argument
+        self.host.submit(self.make_backend_job(package, backend, True))
+
+    def remove_package(self, widget, package):
+        """Remove package, from whichever backend it is installed with"""
+        #pylint: disable=unused-argument
+        if package.origin in package.backends:
+            self.host.submit(self.make_backend_job(package, package.origin, False))
+            return
+        job = self.make_job(package, False)
+        if self.host.confirm_removal(package.name, job.packages):
+            self.host.submit(job)
+
+
+class OfficePage(CatalogPage):
+    name = 'office'
+    title = N_("OfficeToken")
+    subtitle = N_("Office Package Manager")
+    comments = N_("Office Package Manager for Linux")
+    header_icon = '🏢'
+    logo_icon = "applications-office"
+    window_icons = ["applications-office", "office-calendar", "application-x-office"]
+
+    def create_sections(self):
+        return [(None, CatalogModel([
+            {'name': 'LibreOffice Fresh', 'package': 'libreoffice', 'desc': N_('Latest LibreOffice version'), 'icon': '📄'},
+            {'name': 'LibreOffice Stable', 'package': 'libreoffice24.8', 'desc': N_('Stable LibreOffice version'), 'icon': '📋'},
+            {'name': 'ONLYOFFICE', 'package': 'onlyoffice-desktopeditors', 'desc': N_('Modern document editor'), 'icon': '🏢', 'backends': {'flatpak': 'org.onlyoffice.desktopeditors'}},
+            {'name': 'Atril', 'package': 'atril', 'desc': N_('PDF viewer'), 'icon': '📖'},
+            {'name': 'PDF Arranger', 'package': 'pdfarranger', 'desc': N_('PDF organizer'), 'icon': '📋'},
+            {'name': 'AbiWord', 'package': 'abiword', 'desc': N_('Word processor'), 'icon': '✏️'},
+            {'name': 'Gnumeric', 'package': 'gnumeric', 'desc': N_('Spreadsheet'), 'icon': '🧮'},
+            {'name': 'Galculator', 'package': 'galculator', 'desc': N_('Calculator'), 'icon': '🔢'},
+            {'name': 'Pinta', 'package': 'pinta', 'desc': N_('Image editor'), 'icon': '🎨'},
+            {'name': 'Inkscape', 'package': 'inkscape', 'desc': N_('Vector graphics editor'), 'icon': '✏️'},
+            {'name': 'Krita', 'package': 'krita', 'desc': N_('Digital painting application'), 'icon': '🖌️', 'backends': {'flatpak': 'org.kde.krita', 'appimage': 'krita'}},
+            {'name': 'GIMP', 'package': 'gimp', 'desc': N_('Advanced image editor'), 'icon': '🖼️'}
+        ]))]
+
+
+class WebPage(CatalogPage):
+    name = 'web'
+    title = N_("WebToken")
+    subtitle = N_("Web & Communication Manager")
+    comments = N_("Web & Communication Manager for Linux")
+    header_icon = '🌐'
+    logo_icon = "internet-web-browser"
+    window_icons = ["web-browser", "internet-web-browser", "browser", "applications-internet"]
+
+    def create_sections(self):
+        # Some packages need their repository package installed first
+        return [(None, CatalogModel([
+            {'name': 'Brave', 'package': 'brave-browser', 'desc': N_('Privacy-focused browser'), 'icon': '🦁', 'repo': 'brave-keyring'},
+            {'name': 'Vivaldi', 'package': 'vivaldi-stable', 'desc': N_('Feature-rich browser'), 'icon': '🎭'},
+            {'name': 'Thorium', 'package': 'thorium-browser', 'desc': N_('Fast minimalist browser'), 'icon': '⚡', 'repo': 'thorium-repo'},
+            {'name': 'Falkon', 'package': 'falkon', 'desc': N_('KDE web browser'), 'icon': '🦅'},
+            {'name': 'Firefox', 'package': 'firefox', 'desc': N_('Mozilla Firefox'), 'icon': '🔥', 'backends': {'flatpak': 'org.mozilla.firefox', 'snap': 'firefox'}},
+            {'name': 'Floorp', 'package': 'floorp', 'desc': N_('Firefox-based browser'), 'icon': '🌊'},
+            {'name': 'Transmission', 'package': 'transmission-qt', 'desc': N_('BitTorrent client'), 'icon': '⬇️', 'alt_package': 'transmission-gtk', 'alt_desc': 'GTK'},
+            {'name': 'Motrix', 'package': 'motrix', 'desc': N_('Download manager'), 'icon': '📥'},
+            {'name': 'Min Browser', 'package': 'min', 'desc': N_('Minimalist web browser'), 'icon': '🌙'},
+            {'name': 'Chromium', 'package': 'chromium-browser', 'desc': N_('Open source web browser'), 'icon': '🔵', 'backends': {'flatpak': 'org.chromium.Chromium', 'snap': 'chromium'}},
+            {'name': 'Materialgram', 'package': 'materialgram', 'desc': N_('Telegram client'), 'icon': '💬'},
+            {'name': 'Telegram Desktop', 'package': 'telegram-desktop', 'desc': N_('Telegram client'), 'icon': '✈️', 'backends': {'flatpak': 'org.telegram.desktop', 'snap': 'telegram-desktop'}},
+            {'name': 'Warpinator', 'package': 'warpinator', 'desc': N_('File sharing tool'), 'icon': '📤'},
+            {'name': 'KDE Connect', 'package': 'kdeconnect', 'desc': N_('Device connectivity'), 'icon': '🔗'}
+        ]))]
+
+    def add_card_buttons(self, package, card, btn_box):
+        # Special handling for packages with alternatives
+        if package.extra('alt_package'):
+            card['alt_btn'] = Gtk.Button(label=package.extra('alt_desc', ''))
+            if not package.extra('alt_desc'):
+                self._.bind(card['alt_btn'].set_label, "Alt")
+            card['alt_btn'].connect("clicked", self.install_alt_package, package)
+            btn_box.pack_start(card['alt_btn'], True, True, 0)
+
+    def render_card(self, package):
+        card = super().render_card(package)
+        if 'alt_btn' in card:
+            card['alt_btn'].set_sensitive(package.state == PackageState.NOT_INSTALLED)
+        return card
+
+    def make_job(self, package, install=True, alt_package=False):
+        pkg_name = package.extra('alt_package') if alt_package else package.package
+        repo = package.extra('repo')
+        return Job('install' if install else 'remove', [pkg_name], entry=package, key=pkg_name,
+                   prerequisites=[repo] if install and repo else [])
+
+    def install_alt_package(self, widget, package):
+        """Install the alternative build of a package"""
+        #pylint: disable=unused-argument
+        self.host.submit(self.make_job(package, True, alt_package=True))
+
+
+class GamePage(CatalogPage):
+    name = 'games'
+    title = N_("GameToken")
+    subtitle = N_("Gaming Package Manager")
+    comments = N_("Gaming Package Manager for Linux")
+    header_icon = '🎮'
+    logo_icon = "applications-games"
+    window_icons = ["applications-games", "input-gaming", "applications-all"]
+
+    def create_sections(self):
+        return [
+            (N_("Emulators"), CatalogModel([
+                {'name': 'melonDS', 'package': 'melonDS', 'desc': N_('Nintendo DS Emulator'), 'icon': '🎮', 'backends': {'flatpak': 'net.kuribo64.melonDS', 'appimage': 'melonDS'}},
+                {'name': 'DuckStation', 'package': 'duckstation', 'desc': N_('PlayStation 1 Emulator'), 'icon': '🎮', 'backends': {'flatpak': 'org.duckstation.DuckStation', 'appimage': 'DuckStation'}},
+                {'name': 'PPSSPP', 'package': 'ppsspp', 'desc': N_('PSP Emulator'), 'icon': '🎮', 'backends': {'flatpak': 'org.ppsspp.PPSSPP', 'snap': 'ppsspp-emu', 'appimage': 'PPSSPP'}},
+                {'name': 'Flycast', 'package': 'flycast', 'desc': N_('Dreamcast Emulator'), 'icon': '🎮', 'backends': {'flatpak': 'org.flycast.Flycast'}},
+                {'name': 'BigPEmu', 'package': 'bigpemu', 'desc': N_('Multi System Emulator'), 'icon': '🎮'},
+                {'name': "Rosalie's Mupen GUI", 'package': 'rosalie-mg', 'desc': N_('N64 Emulator GUI'), 'icon': '🎮'},
+                {'name': 'Snes9x', 'package': 'snes9x', 'desc': N_('Super Nintendo Emulator'), 'icon': '🎮', 'backends': {'flatpak': 'com.snes9x.Snes9x'}}
+            ])),
+            (N_("Games"), CatalogModel([
+                {'name': 'Pico8 Games', 'package': 'pico8-games', 'desc': N_('Collection of Pico-8 Games'), 'icon': '🕹️'},
+                {'name': 'SuperTux 2', 'package': 'supertux2', 'desc': N_('2D Jump\'n Run Game'), 'icon': '🕹️'},
+                {'name': 'SuperTuxKart', 'package': 'supertuxkart', 'desc': N_('3D Racing Game'), 'icon': '🕹️'},
+                {'name': 'Wine + Q4Wine + WineTricks', 'package': 'wine q4wine winetricks', 'desc': N_('Windows Compatibility Layer'), 'icon': '🍷'},
+                {'name': 'Lutris', 'package': 'lutris', 'desc': N_('Game Platform'), 'icon': '🎮', 'backends': {'flatpak': 'net.lutris.Lutris'}},
+                {'name': 'Freedoom 1+2', 'package': 'freedoom', 'desc': N_('Free Doom Game'), 'icon': '👾'},
+                {'name': 'GNOME 2048', 'package': 'gnome-2048', 'desc': N_('2048 Puzzle Game'), 'icon': '🎲'},
+                {'name': 'Prism Launcher', 'package': 'prismlauncher', 'desc': N_('Minecraft Launcher'), 'icon': '⛏️', 'backends': {'flatpak': 'org.prismlauncher.PrismLauncher'}},
+                {'name': 'Heroic Games Launcher', 'package': 'heroic', 'desc': N_('Epic Games Launcher'), 'icon': '🎮', 'backends': {'flatpak': 'com.heroicgameslauncher.hgl'}}
+            ])),
+        ]
+
+
+PAGES = [OfficePage, WebPage, GamePage]
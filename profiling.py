@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Opt-in profiling of startup and package operations
+
+Enabled with --profile (cProfile) and --trace-malloc (tracemalloc), or
+with TOKENTOOLS_PROFILE=cpu,malloc in the environment. Each profiled
+phase writes <app>-<phase>-<time>.pstats and, with tracemalloc, a
+matching -alloc.txt report of the biggest allocation growth to
+~/.config/tokentools/profiles. A main-loop latency probe records the
+longest main-thread stalls with the stack that caused them and writes
+<app>-stalls-<time>.txt on exit.
+"""
+import contextlib
+import cProfile
+import heapq
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+
+from gi.repository import GLib
+
+ENV_VAR = "TOKENTOOLS_PROFILE"
+PROBE_INTERVAL = 0.05
+# Main-loop iterations later than this count as stalls
+STALL_THRESHOLD = 0.1
+KEEP_STALLS = 20
+TOP_ALLOCATIONS = 25
+
+def requested(argv, environ=os.environ):
+    """(cpu, memory) profiling wanted by the command line or the environment"""
+    kinds = {kind.strip() for kind in environ.get(ENV_VAR, '').split(',')}
+    cpu = '--profile' in argv or bool(kinds & {'1', 'cpu'})
+    memory = '--trace-malloc' in argv or 'malloc' in kinds
+    return cpu, memory
+
+
+class MainLoopProbe:
+    """Measures how late GLib main-loop timeouts fire and samples the stalling stack"""
+
+    def __init__(self, interval=PROBE_INTERVAL, threshold=STALL_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.main_thread = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self.sampled = None
+        self.stalls = []
+        self.source_id = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.last_tick = time.monotonic()
+        self.source_id = GLib.timeout_add(int(self.interval * 1000), self.tick)
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        if self.source_id:
+            GLib.source_remove(self.source_id)
+            self.source_id = None
+
+    def tick(self):
+        now = time.monotonic()
+        late = now - self.last_tick - self.interval
+        if late > self.threshold:
+            stall = (late, time.time(), self.sampled or "")
+            if len(self.stalls) < KEEP_STALLS:
+                heapq.heappush(self.stalls, stall)
+            else:
+                heapq.heappushpop(self.stalls, stall)
+        self.last_tick = now
+        self.sampled = None
+        return True
+
+    def watch(self):
+        """Sample the main thread's stack once per stall while it is still blocked"""
+        while self.running:
+            time.sleep(self.interval)
+            if self.sampled is None and time.monotonic() - self.last_tick > self.interval + self.threshold:
+                frame = sys._current_frames().get(self.main_thread)
+                if frame is not None:
+                    self.sampled = "".join(traceback.format_stack(frame))
+
+    def report(self):
+        lines = []
+        for late, when, stack in sorted(self.stalls, reverse=True):
+            lines.append(f"{late * 1000:.0f} ms stall at {time.strftime('%H:%M:%S', time.localtime(when))}")
+            lines.extend("    " + line for line in stack.splitlines())
+        if not lines:
+            return f"No main-loop stalls over {self.threshold * 1000:.0f} ms\n"
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """Profiles named phases of one app; does nothing unless enabled"""
+
+    def __init__(self, directory, app, cpu=False, memory=False):
+        self.directory = directory
+        self.app = app
+        self.cpu = cpu
+        self.memory = memory
+        self.probe = None
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def enabled(self):
+        return self.cpu or self.memory
+
+    def path(self, name, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{self.app}-{name}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+    def begin(self, name):
+        """Start profiling a phase; returns a token for end()"""
+        if not self.enabled:
+            return None
+        profile = None
+        if self.cpu:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler; a phase already running wins
+                profile = None
+        snapshot = tracemalloc.take_snapshot() if self.memory else None
+        return name, profile, snapshot
+
+    def end(self, token):
+        """Stop a phase and write its reports"""
+        if token is None:
+            return
+        name, profile, snapshot = token
+        try:
+            if profile is not None:
+                profile.disable()
+                profile.dump_stats(self.path(name, ".pstats"))
+            if snapshot is not None:
+                growth = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')[:TOP_ALLOCATIONS]
+                with open(self.path(name, "-alloc.txt"), 'w', encoding='utf-8') as f:
+                    f.write("".join(f"{stat}\n" for stat in growth))
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        token = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    def start_probe(self):
+        """Begin measuring main-loop latency; call from the main thread"""
+        if self.enabled and self.probe is None:
+            self.probe = MainLoopProbe()
+            self.probe.start()
+
+    def close(self):
+        """Write the main-loop stall summary"""
+        if self.probe is None:
+            return
+        self.probe.stop()
+        try:
+            with open(self.path("stalls", ".txt"), 'w', encoding='utf-8') as f:
+                f.write(self.probe.report())
+        except OSError:
+            pass
+        self.probe = None
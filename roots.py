@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Package operations on alternate roots such as chroots and image trees
+
+apt is pointed at a root with Dir= and runs dpkg --root on it, so each
+root uses its own sources, lists and dpkg database while archives are
+still read from host paths. Status scans read
+the root's dpkg status file in-process. For installs, the archives every
+root needs are downloaded once into a shared directory and hard-linked
+into each root's own archive directory, so N images cost one download.
+"""
+import concurrent.futures
+import os
+import shutil
+
+from artifacts import required_archives
+from statusd import DPKG_STATUS, parse_dpkg_status
+
+ROOT_PARALLELISM = 4
+
+def apt_options(root):
+    """apt options that make it operate on root instead of /"""
+    root = os.path.abspath(root)
+    return ['-o', f"Dir={root}/", '-o', f"DPkg::Options::=--root={root}"]
+
+def root_status(root, packages):
+    """query_installed() equivalent for a root, read from its dpkg database"""
+    try:
+        index = parse_dpkg_status(os.path.join(root, DPKG_STATUS.lstrip('/')))
+    except OSError:
+        index = {}
+    return {pkg: index.get(pkg, (False, None, None)) for pkg in packages}
+
+def scan_roots(roots, packages, workers=ROOT_PARALLELISM):
+    """Status of packages in every root, scanned concurrently"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(roots, pool.map(lambda root: root_status(root, packages), roots)))
+
+def plan_downloads(roots, packages, shared_dir, runner, workers=ROOT_PARALLELISM):
+    """Archives each root still needs, as apt in that root would fetch them"""
+    def plan(root):
+        options = apt_options(root) + ['-o', f"Dir::Cache::Archives={shared_dir}/"]
+        return required_archives(packages, runner=runner, options=options)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(roots, pool.map(plan, roots)))
+
+def share_archives(plan, shared_dir, fetch, workers=ROOT_PARALLELISM):
+    """Fetch each distinct archive of the plan once into shared_dir; returns the ones that arrived
+
+    fetch(archive, dest) returns True once dest holds the verified archive.
+    Roots on the same release need identical archives; the same file name
+    with a different hash is a different archive and is left to apt.
+    """
+    distinct = {}
+    for archives in plan.values():
+        for archive in archives:
+            distinct.setdefault(archive.file, set()).add(archive)
+    wanted = [next(iter(variants)) for variants in distinct.values() if len(variants) == 1]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = pool.map(lambda archive: fetch(archive, os.path.join(shared_dir, archive.file)), wanted)
+        return {archive for archive, ok in zip(wanted, fetched) if ok}
+
+def stage_root(archives, shared_dir, stage_dir):
+    """Link the shared archives a root needs into its own archive directory
+
+    Returns (file, error) for every archive that could be neither linked
+    nor copied; apt downloads those itself. The privileged helper copies
+    the directory into one only root can write before apt reads it.
+    """
+    try:
+        os.makedirs(os.path.join(stage_dir, "partial"), exist_ok=True)
+    except OSError as e:
+        return [(archive.file, e) for archive in archives]
+    failed = []
+    for archive in archives:
+        source = os.path.join(shared_dir, archive.file)
+        target = os.path.join(stage_dir, archive.file)
+        try:
+            os.link(source, target)
+        except OSError:
+            try:
+                shutil.copyfile(source, target)
+            except OSError as e:
+                failed.append((archive.file, e))
+    return failed
+
+def root_commands(kind, packages, stage_dirs):
+    """[label, argv] per root for tokenhelper's --parallel mode"""
+    commands = []
+    for root, stage_dir in stage_dirs.items():
+        argv = ['apt-get'] + apt_options(root)
+        if stage_dir:
+            argv += ['-o', f"Dir::Cache::Archives={stage_dir}/"]
+        commands.append([root, argv + [kind, '-y'] + list(packages)])
+    return commands
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""Per-user status daemon shared by the token tools
+
+The daemon owns one index of the dpkg status database, kept current
+through inotify, and a snapshot of apt candidate versions. The launcher
+and the command line query and subscribe to it over a Unix socket instead
+of running dpkg-query themselves. The first client starts it; it exits
+after IDLE_TIMEOUT seconds without clients.
+
+Requests and replies are JSON objects, one per line:
+    {"op": "query", "packages": [...]}       -> {"installed": {pkg: [installed, version, size]}}
+    {"op": "candidates", "packages": [...]}  -> {"candidates": {pkg: version or null}}
+    {"op": "subscribe", "packages": [...]}   -> {"installed": ...}, then
+                                                {"event": "changed", "installed": ...} pushes
+"""
+import fcntl
+import json
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from dpkglock import IN_CLOSE_WRITE, IN_MOVED_TO, InotifyWatch
+
+DPKG_STATUS = "/var/lib/dpkg/status"
+APT_LISTS = "/var/lib/apt/lists"
+IDLE_TIMEOUT = 600
+# dpkg rewrites its status file many times per operation; push once it settles
+SETTLE_DELAY = 0.5
+CONNECT_TIMEOUT = 3.0
+
+def runtime_dir():
+    """Private per-user directory for the socket"""
+    base = os.environ.get('XDG_RUNTIME_DIR') or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "tokentools")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    return path
+
+def socket_path():
+    return os.path.join(runtime_dir(), "status.sock")
+
+def read_stanzas(path, keys):
+    """Yield the given fields of each stanza of a deb822 file such as the dpkg status"""
+    fields = {}
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            if line == '\n':
+                if fields:
+                    yield fields
+                fields = {}
+            elif not line[0].isspace():
+                key, _, value = line.partition(':')
+                if key in keys:
+                    fields[key] = value.strip()
+    if fields:
+        yield fields
+
+def parse_dpkg_status(path=DPKG_STATUS):
+    """Map package name to (installed, version, installed size in KiB) from the dpkg database"""
+    index = {}
+    for fields in read_stanzas(path, ('Package', 'Status', 'Version', 'Installed-Size')):
+        name = fields.get('Package')
+        if not name:
+            continue
+        installed = fields.get('Status', '').endswith(' installed')
+        size = fields.get('Installed-Size', '')
+        row = (installed, fields.get('Version') if installed else None,
+               int(size) if installed and size.isdigit() else None)
+        # Multi-arch packages have one stanza per architecture
+        if installed or name not in index:
+            index[name] = row
+    return index
+
+def parse_policy(output):
+    """Candidate versions from `apt-cache policy` output"""
+    candidates = {}
+    package = None
+    for line in output.splitlines():
+        if line and not line[0].isspace() and line.endswith(':'):
+            package = line[:-1].split(':')[0]
+        elif package and line.strip().startswith('Candidate:'):
+            version = line.split(':', 1)[1].strip()
+            candidates[package] = None if version == '(none)' else version
+    return candidates
+
+
+class StatusDatabase:
+    """dpkg status index plus apt candidate snapshot held by the daemon"""
+
+    def __init__(self, path=DPKG_STATUS):
+        self.path = path
+        self.signature = None
+        self.index = {}
+        self.candidates = {}
+        self.lists_mtime = None
+        self.ensure_current()
+
+    def ensure_current(self):
+        """Re-read the status file if it changed; return True if it was re-read"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+        if signature == self.signature:
+            return False
+        try:
+            self.index = parse_dpkg_status(self.path)
+        except OSError:
+            return False
+        self.signature = signature
+        return True
+
+    def query(self, packages):
+        self.ensure_current()
+        return {pkg: self.index.get(pkg, (False, None, None)) for pkg in packages}
+
+    def candidate_versions(self, packages):
+        """Candidate versions, cached until the apt lists change"""
+        try:
+            mtime = os.stat(APT_LISTS).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self.lists_mtime:
+            self.candidates = {}
+            self.lists_mtime = mtime
+        missing = [pkg for pkg in packages if pkg not in self.candidates]
+        if missing:
+            try:
+                result = subprocess.run(['apt-cache', 'policy'] + missing, capture_output=True, text=True, check=False)
+                found = parse_policy(result.stdout)
+            except OSError:
+                found = {}
+            for pkg in missing:
+                self.candidates[pkg] = found.get(pkg)
+        return {pkg: self.candidates[pkg] for pkg in packages}
+
+
+class StatusDaemon:
+    """Unix socket server around a StatusDatabase"""
+
+    def __init__(self, path):
+        self.path = path
+        self.database = StatusDatabase()
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.subscriptions = {}
+        self.settle_at = None
+        self.idle_since = time.monotonic()
+
+    def serve(self):
+        """Run until no client has been connected for IDLE_TIMEOUT seconds"""
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen(8)
+        self.selector.register(server, selectors.EVENT_READ, 'accept')
+        watch = InotifyWatch(os.path.dirname(self.database.path), IN_MOVED_TO | IN_CLOSE_WRITE)
+        if watch.fileno() >= 0:
+            self.selector.register(watch.fileno(), selectors.EVENT_READ, 'inotify')
+        try:
+            while True:
+                now = time.monotonic()
+                if not self.clients and now - self.idle_since > IDLE_TIMEOUT:
+                    return 0
+                deadline = self.idle_since + IDLE_TIMEOUT if not self.clients else now + IDLE_TIMEOUT
+                if self.settle_at is not None:
+                    deadline = min(deadline, self.settle_at)
+                for key, _ in self.selector.select(max(deadline - now, 0)):
+                    if key.data == 'accept':
+                        self.accept(server)
+                    elif key.data == 'inotify':
+                        watch.drain()
+                        self.settle_at = time.monotonic() + SETTLE_DELAY
+                    else:
+                        self.read(key.fileobj)
+                if self.settle_at is not None and time.monotonic() >= self.settle_at:
+                    self.settle_at = None
+                    self.publish()
+        finally:
+            watch.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            server.close()
+
+    def accept(self, server):
+        conn, _ = server.accept()
+        conn.settimeout(2.0)
+        self.clients[conn] = b''
+        self.selector.register(conn, selectors.EVENT_READ, 'client')
+
+    def drop(self, conn):
+        self.selector.unregister(conn)
+        self.clients.pop(conn, None)
+        self.subscriptions.pop(conn, None)
+        conn.close()
+        if not self.clients:
+            self.idle_since = time.monotonic()
+
+    def send(self, conn, message):
+        try:
+            conn.sendall(json.dumps(message).encode() + b"\n")
+        except OSError:
+            self.drop(conn)
+
+    def read(self, conn):
+        try:
+            data = conn.recv(65536)
+        except OSError:
+            data = b''
+        if not data:
+            self.drop(conn)
+            return
+        buffer = self.clients[conn] + data
+        *lines, self.clients[conn] = buffer.split(b"\n")
+        for line in lines:
+            try:
+                request = json.loads(line)
+                packages = list(request.get('packages', []))
+            except (ValueError, AttributeError, TypeError):
+                self.send(conn, {'error': 'bad request'})
+                continue
+            op = request.get('op')
+            if op == 'query':
+                self.send(conn, {'installed': self.database.query(packages)})
+            elif op == 'subscribe':
+                self.subscriptions.setdefault(conn, set()).update(packages)
+                self.send(conn, {'installed': self.database.query(packages)})
+            elif op == 'candidates':
+                self.send(conn, {'candidates': self.database.candidate_versions(packages)})
+            else:
+                self.send(conn, {'error': f"unknown op {op}"})
+            if conn not in self.clients:
+                return
+
+    def publish(self):
+        """Push changed entries to subscribers after the status file settled"""
+        before = self.database.index
+        if not self.database.ensure_current():
+            return
+        after = self.database.index
+        for conn, packages in list(self.subscriptions.items()):
+            changed = {pkg: after.get(pkg, (False, None, None)) for pkg in packages
+                       if before.get(pkg) != after.get(pkg)}
+            if changed:
+                self.send(conn, {'event': 'changed', 'installed': changed})
+
+
+def start_daemon():
+    """Start the daemon in the background"""
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), 'serve'],
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                     start_new_session=True)
+
+def rows(installed):
+    """JSON lists back to query_installed() style tuples"""
+    return {pkg: tuple(row) for pkg, row in installed.items()}
+
+
+class StatusClient:
+    """Connection to the status daemon, starting it on demand"""
+
+    def __init__(self, path=None, start=True):
+        self.path = path or socket_path()
+        self.start = start
+        self.conn = None
+        self.reader = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Open a connection, starting the daemon if nobody is listening"""
+        started = False
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(self.path)
+                return conn
+            except OSError:
+                conn.close()
+                if not self.start or time.monotonic() > deadline:
+                    raise
+            if not started:
+                start_daemon()
+                started = True
+            time.sleep(0.05)
+
+    def request(self, message):
+        """Send one request and return the reply"""
+        with self.lock:
+            for attempt in (0, 1):
+                try:
+                    if self.conn is None:
+                        self.conn = self.connect()
+                        self.reader = self.conn.makefile('rb')
+                    self.conn.sendall(json.dumps(message).encode() + b"\n")
+                    line = self.reader.readline()
+                    if line:
+                        return json.loads(line)
+                except OSError:
+                    if attempt:
+                        raise
+                # The daemon exited between requests; reconnect once
+                self.close()
+            raise OSError("status daemon closed the connection")
+
+    def query(self, packages):
+        """query_installed() equivalent answered by the daemon"""
+        return rows(self.request({'op': 'query', 'packages': list(packages)})['installed'])
+
+    def candidates(self, packages):
+        """Candidate version of each package, None if apt has none"""
+        return self.request({'op': 'candidates', 'packages': list(packages)})['candidates']
+
+    def subscribe(self, packages, callback):
+        """Call callback({pkg: row}) from a background thread whenever packages change"""
+        conn = self.connect()
+        conn.sendall(json.dumps({'op': 'subscribe', 'packages': list(packages)}).encode() + b"\n")
+
+        def listen():
+            with conn, conn.makefile('rb') as reader:
+                for line in reader:
+                    try:
+                        message = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'installed' in message:
+                        callback(rows(message['installed']))
+
+        threading.Thread(target=listen, daemon=True).start()
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.reader.close()
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+            self.reader = None
+
+
+def serve():
+    """Daemon entry point; exits at once if another daemon is running"""
+    directory = runtime_dir()
+    lock = open(os.path.join(directory, "status.lock"), 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return 0
+    return StatusDaemon(socket_path()).serve()
+
+def main(argv):
+    """statusd.py serve | statusd.py query PACKAGE..."""
+    if argv[:1] == ['serve']:
+        return serve()
+    if argv[:1] == ['query'] and argv[1:]:
+        client = StatusClient()
+        candidates = client.candidates(argv[1:])
+        for pkg, (installed, version, _) in client.query(argv[1:]).items():
+            state = f"installed {version}" if installed else "not installed"
+            print(f"{pkg}\t{state}\t(candidate {candidates.get(pkg) or 'none'})")
+        return 0
+    print(main.__doc__)
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
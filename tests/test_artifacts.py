@@ -0,0 +1,42 @@
+import hashlib
+import os
+
+from artifacts import Archive, ArtifactCache, download
+
+DATA = b"debian package contents"
+
+def archive_for(data, file="vim_9.0_amd64.deb"):
+    return Archive("http://deb.debian.org/debian/pool/" + file, file, len(data),
+                   'sha256', hashlib.sha256(data).hexdigest())
+
+def test_download_rejects_a_hash_mismatch(tmp_path):
+    source = tmp_path / "served.deb"
+    source.write_bytes(DATA.upper())
+    dest = str(tmp_path / "vim.deb")
+    assert not download(source.as_uri(), dest, archive_for(DATA))
+    assert not os.path.exists(dest) and not os.path.exists(dest + ".part")
+
+def test_download_keeps_a_verified_archive(tmp_path):
+    source = tmp_path / "served.deb"
+    source.write_bytes(DATA)
+    dest = str(tmp_path / "vim.deb")
+    assert download(source.as_uri(), dest, archive_for(DATA))
+    with open(dest, 'rb') as f:
+        assert f.read() == DATA
+
+def test_download_stops_when_asked(tmp_path):
+    source = tmp_path / "served.deb"
+    source.write_bytes(DATA)
+    dest = str(tmp_path / "vim.deb")
+    assert not download(source.as_uri(), dest, archive_for(DATA), should_stop=lambda: True)
+    assert not os.path.exists(dest + ".part")
+
+def test_populate_returns_the_misses(tmp_path):
+    cache, staging = tmp_path / "cache", tmp_path / "staging"
+    cache.mkdir()
+    staging.mkdir()
+    good, bad, missing = archive_for(DATA, "a.deb"), archive_for(DATA, "b.deb"), archive_for(DATA, "c.deb")
+    (cache / "a.deb").write_bytes(DATA)
+    (cache / "b.deb").write_bytes(b"corrupt")
+    assert ArtifactCache(str(cache)).populate([good, bad, missing], str(staging)) == [bad, missing]
+    assert sorted(os.listdir(staging)) == ["a.deb"]
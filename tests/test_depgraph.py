@@ -0,0 +1,24 @@
+from depgraph import DependencyGraph
+
+def graph():
+    # a pulls in libA; libX was orphaned by some earlier removal
+    sizes = {'a': 1, 'b': 1, 'libA': 1, 'libB': 1, 'libX': 1, 'c': 1}
+    depends = {'a': [['libA']], 'b': [['libB']], 'c': [['a']], 'libA': [], 'libB': [], 'libX': []}
+    return DependencyGraph(sizes, depends, {}, {'libA', 'libB', 'libX'}, set())
+
+def test_orphans_includes_existing_orphans():
+    assert graph().orphans(['a']) == {'libA', 'libX'}
+
+def test_released_leaves_preexisting_orphans_alone():
+    assert graph().released(['a']) == {'libA'}
+
+def test_released_follows_the_removal_closure():
+    g = graph()
+    g.depends['c'] = [['a'], ['libB']]
+    assert g.removal_closure(['a']) == {'c'}
+    assert g.released(['a']) == {'libA'}
+    g.depends['b'] = []
+    assert g.released(['a']) == {'libA', 'libB'}
+
+def test_released_excludes_removed_packages():
+    assert not graph().released(['libX'])
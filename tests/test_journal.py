@@ -0,0 +1,34 @@
+from journal import OperationJournal
+
+def test_queued_operations_survive_a_crash(tmp_path):
+    path = str(tmp_path / "journal.json")
+    journal = OperationJournal(path)
+    running = journal.add('install', ['vim'])
+    journal.add('install', ['emacs'])
+    journal.add('remove', ['nano'])
+    journal.start(running, ['vim', 'vim-runtime'])
+    # This run's waiting jobs are not interrupted, its running one may be
+    assert [entry['packages'] for entry in journal.interrupted()] == [['vim', 'vim-runtime']]
+
+    restarted = OperationJournal(path)
+    assert [(entry['kind'], entry['packages']) for entry in restarted.interrupted()] == [
+        ('install', ['vim', 'vim-runtime']), ('install', ['emacs']), ('remove', ['nano'])]
+
+def test_drop_forgets_only_unstarted_operations(tmp_path):
+    journal = OperationJournal(str(tmp_path / "journal.json"))
+    queued = journal.add('install', ['vim'])
+    started = journal.add('install', ['emacs'])
+    journal.start(started)
+    journal.drop(queued)
+    journal.drop(started)
+    assert [entry['id'] for entry in journal.entries] == [started]
+
+def test_clear_keeps_this_runs_queue(tmp_path):
+    path = str(tmp_path / "journal.json")
+    OperationJournal(path).add('install', ['old'])
+    journal = OperationJournal(path)
+    journal.add('configure', [], interrupted=True)
+    waiting = journal.add('install', ['new'])
+    assert len(journal.interrupted()) == 2
+    journal.clear()
+    assert [entry['id'] for entry in journal.entries] == [waiting]
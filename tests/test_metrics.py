@@ -0,0 +1,24 @@
+import os
+import threading
+
+from metrics import Metrics
+
+def test_concurrent_updates_leave_a_complete_file(tmp_path):
+    path = str(tmp_path / "tokentools.prom")
+    metrics = Metrics(path)
+
+    def update():
+        for _ in range(50):
+            metrics.downloaded(1)
+            metrics.lock_waited(0.1)
+
+    threads = [threading.Thread(target=update) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    assert text == metrics.render()
+    assert os.listdir(tmp_path) == ["tokentools.prom"]
@@ -0,0 +1,73 @@
+import functools
+import http.server
+import threading
+
+import pytest
+
+from mirrors import MirrorSelector, probe, score
+
+PAYLOAD = b"x" * (64 * 1024)
+
+
+class MirrorHandler(http.server.BaseHTTPRequestHandler):
+    """Stand-in mirror: /empty sends no body, anything else PAYLOAD"""
+
+    def do_GET(self):
+        body = b"" if self.path.endswith("/empty") else PAYLOAD
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mirror():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), MirrorHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/debian/"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def dead_mirror():
+    server = http.server.HTTPServer(('127.0.0.1', 0), MirrorHandler)
+    port = server.server_address[1]
+    server.server_close()
+    return f"http://127.0.0.1:{port}/debian/"
+
+def test_probe_measures_a_live_mirror(mirror):
+    latency, throughput = probe(mirror + "pool/vim.deb", nbytes=len(PAYLOAD), timeout=2)
+    assert latency >= 0 and throughput > 0
+
+def test_probe_fails_on_empty_response_and_dead_mirror(mirror, dead_mirror):
+    assert probe(mirror + "empty", timeout=2) is None
+    assert probe(dead_mirror + "pool/vim.deb", timeout=2) is None
+
+def test_score_without_throughput_is_infinite():
+    assert score((0.1, 0)) == float('inf')
+    assert score((0.1, None)) == float('inf')
+    assert score((0.1, 1024.0)) < float('inf')
+
+def test_rewrite_uses_the_fastest_mirror(tmp_path):
+    origin, slow, fast = "http://origin/debian", "http://slow/debian/", "http://fast/debian/"
+    speeds = {origin + "/": 1e5, slow: 1e4, fast: 1e7}
+    prober = lambda url: (0.01, next(speed for uri, speed in speeds.items() if url.startswith(uri)))
+    selector = MirrorSelector({origin: [slow, fast]}, str(tmp_path / "mirrors.json"), prober=prober)
+    assert selector.rewrite(origin + "/pool/vim.deb") == fast + "pool/vim.deb"
+    assert selector.rewrite("http://elsewhere/pool/vim.deb") == "http://elsewhere/pool/vim.deb"
+
+def test_rewrite_falls_back_to_the_origin_when_probes_fail(tmp_path, mirror, dead_mirror):
+    selector = MirrorSelector({dead_mirror: [mirror]}, str(tmp_path / "mirrors.json"))
+    # The only alternative answers with an empty body, which is no measurement either
+    uri = dead_mirror + "empty"
+    assert selector.rewrite(uri) == uri
+    assert [row[1] for row in selector.benchmark(dead_mirror, "empty")] == [None, None]
+
+def test_rewrite_skips_a_dead_origin(tmp_path, mirror, dead_mirror):
+    selector = MirrorSelector({dead_mirror: [mirror]}, str(tmp_path / "mirrors.json"),
+                              prober=functools.partial(probe, nbytes=len(PAYLOAD), timeout=2))
+    assert selector.rewrite(dead_mirror + "pool/vim.deb") == mirror + "pool/vim.deb"
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from artifacts import Archive
+from roots import apt_options, root_commands, stage_root
+
+def archive_for(file, data=b"deb"):
+    return Archive("http://deb.debian.org/debian/pool/" + file, file, len(data),
+                   'sha256', hashlib.sha256(data).hexdigest())
+
+def test_apt_options_point_apt_and_dpkg_at_the_root():
+    assert apt_options("/srv/images/lab") == [
+        '-o', "Dir=/srv/images/lab/", '-o', "DPkg::Options::=--root=/srv/images/lab"]
+
+def test_root_commands_label_each_root():
+    commands = root_commands('install', ['vim', 'git'], {
+        "/srv/images/lab": "/tmp/stage/lab",
+        "/srv/images/kiosk": None,
+    })
+    assert commands == [
+        ["/srv/images/lab", ['apt-get', '-o', "Dir=/srv/images/lab/",
+                             '-o', "DPkg::Options::=--root=/srv/images/lab",
+                             '-o', "Dir::Cache::Archives=/tmp/stage/lab/",
+                             'install', '-y', 'vim', 'git']],
+        # A root without staged archives lets apt use its own cache
+        ["/srv/images/kiosk", ['apt-get', '-o', "Dir=/srv/images/kiosk/",
+                               '-o', "DPkg::Options::=--root=/srv/images/kiosk",
+                               'install', '-y', 'vim', 'git']],
+    ]
+
+def test_stage_root_links_shared_archives(tmp_path):
+    shared, stage = tmp_path / "shared", tmp_path / "stage"
+    shared.mkdir()
+    (shared / "vim.deb").write_bytes(b"deb")
+    assert stage_root([archive_for("vim.deb")], str(shared), str(stage)) == []
+    assert os.path.isdir(stage / "partial")
+    assert os.path.samefile(shared / "vim.deb", stage / "vim.deb")
+
+def test_stage_root_reports_archives_it_could_not_stage(tmp_path):
+    shared, stage = tmp_path / "shared", tmp_path / "stage"
+    shared.mkdir()
+    (shared / "vim.deb").write_bytes(b"deb")
+    failed = stage_root([archive_for("vim.deb"), archive_for("git.deb")], str(shared), str(stage))
+    assert [(file, type(error)) for file, error in failed] == [("git.deb", FileNotFoundError)]
+
+def test_stage_root_fails_every_archive_without_a_staging_directory(tmp_path):
+    blocker = tmp_path / "stage"
+    blocker.write_text("not a directory")
+    archives = [archive_for("vim.deb"), archive_for("git.deb")]
+    failed = stage_root(archives, str(tmp_path), str(blocker))
+    assert [file for file, _ in failed] == ["vim.deb", "git.deb"]
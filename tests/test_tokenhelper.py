@@ -0,0 +1,125 @@
+import ast
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import roots
+from journal import resume_command
+from tokenhelper import CancelGate, allowed, apt_allowed, parallel_command, relay, sequence_command, spawn
+
+PAGES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pages.py")
+
+def catalog_entries():
+    """Catalog dicts of pages.py, read without importing Gtk"""
+    with open(PAGES, encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Dict):
+            entry = {}
+            for key, value in zip(node.keys, node.values):
+                # Descriptions are N_() calls; only the literal fields matter here
+                if isinstance(key, ast.Constant) and isinstance(value, (ast.Constant, ast.Dict)):
+                    entry[key.value] = ast.literal_eval(value)
+            if 'package' in entry:
+                yield entry
+
+ENTRIES = list(catalog_entries())
+APT_IDS = sorted({name for entry in ENTRIES
+                  for value in (entry['package'], entry.get('alt_package', ''), entry.get('repo', ''))
+                  for name in value.split()})
+SNAP_IDS = sorted({entry['backends']['snap'] for entry in ENTRIES if 'snap' in entry.get('backends', {})})
+
+def test_catalog_found():
+    assert len(ENTRIES) > 30 and 'melonDS' in APT_IDS
+
+@pytest.mark.parametrize('name', APT_IDS)
+@pytest.mark.parametrize('kind', ['install', 'remove'])
+def test_every_catalog_package_allowed(name, kind):
+    assert apt_allowed([kind, '-y', name])
+    assert allowed(['pkexec', 'apt', kind, '-y', name][1:])
+    assert allowed(resume_command([{'kind': kind, 'packages': [name]}])[1:])
+
+@pytest.mark.parametrize('name', SNAP_IDS)
+def test_every_catalog_snap_allowed(name):
+    assert allowed(['snap', 'install', name]) and allowed(['snap', 'remove', name])
+
+@pytest.mark.parametrize('argv', [
+    ['apt', 'install', '-y', '-o', 'Dir::Cache::Archives=/home/user/a/', 'vim'],
+    ['apt-fast', 'install', '-y', 'vim', 'libc6:amd64'],
+    ['apt-get', 'clean'],
+    ['dpkg', '--configure', '-a'],
+    # maintenance.low_priority(), which needs gi to import
+    ['nice', '-n', '19', 'ionice', '-c', '3', 'apt-get', 'update', '-q'],
+    ['apt-get'] + roots.apt_options('/') + ['install', '-y', 'vim'],
+    parallel_command([['/', ['apt-get', 'install', '-y', 'vim']]], 2)[1:],
+])
+def test_launcher_commands_allowed(argv):
+    assert allowed(argv)
+
+@pytest.mark.parametrize('argv', [
+    ['sh', '-c', 'id'],
+    ['apt', 'install', '-y', '-o', 'APT::Update::Pre-Invoke::=id', 'vim'],
+    ['apt', 'install', './evil.deb'],
+    ['apt', 'install', '-y', '--', 'x'],
+    ['apt', 'remove', '-y', '--autoremove', 'x'],
+    ['apt', 'update', 'vim'],
+    ['apt'],
+    ['dpkg', '-i', 'x.deb'],
+    ['snap', 'install', '--dangerous', 'x'],
+    ['nice', '-n', '19', 'sh'],
+    parallel_command([['/', ['sh', '-c', 'id']]], 2)[1:],
+    sequence_command([['rm', '-rf', '/']])[1:],
+])
+def test_other_commands_refused(argv):
+    assert not allowed(argv)
+
+def test_user_writable_root_refused(tmp_path):
+    assert not allowed(['apt-get'] + roots.apt_options(str(tmp_path)) + ['install', '-y', 'vim'])
+
+def run_gated(script, cancel_after):
+    out = io.BytesIO()
+    child = spawn(['sh', '-c', script])
+    gate = CancelGate(child, out)
+    threading.Timer(cancel_after, gate.cancel).start()
+    start = time.monotonic()
+    returncode = relay(child, out, gate)
+    return returncode, time.monotonic() - start, out.getvalue()
+
+def test_cancel_held_back_until_dpkg_is_done():
+    returncode, elapsed, output = run_gated(
+        "echo 'Unpacking foo (1.0) ...'; sleep 1; echo 'Setting up foo (1.0) ...'; echo done", 0.2)
+    assert returncode == 0 and b"done" in output and b"cancelling once it is done" in output
+
+def test_held_cancel_fires_at_next_cancellable_phase():
+    returncode, elapsed, _ = run_gated(
+        "echo 'Unpacking foo'; sleep 0.5; echo 'Reading package lists...'; sleep 30", 0.1)
+    assert returncode == 143 and elapsed < 10
+
+def test_cancel_during_download_is_immediate():
+    returncode, elapsed, _ = run_gated("echo 'Get:1 http://x foo'; sleep 30", 0.2)
+    assert returncode == 143 and elapsed < 10
+
+def test_parallel_labels_tracked_separately():
+    returncode, elapsed, _ = run_gated(
+        "echo '[/a] Unpacking foo'; echo '[/b] Get:1 http://x'; sleep 0.5; echo '[/a] exit 0'; sleep 30", 0.1)
+    assert returncode == 143 and 0.4 < elapsed < 10
+
+def test_archives_apt_fetched_are_handed_back(tmp_path, monkeypatch):
+    import tokenhelper
+    monkeypatch.setattr(tokenhelper, 'PRIVATE_ARCHIVES', str(tmp_path / "private"))
+    monkeypatch.setenv('PKEXEC_UID', str(os.getuid()))
+    stage = tmp_path / "stage"
+    stage.mkdir()
+    (stage / "staged.deb").write_text("staged")
+    (stage / "link.deb").symlink_to(tmp_path / "elsewhere")
+    # Stands in for apt: downloads into the directory it is given, replacing nothing the user staged
+    script = 'd=${2#Dir::Cache::Archives=}; echo fetched > ${d}fetched.deb; echo x > ${d}link.deb; echo y > ${d}staged.deb'
+    child = spawn(['sh', '-c', script, 'apt', '-o', f"Dir::Cache::Archives={stage}/"])
+    assert relay(child, io.BytesIO()) == 0
+    assert (stage / "fetched.deb").read_text() == "fetched\n"
+    assert (stage / "staged.deb").read_text() == "staged"
+    assert (stage / "link.deb").is_symlink() and not (tmp_path / "elsewhere").exists()
+    assert not os.listdir(tmp_path / "private")
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+
+import pytest
+
+from tracing import Tracer, detect_phase
+
+@pytest.mark.parametrize('line, phase', [
+    ("Unpacking foo (1.0) ...", 'unpack'),
+    ("[/srv/img1] Unpacking foo (1.0) ...", 'unpack'),
+    ("[/srv/img 2] Setting up foo (1.0) ...", 'configure'),
+    ("[/] Get:1 http://deb.debian.org/debian stable/main amd64 foo 1.0", 'download'),
+    ("[/srv/img1] Processing triggers for man-db (2.11) ...", 'triggers'),
+    ("[/srv/img1] exit 0", None),
+    ("Note: [x] Unpacking", None),
+])
+def test_detect_phase_with_and_without_root_label(line, phase):
+    assert detect_phase(line) == phase
+
+def test_run_records_spawn_latency_and_output(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.jsonl"))
+    result = tracer.run([sys.executable, '-c', 'import sys; print(sys.stdin.read().upper())'],
+                        tag='audit', input="ok", capture_output=True, text=True)
+    assert (result.returncode, result.stdout) == (0, "OK\n")
+    span = tracer.recent(1)[0]
+    assert span['tag'] == 'audit' and span['returncode'] == 0 and span['output_bytes'] == 3
+    assert span['spawn_latency'] is not None and 0 <= span['spawn_latency'] <= span['wall_time']
+
+def test_run_check_raises_and_still_records(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.jsonl"))
+    with pytest.raises(subprocess.CalledProcessError):
+        tracer.run([sys.executable, '-c', 'raise SystemExit(3)'], check=True, capture_output=True)
+    span = tracer.recent(1)[0]
+    assert span['returncode'] == 3 and span['spawn_latency'] is not None
@@ -0,0 +1,700 @@
+#!/usr/bin/env python3
+"""Privileged helper that runs a package command in its own process group
+
+The token tools start it through pkexec. It relays the command's output
+and listens on stdin for a cancel request, which it turns into signals
+for the whole process group (apt, dpkg and their children), something the
+unprivileged frontend cannot do itself.
+
+Started with --session it stays up and runs one command per "run" line
+instead, so a single polkit authorization covers every operation of the
+launcher's lifetime. With --parallel it runs a batch of labelled commands,
+such as one apt per image root, a bounded number at a time, and with
+--sequence a list of commands one after another until one fails.
+
+Only the commands the launcher sends are run: see allowed(). Archive
+directories the launcher staged are copied somewhere only root can write
+before apt reads them: see private_archives().
+"""
+import concurrent.futures
+import json
+import os
+import pwd
+import queue
+import re
+import shutil
+import signal
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+
+from tracing import LABEL_PREFIX, Span, detect_phase
+
+CANCEL = b"cancel"
+RUN = b"run "
+# Written after a session command's output, followed by its exit status
+SESSION_EXIT = b"\0tokenhelper-exit "
+# Phases in which stopping apt cannot leave dpkg half-configured
+CANCELLABLE_PHASES = ('auth', 'run', 'lock', 'resolve', 'download')
+GRACE_PERIOD = 3.0
+# Exit status of a command the helper refuses to run, as a shell reports "cannot execute"
+REJECTED = 126
+
+APT_COMMANDS = ('apt', 'apt-get', 'apt-fast')
+APT_ACTIONS = ('install', 'remove', 'update', 'clean')
+APT_FLAGS = ('-y', '-q')
+# apt looks names up case-insensitively, and catalog ids such as melonDS use capitals
+PACKAGE_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9+.-]*(:[a-z0-9-]+)?(=[A-Za-z0-9.+~:-]+)?\Z")
+SNAP_NAME = re.compile(r"[a-z0-9][a-z0-9-]*\Z")
+# Prefixes maintenance.low_priority() puts before a command
+LOW_PRIORITY = (['nice', '-n', '19'], ['ionice', '-c', '3'])
+ARCHIVES_OPTION = 'Dir::Cache::Archives='
+# Root-owned copies of the archive directories the launcher stages
+PRIVATE_ARCHIVES = "/var/cache/tokentools"
+
+def helper_command(argv):
+    """Route a ['pkexec', ...] command through the helper"""
+    if argv[:1] != ['pkexec']:
+        return list(argv)
+    return ['pkexec', sys.executable, os.path.abspath(__file__)] + list(argv[1:])
+
+def sequence_command(commands):
+    """['pkexec', ...] command running argv commands in order, stopping at the first failure"""
+    return ['pkexec', sys.executable, os.path.abspath(__file__), '--sequence', json.dumps(commands)]
+
+def trusted_root(path):
+    """True if path is an absolute directory that only root can change, nor swap through a parent
+
+    An alternate root supplies apt's configuration, hooks included, so a
+    root the user could write to would let them run anything as root.
+    """
+    if not os.path.isabs(path):
+        return False
+    path = os.path.realpath(path)
+    for checked in (os.path.join(path, 'etc', 'apt'), path):
+        try:
+            st = os.lstat(checked)
+        except FileNotFoundError:
+            continue
+        except OSError:
+            return False
+        if st.st_uid != 0 or st.st_mode & 0o022:
+            return False
+    while path != '/':
+        path = os.path.dirname(path)
+        try:
+            st = os.lstat(path)
+        except OSError:
+            return False
+        if st.st_uid != 0 or st.st_mode & 0o022:
+            return False
+    return True
+
+def apt_option_allowed(value):
+    """True for the -o values the launcher passes to apt"""
+    if value.startswith('Dir::Cache::Archives='):
+        return os.path.isabs(value[len('Dir::Cache::Archives='):])
+    if value.startswith('Dir='):
+        return trusted_root(value[len('Dir='):].rstrip('/') or '/')
+    if value.startswith('DPkg::Options::=--root='):
+        return trusted_root(value[len('DPkg::Options::=--root='):])
+    return False
+
+def apt_allowed(args):
+    """True for the apt invocations the launcher makes: options, one action, then package names"""
+    action = None
+    options = iter(args)
+    for arg in options:
+        if arg == '-o':
+            if not apt_option_allowed(next(options, '')):
+                return False
+        elif arg in APT_FLAGS:
+            continue
+        elif action is None and arg in APT_ACTIONS:
+            action = arg
+        elif action in ('install', 'remove') and PACKAGE_NAME.match(arg):
+            continue
+        else:
+            return False
+    return action is not None
+
+def allowed(argv):
+    """True if argv is one of the commands the launcher sends to the helper
+
+    That is apt, apt-get or apt-fast installing, removing, updating or
+    cleaning (possibly under nice and ionice), dpkg --configure -a, snap
+    install/remove, and this helper's own --parallel and --sequence modes
+    over allowed commands. Anything else is refused, so the authorization
+    cannot be reused to run arbitrary programs as root.
+    """
+    argv = list(argv)
+    if not all(isinstance(arg, str) for arg in argv):
+        return False
+    for prefix in LOW_PRIORITY:
+        if argv[:len(prefix)] == prefix:
+            argv = argv[len(prefix):]
+    if argv[:1] == [sys.executable] and argv[1:2] == [os.path.abspath(__file__)]:
+        return batch(argv[2:]) is not None
+    if argv[:1] and argv[0] in APT_COMMANDS:
+        return apt_allowed(argv[1:])
+    if argv == ['dpkg', '--configure', '-a']:
+        return True
+    return (len(argv) == 3 and argv[0] == 'snap' and argv[1] in ('install', 'remove')
+            and bool(SNAP_NAME.match(argv[2])))
+
+def batch(args):
+    """Commands of a --parallel or --sequence argument list as [argv, ...], None if any is not allowed"""
+    try:
+        if len(args) == 3 and args[0] == '--parallel':
+            int(args[1])
+            commands = [argv for _, argv in json.loads(args[2])]
+        elif len(args) == 2 and args[0] == '--sequence':
+            commands = json.loads(args[1])
+        else:
+            return None
+        if all(isinstance(argv, list) and allowed(argv) for argv in commands):
+            return commands
+    except (ValueError, TypeError):
+        pass
+    return None
+
+def emit(out, data):
+    """Write data to out now, ignoring a frontend that went away"""
+    try:
+        out.write(data)
+        out.flush()
+    except (OSError, ValueError):
+        pass
+
+def reject(argv, out):
+    """Explain a refused command and return its exit status"""
+    emit(out, f"tokenhelper: refusing to run {json.dumps(argv)}\n".encode())
+    return REJECTED
+
+class CancelGate:
+    """Holds back a cancel while the command's output says dpkg is unpacking or configuring
+
+    The phase is followed here, on the helper's side, so a cancel the
+    frontend sends with an out-of-date phase cannot interrupt dpkg. Lines
+    of --parallel output carry a "[label] " prefix and are tracked per
+    label; "[label] exit N" ends that label. A held cancel goes through as
+    soon as every command is back in a cancellable phase, for example
+    when a --sequence moves on to its next step.
+    """
+
+    def __init__(self, child, out):
+        self.child = child
+        self.out = out
+        self.phases = {}
+        self.pending = False
+        self.lock = threading.Lock()
+
+    def cancellable(self):
+        return all(phase in CANCELLABLE_PHASES for phase in self.phases.values())
+
+    def feed(self, line):
+        """Follow one line of the child's output"""
+        text = line.decode('utf-8', 'replace').rstrip('\n')
+        match = LABEL_PREFIX.match(text)
+        label = match.group(0) if match else ''
+        phase = detect_phase(text)
+        with self.lock:
+            if label and text[len(label):].startswith('exit '):
+                self.phases.pop(label, None)
+            elif phase:
+                self.phases[label] = phase
+            fire = self.pending and self.cancellable()
+            if fire:
+                self.pending = False
+        if fire:
+            self.kill()
+
+    def cancel(self):
+        """Stop the child now, or once dpkg is out of the phases that must not be interrupted"""
+        with self.lock:
+            fire = self.cancellable()
+            self.pending = not fire
+        if fire:
+            self.kill()
+        else:
+            emit(self.out, b"tokenhelper: dpkg is unpacking or configuring, cancelling once it is done\n")
+
+    def kill(self):
+        if self.child.poll() is None:
+            threading.Thread(target=kill_group, args=(self.child,), daemon=True).start()
+
+def request_cancel(process):
+    """Ask the helper behind a traced process to cancel; never blocks"""
+    try:
+        process.stdin.write(CANCEL + b"\n")
+        process.stdin.flush()
+        return True
+    except (OSError, ValueError, AttributeError):
+        return False
+
+def kill_group(child):
+    """SIGTERM the child's process group, then SIGKILL after a grace period"""
+    try:
+        os.killpg(child.pid, signal.SIGTERM)
+    except ProcessLookupError:
+        return
+    try:
+        child.wait(timeout=GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(child.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+def exit_status(returncode):
+    """Exit status to report for a child, mapping signals like a shell"""
+    return 128 - returncode if returncode < 0 else returncode
+
+def killed(returncode):
+    """True if an exit status, as exit_status() reports it or as Popen gives it, means a signal ended the command"""
+    return returncode is None or returncode < 0 or returncode > 128
+
+def relay(child, out, gate=None):
+    """Copy the child's output to out until it exits and return its exit status"""
+    for line in iter(child.stdout.readline, b''):
+        if gate:
+            gate.feed(line)
+        try:
+            out.write(line)
+            out.flush()
+        except (OSError, ValueError):
+            # Keep draining so apt never sees a broken pipe
+            continue
+    return reap(child)
+
+# (device, inode) of a staged archive -> its root-owned copy, so archives
+# hard-linked into several roots' directories are copied once
+imported = {}
+imported_lock = threading.Lock()
+
+def import_archive(source_fd, target):
+    """Copy an open archive to target, or link an earlier copy of the same file"""
+    st = os.fstat(source_fd)
+    if not stat.S_ISREG(st.st_mode):
+        raise OSError(f"{target}: not a regular file")
+    key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    with imported_lock:
+        previous = imported.get(key)
+    if previous:
+        try:
+            os.link(previous, target)
+            return
+        except OSError:
+            pass
+    with open(source_fd, 'rb', closefd=False) as source, open(target, 'xb') as copy:
+        shutil.copyfileobj(source, copy)
+    os.chmod(target, 0o644)
+    with imported_lock:
+        imported[key] = target
+
+def private_archives(argv, log=None):
+    """argv with its Dir::Cache::Archives directory replaced by a root-owned copy, and (copy, original)
+
+    The launcher stages archives in directories the user owns, where they
+    could be swapped between apt's checks and dpkg unpacking them, and
+    whose partial/ apt refuses to download into as root. The copy is made
+    here, with partial/ owned by _apt like apt's own cache. Archives that
+    cannot be copied are reported through log and left for apt to download.
+    Returns (argv, None) when argv names no archive directory.
+    """
+    argv = list(argv)
+    for index, arg in enumerate(argv):
+        if arg.startswith(ARCHIVES_OPTION) and index and argv[index - 1] == '-o':
+            break
+    else:
+        return argv, None
+    source = arg[len(ARCHIVES_OPTION):]
+    os.makedirs(PRIVATE_ARCHIVES, mode=0o755, exist_ok=True)
+    target = tempfile.mkdtemp(dir=PRIVATE_ARCHIVES)
+    os.chmod(target, 0o755)
+    partial = os.path.join(target, "partial")
+    os.mkdir(partial, 0o700)
+    try:
+        os.chown(partial, pwd.getpwnam('_apt').pw_uid, -1)
+    except (KeyError, OSError):
+        pass
+    try:
+        names = [name for name in os.listdir(source) if name.endswith('.deb')]
+    except OSError as e:
+        names = []
+        if log:
+            log(f"tokenhelper: cannot read staged archives in {source}: {e}\n".encode())
+    for name in names:
+        try:
+            fd = os.open(os.path.join(source, name), os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK)
+        except OSError as e:
+            if log:
+                log(f"tokenhelper: cannot stage {name}: {e}\n".encode())
+            continue
+        try:
+            import_archive(fd, os.path.join(target, name))
+        except OSError as e:
+            if log:
+                log(f"tokenhelper: cannot stage {name}: {e}\n".encode())
+        finally:
+            os.close(fd)
+    argv[index] = ARCHIVES_OPTION + target + "/"
+    return argv, (target, source)
+
+def return_archives(target, source):
+    """Copy the archives apt downloaded into the private copy back to the user's staging directory
+
+    So the launcher can export them to the artifact cache. Only a real
+    directory owned by the user pkexec authenticated is written to; files
+    already there are left alone, and the copies belong to that user.
+    """
+    uid = os.environ.get('PKEXEC_UID')
+    if uid is None or not uid.isdigit():
+        return
+    try:
+        dir_fd = os.open(source, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    except OSError:
+        return
+    try:
+        st = os.fstat(dir_fd)
+        if st.st_uid != int(uid):
+            return
+        for name in os.listdir(target):
+            if not name.endswith('.deb'):
+                continue
+            try:
+                fd = os.open(name, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o644, dir_fd=dir_fd)
+            except OSError:
+                continue
+            try:
+                os.fchown(fd, st.st_uid, st.st_gid)
+                with open(os.path.join(target, name), 'rb') as archive, open(fd, 'wb', closefd=False) as copy:
+                    shutil.copyfileobj(archive, copy)
+            except OSError:
+                try:
+                    os.unlink(name, dir_fd=dir_fd)
+                except OSError:
+                    pass
+            finally:
+                os.close(fd)
+    finally:
+        os.close(dir_fd)
+
+def spawn(argv, log=None):
+    """Start argv as the leader of a new process group; reap() it once its output ends"""
+    argv, archives = private_archives(argv, log)
+    try:
+        child = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, start_new_session=True)
+    except OSError:
+        if archives:
+            shutil.rmtree(archives[0], ignore_errors=True)
+        raise
+    child.private_archives = archives
+    return child
+
+def reap(child):
+    """Wait for a spawned child, hand back and drop its private archive copy, return its exit status"""
+    returncode = exit_status(child.wait())
+    if child.private_archives:
+        target, source = child.private_archives
+        return_archives(target, source)
+        shutil.rmtree(target, ignore_errors=True)
+    return returncode
+
+def session():
+    """Run the commands sent on stdin one at a time until stdin closes
+
+    stdin is read on its own thread, so a cancel takes effect while a
+    command runs; run requests queue up for the main thread. A cancel that
+    arrives after a run request but before its command starts skips it.
+    """
+    out = sys.stdout.buffer
+    requests = queue.Queue()
+    lock = threading.Lock()
+    state = {'gate': None, 'pending': 0, 'skip': False}
+
+    def read_stdin():
+        for line in sys.stdin.buffer:
+            line = line.strip()
+            if line == CANCEL:
+                with lock:
+                    gate = state['gate']
+                    if gate is None and state['pending']:
+                        state['skip'] = True
+                if gate is not None:
+                    gate.cancel()
+            elif line.startswith(RUN):
+                with lock:
+                    state['pending'] += 1
+                requests.put(line[len(RUN):])
+        # EOF: the launcher went away, let a running command finish on its own
+        requests.put(None)
+
+    def write(data):
+        emit(out, data)
+
+    def finish(returncode):
+        write(SESSION_EXIT + str(returncode).encode() + b"\n")
+
+    def start(request):
+        """Spawn a requested command unless it was cancelled; (child, exit status if none)"""
+        with lock:
+            skip, state['skip'] = state['skip'], False
+        if skip:
+            return None, exit_status(-signal.SIGTERM)
+        try:
+            argv = json.loads(request)
+        except ValueError as e:
+            write(f"{e}\n".encode())
+            return None, 127
+        if not isinstance(argv, list) or not allowed(argv):
+            return None, reject(argv, out)
+        try:
+            # Staging archives can take a while; a cancel meanwhile is caught below
+            return spawn(argv, write), None
+        except OSError as e:
+            write(f"{e}\n".encode())
+            return None, 127
+
+    threading.Thread(target=read_stdin, daemon=True).start()
+    for request in iter(requests.get, None):
+        child, returncode = start(request)
+        gate = CancelGate(child, out) if child is not None else None
+        with lock:
+            state['pending'] -= 1
+            state['gate'] = gate
+            cancelled, state['skip'] = state['skip'], False
+        if child is None:
+            finish(returncode)
+            continue
+        if cancelled:
+            gate.kill()
+        returncode = relay(child, out, gate)
+        with lock:
+            state['gate'] = None
+        finish(returncode)
+    return 0
+
+def parallel_command(commands, limit):
+    """['pkexec', ...] command running [label, argv] commands at most limit at a time"""
+    return ['pkexec', sys.executable, os.path.abspath(__file__), '--parallel', str(limit), json.dumps(commands)]
+
+def parallel(limit, commands):
+    """Run [label, argv] commands concurrently, prefixing their output with the label
+
+    Returns the worst exit status. SIGTERM, which is what a cancel sends to
+    this process's group, is passed on to every running command's group.
+    """
+    out = sys.stdout.buffer
+    lock = threading.Lock()
+    running = set()
+    stopping = threading.Event()
+
+    def terminate(signum, frame):
+        #pylint: disable=unused-argument
+        stopping.set()
+        for child in list(running):
+            threading.Thread(target=kill_group, args=(child,), daemon=True).start()
+
+    def write(data):
+        with lock:
+            try:
+                out.write(data)
+                out.flush()
+            except (OSError, ValueError):
+                pass
+
+    def run(label, argv):
+        if stopping.is_set():
+            return exit_status(-signal.SIGTERM)
+        prefix = f"[{label}] ".encode()
+        try:
+            child = spawn(argv, lambda data: write(prefix + data))
+        except OSError as e:
+            write(prefix + f"{e}\n".encode())
+            return 127
+        running.add(child)
+        for line in iter(child.stdout.readline, b''):
+            write(prefix + line)
+        returncode = reap(child)
+        running.discard(child)
+        write(prefix + f"exit {returncode}\n".encode())
+        return returncode
+
+    signal.signal(signal.SIGTERM, terminate)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(limit, 1)) as pool:
+        statuses = list(pool.map(lambda command: run(*command), commands))
+    return max(statuses, default=0)
+
+def sequence(commands):
+    """Run argv commands one after another and return the first failing exit status, else 0
+
+    Like parallel(), passes SIGTERM on to the running command's group.
+    """
+    out = sys.stdout.buffer
+    current = {'child': None}
+    stopping = threading.Event()
+
+    def terminate(signum, frame):
+        #pylint: disable=unused-argument
+        stopping.set()
+        if current['child'] is not None:
+            threading.Thread(target=kill_group, args=(current['child'],), daemon=True).start()
+
+    signal.signal(signal.SIGTERM, terminate)
+    for argv in commands:
+        if stopping.is_set():
+            return exit_status(-signal.SIGTERM)
+        try:
+            current['child'] = spawn(argv, lambda data: emit(out, data))
+        except OSError as e:
+            emit(out, f"{e}\n".encode())
+            return 127
+        returncode = relay(current['child'], out)
+        if returncode:
+            return returncode
+    return 0
+
+def main(argv):
+    """Run argv, relaying output until it exits"""
+    if argv[:1] == ['--session']:
+        return session()
+    if argv[:1] in (['--parallel'], ['--sequence']):
+        if batch(argv) is None:
+            return reject(argv, sys.stdout.buffer)
+        if argv[0] == '--parallel':
+            return parallel(int(argv[1]), json.loads(argv[2]))
+        return sequence(json.loads(argv[1]))
+    if not allowed(argv):
+        return reject(argv, sys.stdout.buffer)
+    child = spawn(argv, lambda data: emit(sys.stdout.buffer, data))
+    gate = CancelGate(child, sys.stdout.buffer)
+
+    def watch_stdin():
+        # EOF means the frontend went away: let the command finish on its own
+        for line in sys.stdin.buffer:
+            if line.strip() == CANCEL:
+                gate.cancel()
+                return
+
+    threading.Thread(target=watch_stdin, daemon=True).start()
+
+    return relay(child, sys.stdout.buffer, gate)
+
+
+class SessionProcess:
+    """One command run inside a PrivilegedSession, traced like a TracedProcess"""
+
+    def __init__(self, session, argv, tag=None, on_line=None):
+        self.session = session
+        # Only the command that starts the session waits on polkit
+        self.span = Span(argv if session.process is None else argv[1:], tag)
+        self.on_line = on_line
+        self.returncode = None
+        self.process = None
+        self.done = False
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    def communicate(self):
+        """Consume output line by line until the command exits, then let the next command start"""
+        if self.done:
+            return self.returncode
+        try:
+            return self.read_output()
+        finally:
+            self.done = True
+            self.session.turn.release()
+
+    def read_output(self):
+        stdout = self.process.stdout
+        for raw in iter(stdout.readline, b''):
+            if raw.startswith(SESSION_EXIT):
+                self.returncode = int(raw[len(SESSION_EXIT):])
+                break
+            self.span.output_bytes += len(raw)
+            line = raw.decode('utf-8', 'replace').rstrip('\n')
+            phase = detect_phase(line)
+            if phase:
+                self.span.enter_phase(phase)
+            if self.on_line:
+                self.on_line(line, self.span.current_phase())
+        else:
+            # The session itself ended: authorization refused or helper killed
+            self.returncode = self.session.reset()
+        self.span.finish(self.returncode)
+        self.session.tracer.record(self.span)
+        return self.returncode
+
+
+class PrivilegedSession:
+    """Long-lived pkexec helper shared by every package operation
+
+    Commands are sent one at a time; the first one starts the helper and
+    carries the polkit prompt, later ones reuse the authorization. The
+    helper's output is one stream, so popen() blocks until the previous
+    command's communicate() has read all of its output.
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self.process = None
+        self.lock = threading.Lock()
+        # Held from popen() until communicate() returns
+        self.turn = threading.Lock()
+
+    def popen(self, argv, tag=None, on_line=None):
+        """Run a ['pkexec', ...] command in the session; call communicate() on the result"""
+        self.turn.acquire()
+        try:
+            with self.lock:
+                command = SessionProcess(self, argv, tag, on_line)
+                if self.process is None:
+                    self.process = subprocess.Popen(['pkexec', sys.executable, os.path.abspath(__file__), '--session'],
+                                                    stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                    stderr=subprocess.STDOUT)
+                try:
+                    self.process.stdin.write(RUN + json.dumps(list(argv[1:])).encode() + b"\n")
+                    self.process.stdin.flush()
+                except (OSError, ValueError):
+                    pass
+                command.process = self.process
+                return command
+        except BaseException:
+            self.turn.release()
+            raise
+
+    @property
+    def running(self):
+        """True while the helper is up, so a command needs no new polkit prompt"""
+        return self.process is not None and self.process.poll() is None
+
+    def reset(self):
+        """Forget a session that has exited and return its exit status"""
+        with self.lock:
+            process, self.process = self.process, None
+        if process is None:
+            return -1
+        try:
+            process.stdin.close()
+        except (OSError, ValueError):
+            pass
+        return process.wait()
+
+    def close(self):
+        """End the session once its current command has finished"""
+        with self.lock:
+            process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except (OSError, ValueError):
+                pass
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
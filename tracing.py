@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""Tracing spans for external commands run by the token tools"""
+import collections
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+# apt/dpkg output lines that mark the start of a phase
+APT_PHASES = [
+    ('lock', re.compile(r'^(Waiting for cache lock|E: Could not get lock)')),
+    ('resolve', re.compile(r'^(Reading package lists|Building dependency tree|Reading state information)')),
+    ('download', re.compile(r'^(Get:|Hit:|Ign:|Err:)')),
+    ('unpack', re.compile(r'^(Selecting previously unselected|Preparing to unpack|Unpacking )')),
+    ('configure', re.compile(r'^Setting up ')),
+    ('remove', re.compile(r'^Removing ')),
+    ('triggers', re.compile(r'^Processing triggers for ')),
+]
+
+# "[label] " tokenhelper --parallel puts before each line of a command's output
+LABEL_PREFIX = re.compile(r'^\[[^\]\n]*\] ')
+
+# Spans that hold the dpkg lock, i.e. the install stage of the pipeline
+MUTATING_TAGS = ('install', 'remove', 'update', 'resume', 'repo')
+
+def detect_phase(line):
+    """Return the apt phase a line of output starts, or None; a --parallel label is skipped"""
+    line = LABEL_PREFIX.sub('', line, count=1)
+    for phase, pattern in APT_PHASES:
+        if pattern.match(line):
+            return phase
+    return None
+
+
+class Span:
+    """Timing record for a single external command"""
+
+    def __init__(self, argv, tag=None):
+        self.argv = list(argv)
+        self.tag = tag
+        self.start = time.time()
+        self.spawn_latency = None
+        self.wall_time = None
+        self.returncode = None
+        self.output_bytes = 0
+        self.phases = []
+        self._t0 = time.monotonic()
+        # pkexec spends its first moments waiting on polkit
+        self.enter_phase('auth' if self.argv and self.argv[0] == 'pkexec' else 'run')
+
+    def elapsed(self):
+        """Seconds since the span started"""
+        return time.monotonic() - self._t0
+
+    def enter_phase(self, phase):
+        """Close the current phase and open a new one"""
+        now = self.elapsed()
+        if self.phases:
+            if self.phases[-1]['phase'] == phase:
+                return
+            self.phases[-1]['duration'] = now - self.phases[-1]['offset']
+        self.phases.append({'phase': phase, 'offset': now, 'duration': None})
+
+    def current_phase(self):
+        """Name of the phase the command is currently in"""
+        return self.phases[-1]['phase'] if self.phases else None
+
+    def finish(self, returncode):
+        """Record the exit status and close the last phase"""
+        self.wall_time = self.elapsed()
+        self.returncode = returncode
+        if self.phases and self.phases[-1]['duration'] is None:
+            self.phases[-1]['duration'] = self.wall_time - self.phases[-1]['offset']
+
+    def to_dict(self):
+        """Serializable form written to the trace file"""
+        return {
+            'argv': self.argv,
+            'tag': self.tag,
+            'start': self.start,
+            'spawn_latency': self.spawn_latency,
+            'wall_time': self.wall_time,
+            'returncode': self.returncode,
+            'output_bytes': self.output_bytes,
+            'phases': self.phases,
+        }
+
+
+class TracedProcess:
+    """Popen wrapper that streams output through a span"""
+
+    def __init__(self, tracer, argv, tag=None, on_line=None, **kwargs):
+        self.tracer = tracer
+        self.span = Span(argv, tag)
+        self.on_line = on_line
+        kwargs.setdefault('stdout', subprocess.PIPE)
+        kwargs.setdefault('stderr', subprocess.STDOUT)
+        t0 = time.monotonic()
+        self.process = subprocess.Popen(argv, **kwargs)
+        self.span.spawn_latency = time.monotonic() - t0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    @property
+    def returncode(self):
+        return self.process.returncode
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    def communicate(self):
+        """Consume output line by line until the command exits"""
+        if self.process.stdout is not None:
+            for raw in iter(self.process.stdout.readline, b''):
+                self.span.output_bytes += len(raw)
+                line = raw.decode('utf-8', 'replace').rstrip('\n')
+                phase = detect_phase(line)
+                if phase:
+                    self.span.enter_phase(phase)
+                if self.on_line:
+                    self.on_line(line, self.span.current_phase())
+            self.process.stdout.close()
+        self.process.wait()
+        if self.process.stdin is not None:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        self.span.finish(self.process.returncode)
+        self.tracer.record(self.span)
+        return self.process.returncode
+
+    def terminate(self):
+        self.process.terminate()
+
+    def kill(self):
+        self.process.kill()
+
+    def wait(self, timeout=None):
+        return self.process.wait(timeout=timeout)
+
+
+class Tracer:
+    """Records spans to a rotating JSONL trace file"""
+
+    def __init__(self, path, max_bytes=1024 * 1024, backups=2, keep=200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.spans = collections.deque(maxlen=keep)
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load recent spans from the trace file"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self.spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+
+    def record(self, span):
+        """Append a finished span to memory and to the trace file"""
+        entry = span.to_dict()
+        with self.lock:
+            self.spans.append(entry)
+            try:
+                self.rotate()
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError:
+                pass
+
+    def rotate(self):
+        """Shift trace.jsonl -> trace.jsonl.1 -> ... once it grows too large"""
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def run(self, argv, tag=None, input=None, capture_output=False, timeout=None, check=False, **kwargs):
+        """Traced equivalent of subprocess.run; spawn latency is timed around Popen as in popen()"""
+        span = Span(argv, tag)
+        if input is not None:
+            kwargs['stdin'] = subprocess.PIPE
+        if capture_output:
+            kwargs['stdout'] = kwargs['stderr'] = subprocess.PIPE
+        try:
+            t0 = time.monotonic()
+            with subprocess.Popen(argv, **kwargs) as process:
+                span.spawn_latency = time.monotonic() - t0
+                try:
+                    stdout, stderr = process.communicate(input, timeout=timeout)
+                except BaseException:
+                    process.kill()
+                    raise
+            result = subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+            if check:
+                result.check_returncode()
+        except subprocess.CalledProcessError as e:
+            span.finish(e.returncode)
+            self.record(span)
+            raise
+        except Exception:
+            span.finish(None)
+            self.record(span)
+            raise
+        for out in (result.stdout, result.stderr):
+            if out:
+                span.output_bytes += len(out)
+        span.finish(result.returncode)
+        self.record(span)
+        return result
+
+    def popen(self, argv, tag=None, on_line=None, **kwargs):
+        """Start a traced process whose output is parsed for apt phases"""
+        return TracedProcess(self, argv, tag, on_line, **kwargs)
+
+    def recent(self, count=50):
+        """Most recent spans, newest first"""
+        with self.lock:
+            spans = list(self.spans)
+        return spans[::-1][:count]
+
+    def phase_summary(self):
+        """Total and mean seconds spent per phase across recorded spans"""
+        totals = collections.OrderedDict()
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            for phase in span.get('phases', []):
+                if phase.get('duration') is None:
+                    continue
+                total, count = totals.get(phase['phase'], (0.0, 0))
+                totals[phase['phase']] = (total + phase['duration'], count + 1)
+        return [(name, total, total / count, count) for name, (total, count) in totals.items()]
+
+    def pipeline_summary(self, count=20):
+        """(packages, download, overlapped, install) seconds for recent prefetched installs
+
+        overlapped is the part of the download stage that ran while another
+        operation held dpkg; install is the wall time of the install that
+        used the download.
+        """
+        with self.lock:
+            spans = list(self.spans)
+        rows = []
+        for i, span in enumerate(spans):
+            if span.get('tag') != 'prefetch' or span.get('wall_time') is None:
+                continue
+            start, end = span['start'], span['start'] + span['wall_time']
+            overlapped = 0.0
+            for other in spans:
+                if other.get('tag') in MUTATING_TAGS and other.get('wall_time') is not None:
+                    overlapped += max(0.0, min(end, other['start'] + other['wall_time']) - max(start, other['start']))
+            install = next((other.get('wall_time') for other in spans[i + 1:]
+                            if other.get('tag') == 'install' and other.get('argv', [])[-1:] == span['argv'][-1:]), None)
+            packages = [arg for arg in span['argv'][4:] if not arg.startswith('-') and '=' not in arg]
+            rows.append((" ".join(packages), span['wall_time'], overlapped, install))
+        return rows[::-1][:count]